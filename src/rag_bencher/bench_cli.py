@@ -1,16 +1,39 @@
 import argparse
 import json
+import time
+from datetime import datetime
+from functools import partial
 from pathlib import Path
-from statistics import mean
 from typing import Any, Dict
 
 from rich.console import Console
 
 from rag_bencher.config import load_config
-from rag_bencher.eval.dataset_loader import load_texts_as_documents
-from rag_bencher.eval.metrics import bow_cosine, context_recall, lexical_f1
+from rag_bencher.eval.dataset_loader import open_file_corpus
+from rag_bencher.eval.harness import (
+    CONTEXT_KEYS,
+    METRIC_KEYS,
+    iter_jsonl,
+    run_examples,
+    run_retrieval,
+    score_context,
+    score_results,
+    score_retrieval,
+)
 from rag_bencher.eval.report import write_simple_report
+from rag_bencher.eval.results import (
+    MetricTotals,
+    ResultsSink,
+    StageLatencies,
+    load_completed,
+    result_row,
+    retrieval_row,
+    with_ids,
+)
+from rag_bencher.pipelines.corpus import ann_indexes, ann_report, ingest_report
 from rag_bencher.pipelines.selector import PipelineSelection, select_pipeline
+from rag_bencher.utils.callbacks.usage import UsageTracker
+from rag_bencher.utils.llm_cache import llm_cache
 
 console = Console()
 
@@ -19,52 +42,123 @@ def main() -> None:
     ap = argparse.ArgumentParser(description="Evaluate a RAG pipeline on a QA set")
     ap.add_argument("--config", required=True)
     ap.add_argument("--qa", required=True)
+    ap.add_argument("--concurrency", type=int, default=1, help="Number of questions kept in flight at once")
+    ap.add_argument("--results", help="Per-question JSONL results file (default: reports/results-<timestamp>.jsonl)")
+    ap.add_argument("--resume", action="store_true", help="Skip question ids already recorded in --results")
+    ap.add_argument(
+        "--no-cache", action="store_true", help="Recompute every answer and LLM call instead of reusing cached ones"
+    )
+    ap.add_argument(
+        "--retrieval-only",
+        action="store_true",
+        help="Run only the retrieval stage and score the ranking; no answers are generated",
+    )
     args = ap.parse_args()
+    if args.concurrency < 1:
+        ap.error("--concurrency must be >= 1")
+    if args.resume and not args.results:
+        ap.error("--resume requires --results")
 
     cfg = load_config(args.config)
-    docs = load_texts_as_documents(cfg.data.paths)
+    docs = open_file_corpus(cfg.data.paths)
 
     selection: PipelineSelection = select_pipeline(args.config, docs, cfg)
     chain = selection.chain
     debug = selection.debug
     pipe_id = selection.pipeline_id
 
-    rows: list[Dict[str, float]] = []
-    with open(args.qa, "r", encoding="utf-8") as f:
-        for line in f:
-            ex = json.loads(line)
-            q = ex["question"]
-            ref = ex["reference_answer"]
-            ans = chain.invoke(q)
-            dbg = debug()
-            retrieved = ""
-            if dbg.get("retrieved"):
-                retrieved = "\n".join(r.get("preview", "") for r in dbg["retrieved"])
-            elif dbg.get("candidates"):
-                retrieved = "\n".join(r.get("preview", "") for r in dbg["candidates"][:5])
-            metrics: Dict[str, float] = {
-                "lexical_f1": lexical_f1(ans, ref),
-                "bow_cosine": bow_cosine(ans, ref),
-                "context_recall": context_recall(ref, retrieved) if retrieved else 0.0,
-            }
-            rows.append(metrics)
-            console.print(
-                f"[bold cyan]{q}[/bold cyan] -> F1={metrics['lexical_f1']:.3f} "
-                f"Cos={metrics['bow_cosine']:.3f} "
-                f"Ctx={metrics['context_recall']:.3f}"
+    config_name = Path(args.config).name
+    results_path = Path(args.results or Path("reports") / f"results-{datetime.now():%Y%m%d-%H%M%S}.jsonl")
+    done: set[str] = set()
+    keys = CONTEXT_KEYS if args.retrieval_only else METRIC_KEYS
+    totals = MetricTotals(keys)
+    latency = StageLatencies()
+    if args.resume:
+        done, totals = load_completed(results_path, keys=keys, latency=latency)
+        console.print(f"[yellow]Resuming: {len(done)} question(s) already in {results_path}[/yellow]")
+
+    # Pre-pass: embed every known query string in large batches so the pipelines hit the cache.
+    prefetched = selection.prefetch_queries(ex["question"] for ex in with_ids(iter_jsonl(args.qa), skip=done))
+    if prefetched:
+        console.print(f"[dim]Pre-embedded {prefetched} query text(s)[/dim]")
+    examples = with_ids(iter_jsonl(args.qa), skip=done)
+    # Answers are cached under the pipeline fingerprint, so a re-run only recomputes what changed.
+    cache_key = None if args.no_cache else selection.fingerprint
+    cached = 0
+    # Tokens and estimated cost of the model calls made by this run.
+    usage = UsageTracker(offline=getattr(getattr(cfg, "runtime", None), "offline", False))
+    start = time.perf_counter()
+    # Individual LLM calls are cached too, so a changed config still reuses the calls it shares.
+    with ResultsSink(results_path) as sink, llm_cache(not args.no_cache):
+        if args.retrieval_only:
+            # Only the context-building stage runs, batched over the QA set.
+            for res in run_retrieval(partial(selection.retrieve, concurrency=args.concurrency), examples):
+                metrics = score_context(res.example.get("reference_answer", ""), res.debug)
+                metrics.update(score_retrieval(res.example, res.debug))
+                row = retrieval_row(res, metrics, config=config_name, pipeline=pipe_id)
+                sink.write(row)
+                totals.add(metrics)
+                latency.add(row)
+                mrr = f" MRR={metrics['mrr']:.3f}" if "mrr" in metrics else ""
+                console.print(
+                    f"[bold cyan]{res.example['question']}[/bold cyan] -> Ctx={metrics['context_recall']:.3f}{mrr}"
+                )
+        else:
+            answered = run_examples(
+                chain, debug, examples, concurrency=args.concurrency, cache_key=cache_key, callbacks=[usage]
             )
-    avg: Dict[str, float] = {
-        k: mean(r[k] for r in rows) if rows else 0.0 for k in ["lexical_f1", "bow_cosine", "context_recall"]
-    }
+            # Answers are scored in vectorized batches of SCORE_BATCH_SIZE rows; each row is written once scored.
+            for res, metrics in score_results(answered):
+                row = result_row(res, metrics, config=config_name, pipeline=pipe_id)
+                sink.write(row)
+                totals.add(metrics)
+                latency.add(row)
+                cached += res.cached
+                mrr = f" MRR={metrics['mrr']:.3f}" if "mrr" in metrics else ""
+                console.print(
+                    f"[bold cyan]{res.example['question']}[/bold cyan] -> F1={metrics['lexical_f1']:.3f} "
+                    f"Cos={metrics['bow_cosine']:.3f} "
+                    f"Ctx={metrics['context_recall']:.3f}{mrr}"
+                )
+    elapsed = time.perf_counter() - start
+    avg: Dict[str, float] = totals.averages()
     console.rule("[bold green]Averages")
     console.print(avg)
-    summary: Dict[str, Any] = {"pipeline": pipe_id, "avg_metrics": avg, "num_examples": len(rows)}
+    # p50/p95/p99 seconds of whole examples and of each pipeline stage (embedding, vector search, LLM, ...).
+    percentiles = latency.percentiles()
+    if percentiles:
+        console.rule("[bold green]Latency (s)")
+        console.print(percentiles)
+    summary: Dict[str, Any] = {
+        "pipeline": pipe_id,
+        "retrieval_only": args.retrieval_only,
+        "avg_metrics": avg,
+        "num_examples": totals.count,
+        "results": str(results_path),
+        "fingerprint": selection.fingerprint,
+        "cached_answers": cached,
+        "latency": percentiles,
+        # Questions run (not resumed) per second of wall time.
+        "questions_per_s": round((totals.count - len(done)) / elapsed, 3) if elapsed > 0 else 0.0,
+    }
+    if not args.retrieval_only:
+        summary["usage"] = usage.summary()
+        console.print({"usage": summary["usage"]})
+    ingest_rows = ingest_report()
+    if ingest_rows:
+        # Per-stage (load/chunk/embed/store) throughput of the indexing done for this run.
+        summary["ingest"] = ingest_rows
+    if ann_indexes():
+        # Approximate FAISS indexes: recall of the top-k against exact search on the QA questions.
+        summary["ann"] = ann_report([ex["question"] for ex in iter_jsonl(args.qa)], k=cfg.retriever.k)
+        console.print({"ann": summary["ann"]})
     report_path = write_simple_report(
         question=f"Benchmark: {pipe_id} on {Path(args.qa).name}",
         answer=json.dumps(summary, indent=2),
         cfg=selection.config.model_dump(),
-        extras={"pipeline": pipe_id},
+        extras={"pipeline": pipe_id, "usage": summary.get("usage")},
     )
+    console.print(f"[green]Per-question results in {results_path}[/green]")
     console.print(f"[green]Benchmark report written to {report_path}[/green]")
 
 
@@ -1,79 +1,237 @@
 import argparse
 import glob
-import json
+import time
+from datetime import datetime
+from functools import partial
 from pathlib import Path
-from statistics import mean
-from typing import Any, Dict, Iterator
+from typing import Any, Dict, List, Optional
 
 from rich.console import Console
 
 from rag_bencher.config import load_config
-from rag_bencher.eval.dataset_loader import load_texts_as_documents
-from rag_bencher.eval.metrics import bow_cosine, context_recall, lexical_f1
+from rag_bencher.eval.dataset_loader import open_file_corpus
+from rag_bencher.eval.harness import (
+    CONTEXT_KEYS,
+    METRIC_KEYS,
+    RETRIEVAL_KEYS,
+    iter_jsonl,
+    run_examples,
+    run_retrieval,
+    score_context,
+    score_results,
+    score_retrieval,
+)
+from rag_bencher.eval.results import (
+    PERCENTILES,
+    MetricTotals,
+    ResultsSink,
+    StageLatencies,
+    load_completed,
+    result_row,
+    retrieval_row,
+    with_ids,
+)
+from rag_bencher.pipelines.corpus import ann_report, ingest_report
 from rag_bencher.pipelines.selector import PipelineSelection, select_pipeline
+from rag_bencher.utils.callbacks.usage import UsageTracker
+from rag_bencher.utils.llm_cache import llm_cache
 
 console = Console()
+_LABELS = {"lexical_f1": "Lexical F1", "bow_cosine": "BoW Cosine", "context_recall": "Context Recall", "mrr": "MRR"}
 
 
 def main() -> None:
     ap = argparse.ArgumentParser(description="Run multiple configs and produce a combined HTML report")
     ap.add_argument("--configs", required=True)
     ap.add_argument("--qa", required=True)
+    ap.add_argument("--concurrency", type=int, default=1, help="Number of questions kept in flight at once")
+    ap.add_argument("--results", help="Per-question JSONL results file (default: reports/results-<timestamp>.jsonl)")
+    ap.add_argument("--resume", action="store_true", help="Skip (config, question id) pairs already in --results")
+    ap.add_argument(
+        "--no-cache", action="store_true", help="Recompute every answer and LLM call instead of reusing cached ones"
+    )
+    ap.add_argument(
+        "--retrieval-only",
+        action="store_true",
+        help="Run only each config's retrieval stage and score the rankings; no answers are generated",
+    )
     args = ap.parse_args()
+    if args.concurrency < 1:
+        ap.error("--concurrency must be >= 1")
+    if args.resume and not args.results:
+        ap.error("--resume requires --results")
 
     first = sorted(glob.glob(args.configs))[0]
     cfg = load_config(first)
-    docs = load_texts_as_documents(cfg.data.paths)
-
-    def iter_jsonl(path: str) -> Iterator[Dict[str, Any]]:
-        with open(path, "r", encoding="utf-8") as f:
-            for line in f:
-                yield json.loads(line)
+    docs = open_file_corpus(cfg.data.paths)
 
+    ts = datetime.now().strftime("%Y%m%d-%H%M%S")
+    results_path = Path(args.results or Path("reports") / f"results-{ts}.jsonl")
     results: list[Dict[str, Any]] = []
-    for p in sorted(glob.glob(args.configs)):
-        selection: PipelineSelection = select_pipeline(p, docs)
-        pid = selection.pipeline_id
-        chain = selection.chain
-        debug = selection.debug
-        rows: list[Dict[str, float]] = []
-        for ex in iter_jsonl(args.qa):
-            q = ex["question"]
-            ref = ex["reference_answer"]
-            ans = chain.invoke(q)
-            dbg = debug()
-            retrieved = ""
-            if dbg.get("retrieved"):
-                retrieved = "\n".join(r.get("preview", "") for r in dbg["retrieved"])
-            elif dbg.get("candidates"):
-                retrieved = "\n".join(r.get("preview", "") for r in dbg["candidates"][:5])
-            m = {
-                "lexical_f1": lexical_f1(ans, ref),
-                "bow_cosine": bow_cosine(ans, ref),
-                "context_recall": context_recall(ref, retrieved) if retrieved else 0.0,
+    latencies: Dict[str, Dict[str, Dict[str, float]]] = {}
+    usages: Dict[str, Dict[str, Any]] = {}
+    anns: Dict[str, List[Dict[str, Any]]] = {}
+    ingests: Dict[str, List[Dict[str, Any]]] = {}
+    # Indexes are shared between configs; each one's ingest is reported under the first config using it.
+    ingested: set[int] = set()
+    questions: Optional[List[str]] = None
+    # LLM calls are cached per prompt and model settings, so configs sharing a query-generation step run it once.
+    with ResultsSink(results_path) as sink, llm_cache(not args.no_cache):
+        for p in sorted(glob.glob(args.configs)):
+            name = Path(p).name
+            done: set[str] = set()
+            keys = CONTEXT_KEYS if args.retrieval_only else METRIC_KEYS
+            totals = MetricTotals(keys)
+            latency = StageLatencies()
+            if args.resume:
+                done, totals = load_completed(results_path, config=name, keys=keys, latency=latency)
+            selection: PipelineSelection = select_pipeline(p, docs)
+            pid = selection.pipeline_id
+            chain = selection.chain
+            debug = selection.debug
+            selection.prefetch_queries(ex["question"] for ex in with_ids(iter_jsonl(args.qa), skip=done))
+            examples = with_ids(iter_jsonl(args.qa), skip=done)
+            # Configs whose fingerprint is unchanged since the last sweep are answered from the cache.
+            cache_key = None if args.no_cache else selection.fingerprint
+            cached = 0
+            usage = UsageTracker(offline=getattr(getattr(selection.config, "runtime", None), "offline", False))
+            start = time.perf_counter()
+            if args.retrieval_only:
+                # Only the context-building stage runs, batched over the QA set.
+                for res in run_retrieval(partial(selection.retrieve, concurrency=args.concurrency), examples):
+                    metrics = score_context(res.example.get("reference_answer", ""), res.debug)
+                    metrics.update(score_retrieval(res.example, res.debug))
+                    row = retrieval_row(res, metrics, config=name, pipeline=pid)
+                    sink.write(row)
+                    totals.add(metrics)
+                    latency.add(row)
+            else:
+                answered = run_examples(
+                    chain, debug, examples, concurrency=args.concurrency, cache_key=cache_key, callbacks=[usage]
+                )
+                # Answers are scored in vectorized batches of SCORE_BATCH_SIZE rows; each row is written once scored.
+                for res, metrics in score_results(answered):
+                    row = result_row(res, metrics, config=name, pipeline=pid)
+                    sink.write(row)
+                    totals.add(metrics)
+                    latency.add(row)
+                    cached += res.cached
+            elapsed = time.perf_counter() - start
+            avg = totals.averages()
+            # Throughput counts only the questions run now, not those resumed from --results.
+            usages[name] = {
+                **usage.summary(),
+                "questions_per_s": (totals.count - len(done)) / elapsed if elapsed > 0 else 0.0,
             }
-            rows.append(m)
-        avg = {k: mean(r[k] for r in rows) if rows else 0.0 for k in ["lexical_f1", "bow_cosine", "context_recall"]}
-        console.print(f"[bold]{Path(p).name} ({pid})[/bold] -> {avg}")
-        results.append({"config": Path(p).name, "pipeline": pid, **avg})
+            console.print(
+                f"[bold]{name} ({pid})[/bold] -> {avg} ({cached} cached, "
+                f"{usages[name]['input_tokens'] + usages[name]['output_tokens']} tokens, "
+                f"${usages[name]['cost_usd']:.4f})"
+            )
+            results.append({"config": name, "pipeline": pid, **avg})
+            latencies[name] = latency.percentiles()
+            fresh = [index for index in selection.indexes if id(index) not in ingested]
+            ingested.update(id(index) for index in fresh)
+            ingest_rows = ingest_report(fresh)
+            if ingest_rows:
+                # Per-stage (load/chunk/embed/store) throughput of the indexing this config triggered.
+                ingests[name] = ingest_rows
+                console.print({"ingest": ingest_rows})
+            if any(index.ann_spec is not None for index in selection.indexes):
+                # Approximate FAISS indexes this config searched: recall of its top-k against exact search.
+                if questions is None:
+                    questions = [ex["question"] for ex in iter_jsonl(args.qa)]
+                ann_rows = ann_report(questions, k=selection.config.retriever.k, indexes=selection.indexes)
+                if ann_rows:
+                    anns[name] = ann_rows
+                    console.print({"ann": ann_rows})
+    console.print(f"[green]Per-question results in {results_path}[/green]")
 
-    from datetime import datetime
-
-    ts = datetime.now().strftime("%Y%m%d-%H%M%S")
     out = Path("reports") / f"summary-{ts}.html"
     out.parent.mkdir(exist_ok=True, parents=True)
+    # Answer metrics are absent from retrieval-only runs, retrieval metrics without gold ids.
+    columns = [k for k in (*METRIC_KEYS, *RETRIEVAL_KEYS) if any(k in r for r in results)]
     rows_html = "".join(
         (
             f"<tr>"
             f"<td>{r['config']}</td>"
             f"<td>{r['pipeline']}</td>"
-            f"<td>{r['lexical_f1']:.3f}</td>"
-            f"<td>{r['bow_cosine']:.3f}</td>"
-            f"<td>{r['context_recall']:.3f}</td>"
-            f"</tr>"
+            + "".join(f"<td>{r[k]:.3f}</td>" if k in r else "<td></td>" for k in columns)
+            + "</tr>"
             for r in results
         )
     )
+    header = "".join(f"<th>{_LABELS.get(k, k)}</th>" for k in columns)
+    # Per-stage latency in milliseconds, as p50 / p95 / p99 over each config's uncached examples.
+    stages = list(dict.fromkeys(s for per_stage in latencies.values() for s in per_stage))
+    latency_rows = "".join(
+        f"<tr><td>{config}</td>"
+        + "".join(
+            (
+                "<td>" + " / ".join(f"{per_stage[s][f'p{p}'] * 1000:.1f}" for p in PERCENTILES) + "</td>"
+                if s in per_stage
+                else "<td></td>"
+            )
+            for s in stages
+        )
+        + "</tr>"
+        for config, per_stage in latencies.items()
+    )
+    latency_header = "".join(f"<th>{s}</th>" for s in stages)
+    # LLM usage and estimated cost per config, next to its throughput.
+    usage_rows = "".join(
+        f"<tr><td>{config}</td><td>{u['calls']}</td><td>{u['cached_calls']}</td>"
+        f"<td>{u['input_tokens']}</td><td>{u['output_tokens']}</td>"
+        f"<td>{u['cost_usd']:.4f}</td><td>{u['questions_per_s']:.2f}</td></tr>"
+        for config, u in usages.items()
+    )
+    usage_html = (
+        "<h2>Usage</h2><table><thead><tr><th>Config</th><th>LLM calls</th><th>Cached calls</th>"
+        "<th>Input tokens</th><th>Output tokens</th><th>Est. cost (USD)</th><th>Questions/s</th>"
+        f"</tr></thead><tbody>{usage_rows}</tbody></table>"
+    )
+    ingest_stages = list(dict.fromkeys(st for rows in ingests.values() for row in rows for st in row["stages"]))
+    ingest_rows_html = "".join(
+        f"<tr><td>{config}</td><td>{row['embedding_model']}</td><td>{row['wall_seconds']:.2f}</td>"
+        + "".join(
+            (
+                f"<td>{row['stages'][st]['items']} in {row['stages'][st]['seconds']:.2f}s "
+                f"({row['stages'][st]['per_second']:.1f}/s)</td>"
+                if st in row["stages"]
+                else "<td></td>"
+            )
+            for st in ingest_stages
+        )
+        + "</tr>"
+        for config, rows in ingests.items()
+        for row in rows
+    )
+    ingest_html = (
+        "<h2>Ingest</h2><table><thead><tr><th>Config</th><th>Embedding model</th><th>Wall (s)</th>"
+        + "".join(f"<th>{st}</th>" for st in ingest_stages)
+        + f"</tr></thead><tbody>{ingest_rows_html}</tbody></table>"
+        if ingests
+        else ""
+    )
+    ann_rows_html = "".join(
+        f"<tr><td>{config}</td><td>{row['kind']}</td>"
+        f"<td>{', '.join(f'{k}={v}' for k, v in row.items() if k not in ('kind', 'k', 'recall'))}</td>"
+        f"<td>{row['k']}</td><td>{row['recall']:.3f}</td></tr>"
+        for config, rows in anns.items()
+        for row in rows
+    )
+    ann_html = (
+        "<h2>ANN recall</h2><table><thead><tr><th>Config</th><th>Index</th><th>Settings</th>"
+        f"<th>k</th><th>Recall@k</th></tr></thead><tbody>{ann_rows_html}</tbody></table>"
+        if anns
+        else ""
+    )
+    latency_html = (
+        f"<h2>Latency (ms, {' / '.join(f'p{p}' for p in PERCENTILES)})</h2>"
+        f"<table><thead><tr><th>Config</th>{latency_header}</tr></thead><tbody>{latency_rows}</tbody></table>"
+        if stages
+        else ""
+    )
     html = (
         f"<!doctype html><html><head><meta charset='utf-8'>"
         f"<title>rag-bencher multi-run</title>"
@@ -85,9 +243,9 @@ def main() -> None:
         f"</style></head><body>"
         f"<h1>rag-bencher multi-run summary</h1>"
         f"<table><thead><tr>"
-        f"<th>Config</th><th>Pipeline</th><th>Lexical F1</th>"
-        f"<th>BoW Cosine</th><th>Context Recall</th>"
-        f"</tr></thead><tbody>{rows_html}</tbody></table></body></html>"
+        f"<th>Config</th><th>Pipeline</th>{header}"
+        f"</tr></thead><tbody>{rows_html}</tbody></table>"
+        f"{latency_html}{usage_html}{ingest_html}{ann_html}</body></html>"
     )
     out.write_text(html, encoding="utf-8")
     console.print(f"[green]Wrote {out}[/green]")
@@ -1,6 +1,6 @@
 import argparse
 import os
-from typing import Any, Optional, cast
+from typing import Any, Optional, Sequence, cast
 
 from langchain_core.documents import Document
 from langchain_core.embeddings import Embeddings
@@ -9,15 +9,21 @@ from langchain_core.runnables import RunnableSerializable
 from rich.console import Console
 
 from rag_bencher.config import BenchConfig, load_config
-from rag_bencher.eval.dataset_loader import load_texts_as_documents
-from rag_bencher.pipelines import naive_rag
+from rag_bencher.eval.dataset_loader import open_file_corpus
+from rag_bencher.pipelines.fingerprint import pipeline_fingerprint
 from rag_bencher.providers.base import build_chat_adapter, build_embeddings_adapter
 from rag_bencher.utils.cache import cache_get, cache_set
 from rag_bencher.utils.callbacks.usage import UsageTracker
+from rag_bencher.utils.factories import embedding_model_id
+from rag_bencher.utils.lazy import lazy_import
+from rag_bencher.utils.llm_cache import llm_cache
 from rag_bencher.utils.repro import set_seeds
 from rag_bencher.vector.base import VectorBackend, build_vector_backend
+from rag_bencher.vector.faiss_ann import ann_spec_from_config
 
 console = Console()
+# Loaded on first use so that ``--help`` and argument errors do not pay for the pipeline's imports.
+naive_rag = lazy_import("rag_bencher.pipelines.naive_rag")
 
 
 def _pick_llm(cfg: BenchConfig) -> RunnableSerializable[Any, Any]:
@@ -70,6 +76,14 @@ def _pick_llm(cfg: BenchConfig) -> RunnableSerializable[Any, Any]:
             return cast(RunnableSerializable[Any, Any], ChatOpenAI(model=cfg.model.name, temperature=0))
 
 
+def _llm_params(cfg: BenchConfig) -> dict[str, Any]:
+    """Describe the LLM :func:`_pick_llm` answers with, for the answer cache fingerprint."""
+    if getattr(cfg.runtime, "offline", False):
+        return {"backend": "hf", "model": os.getenv("RAG_BENCH_OFFLINE_MODEL", "google/flan-t5-small")}
+    backend = "provider" if getattr(cfg, "provider", None) else "openai"
+    return {"backend": backend, "model": cfg.model.name, "temperature": 0.0}
+
+
 def main() -> None:
     ap = argparse.ArgumentParser()
     ap.add_argument("--config", required=True)
@@ -88,7 +102,7 @@ def main() -> None:
     elif dev in ("cuda",):
         os.environ.setdefault("RAG_BENCH_DEVICE", "cuda")
 
-    docs: list[Document] = load_texts_as_documents(cfg.data.paths)
+    docs: Sequence[Document] = open_file_corpus(cfg.data.paths)
 
     # Embeddings: if you’re using the factory, it respects CPU/GPU globally.
     emb: Optional[Embeddings] = None
@@ -111,18 +125,48 @@ def main() -> None:
     llm_obj = _pick_llm(cfg)
 
     chain, _meta = naive_rag.build_chain(
-        docs, model=cfg.model.name, k=cfg.retriever.k, llm=llm_obj, embeddings=emb, retriever=retr
+        docs,
+        model=cfg.model.name,
+        k=cfg.retriever.k,
+        llm=llm_obj,
+        embeddings=emb,
+        retriever=retr,
+        index_spec=ann_spec_from_config(cfg.model_dump().get("vector")),
+        chunk_size=cfg.chunking.chunk_size,
+        chunk_overlap=cfg.chunking.chunk_overlap,
+        chunk_tokenizer=cfg.chunking.chunk_tokenizer(),
     )
 
+    # Keyed by everything that shapes the answer, so editing k, the corpus or the LLM never returns a stale one.
+    fingerprint = pipeline_fingerprint(
+        cfg,
+        docs,
+        pipeline_id="cli:naive",
+        prompts=naive_rag.PROMPTS,
+        llm=_llm_params(cfg),
+        embedding_model=(
+            (embedding_model_id(emb) or type(emb).__name__)
+            if emb is not None
+            else "sentence-transformers/all-MiniLM-L6-v2"
+        ),
+    )
     prompt = args.question
-    cached = cache_get(cfg.model.name, prompt)
+    cached = cache_get(fingerprint, prompt)
+    usage = UsageTracker(offline=getattr(cfg.runtime, "offline", False))
     if cached is None:
-        ans = chain.invoke(prompt, config={"callbacks": [UsageTracker()]})
-        cache_set(cfg.model.name, prompt, ans)
+        with llm_cache():
+            ans = chain.invoke(prompt, config={"callbacks": [usage]})
+        cache_set(fingerprint, prompt, ans)
     else:
         ans = cached
 
     console.print(ans)
+    u = usage.summary()
+    if u["calls"]:
+        console.print(
+            f"[dim]LLM calls: {u['calls']} ({u['cached_calls']} cached), tokens in/out: "
+            f"{u['input_tokens']}/{u['output_tokens']}, est. cost: ${u['cost_usd']:.6f}[/dim]"
+        )
 
 
 if __name__ == "__main__":  # pragma: no cover - exercised via CLI entrypoint
@@ -2,7 +2,7 @@ import os
 from typing import Any, Dict, List, Literal, Optional
 
 import yaml
-from pydantic import BaseModel, ConfigDict, Field, ValidationError
+from pydantic import BaseModel, ConfigDict, Field, ValidationError, model_validator
 
 
 class ModelCfg(BaseModel):
@@ -20,6 +20,24 @@ class DataCfg(BaseModel):
     paths: List[str]
 
 
+class ChunkingCfg(BaseModel):
+    model_config = ConfigDict(extra="forbid", strict=True)
+    unit: Literal["chars", "tokens"] = "chars"
+    chunk_size: int = Field(default=800, ge=1)
+    chunk_overlap: int = Field(default=120, ge=0)
+    tokenizer: str = "sentence-transformers/all-MiniLM-L6-v2"
+
+    @model_validator(mode="after")
+    def _overlap_below_size(self) -> "ChunkingCfg":
+        if self.chunk_overlap >= self.chunk_size:
+            raise ValueError("chunking.chunk_overlap must be smaller than chunking.chunk_size")
+        return self
+
+    def chunk_tokenizer(self) -> Optional[str]:
+        """Return the tokenizer chunk sizes are counted in, or ``None`` when they count characters."""
+        return self.tokenizer if self.unit == "tokens" else None
+
+
 class ProviderModelCfg(BaseModel):
     model_config = ConfigDict(extra="forbid", strict=True)
     name: str
@@ -41,13 +59,15 @@ class HydeCfg(BaseModel):
 class MultiQueryCfg(BaseModel):
     model_config = ConfigDict(extra="forbid", strict=True)
     n_queries: int = Field(3, ge=1, le=10)
+    context_k: Optional[int] = Field(None, ge=1, le=100)
 
 
 class RerankCfg(BaseModel):
     model_config = ConfigDict(extra="forbid", strict=True)
-    method: str = "cosine"
+    method: Literal["cosine", "cross_encoder"] = "cosine"
     top_k: int = Field(4, ge=1, le=50)
     cross_encoder_model: Optional[str] = "BAAI/bge-reranker-base"
+    max_batch_size: int = Field(32, ge=1, le=1024)
 
 
 class BenchConfig(BaseModel):
@@ -55,6 +75,7 @@ class BenchConfig(BaseModel):
     model: ModelCfg
     retriever: RetrieverCfg
     data: DataCfg
+    chunking: ChunkingCfg = ChunkingCfg()
     provider: ProviderModelCfg | None = None
     vector: Dict[str, Any] | None = None
     runtime: RuntimeCfg = RuntimeCfg()
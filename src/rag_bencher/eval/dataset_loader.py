@@ -1,10 +1,114 @@
+import glob
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Sequence, Union, overload
 
 from langchain_core.documents import Document
 
+# Files picked up when a directory is given instead of a file or glob.
+TEXT_SUFFIXES = (".txt", ".md")
+# Documents per batch yielded by iter_document_batches; at most two batches are held in memory.
+LOAD_BATCH_SIZE = 64
 
-def load_texts_as_documents(paths: list[str]) -> list[Document]:
-    docs: list[Document] = []
-    for p in paths:
-        docs.append(Document(page_content=Path(p).read_text(encoding="utf-8"), metadata={"source": p}))
-    return docs
+
+class FileCorpus(Sequence[Document]):
+    """Text files exposed as documents that are read on access.
+
+    Knowing the paths lets the corpus index sync incrementally, reading only files that changed.
+    """
+
+    def __init__(self, paths: Iterable[str]) -> None:
+        self.paths: List[str] = list(paths)
+        for p in self.paths:
+            if not Path(p).is_file():
+                raise FileNotFoundError(p)
+
+    def __len__(self) -> int:
+        """Return the number of files."""
+        return len(self.paths)
+
+    @overload
+    def __getitem__(self, index: int) -> Document:  # noqa: D105
+        ...
+
+    @overload
+    def __getitem__(self, index: slice) -> List[Document]:  # noqa: D105
+        ...
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[Document, List[Document]]:
+        """Read and return the document(s) at ``index``."""
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        return _read_document(self.paths[index])
+
+    def iter_batches(
+        self, batch_size: int = LOAD_BATCH_SIZE, workers: Optional[int] = None
+    ) -> Iterator[List[Document]]:
+        """Read the files in parallel, yielding documents in batches of ``batch_size``."""
+        return iter_document_batches(self.paths, batch_size=batch_size, workers=workers)
+
+
+def expand_paths(patterns: Iterable[str], suffixes: Sequence[str] = TEXT_SUFFIXES) -> List[str]:
+    """Expand files, glob patterns (``**`` recurses) and directories into a de-duplicated file list.
+
+    Directories contribute every file below them whose suffix is in ``suffixes``; glob matches
+    and directory contents are sorted. A pattern that matches no file raises ``FileNotFoundError``.
+    """
+    out: List[str] = []
+    for pattern in patterns:
+        path = Path(pattern)
+        if path.is_dir():
+            found = sorted(str(p) for p in path.rglob("*") if p.is_file() and p.suffix in suffixes)
+        elif any(ch in pattern for ch in "*?["):
+            found = sorted(p for p in glob.glob(pattern, recursive=True) if Path(p).is_file())
+        else:
+            found = [pattern]
+        if not found:
+            raise FileNotFoundError(f"No files match {pattern!r}")
+        out.extend(found)
+    return list(dict.fromkeys(out))
+
+
+def iter_document_batches(
+    paths: Iterable[str], *, batch_size: int = LOAD_BATCH_SIZE, workers: Optional[int] = None
+) -> Iterator[List[Document]]:
+    """Read ``paths`` with a thread pool and yield documents in order, ``batch_size`` at a time.
+
+    The next batch is read while the caller processes the current one, so at most two batches of
+    file contents are in memory regardless of corpus size.
+    """
+    if batch_size < 1:
+        raise ValueError("batch_size must be at least 1")
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending: Optional[List[Future[Document]]] = None
+        batch: List[str] = []
+        for path in paths:
+            batch.append(path)
+            if len(batch) == batch_size:
+                submitted = [pool.submit(_read_document, p) for p in batch]
+                batch = []
+                if pending is not None:
+                    yield [f.result() for f in pending]
+                pending = submitted
+        submitted = [pool.submit(_read_document, p) for p in batch]
+        if pending is not None:
+            yield [f.result() for f in pending]
+        if submitted:
+            yield [f.result() for f in submitted]
+
+
+def load_texts_as_documents(paths: list[str]) -> List[Document]:
+    """Read the files, globs and directories in ``paths`` into a list of documents.
+
+    Large corpora are better opened with :func:`open_file_corpus`, which reads files on access.
+    """
+    return [doc for batch in iter_document_batches(expand_paths(paths)) for doc in batch]
+
+
+def open_file_corpus(paths: list[str]) -> FileCorpus:
+    """Return the files, globs and directories in ``paths`` as a lazily read :class:`FileCorpus`."""
+    return FileCorpus(expand_paths(paths))
+
+
+def _read_document(path: str) -> Document:
+    return Document(page_content=Path(path).read_text(encoding="utf-8"), metadata={"source": path})
@@ -2,9 +2,7 @@ from __future__ import annotations
 
 from pathlib import Path
 
-from langchain_core.documents import Document
-
-from rag_bencher.eval.dataset_loader import load_texts_as_documents
+from rag_bencher.eval.dataset_loader import FileCorpus, expand_paths
 
 DATASETS_ROOT = Path("examples/datasets")
 
@@ -20,12 +18,13 @@ def list_datasets() -> list[str]:
     return sorted(set(out))
 
 
-def load_dataset(name: str) -> list[Document]:
-    """Load a dataset by name like 'docs/wiki' -> examples/datasets/docs/wiki/*.txt|*.md."""
+def load_dataset(name: str) -> FileCorpus:
+    """Load a dataset by name like 'docs/wiki' -> every *.txt|*.md below examples/datasets/docs/wiki."""
     path = DATASETS_ROOT / name
     if not path.exists():
         raise FileNotFoundError(f"Dataset {name!r} not found under {DATASETS_ROOT}")
-    files = [str(p) for p in path.glob("*.txt")] + [str(p) for p in path.glob("*.md")]
-    if not files:
-        raise FileNotFoundError(f"No .txt or .md files in dataset {name}")
-    return load_texts_as_documents(files)
+    try:
+        files = expand_paths([str(path)])
+    except FileNotFoundError:
+        raise FileNotFoundError(f"No .txt or .md files in dataset {name}") from None
+    return FileCorpus(files)
@@ -0,0 +1,265 @@
+from __future__ import annotations
+
+import json
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+from langchain_core.callbacks.base import BaseCallbackHandler
+
+from rag_bencher.eval.metrics import (
+    RETRIEVAL_CUTOFFS,
+    FloatArray,
+    Vocabulary,
+    bow_cosine,
+    bow_cosine_batch,
+    context_recall,
+    context_recall_batch,
+    lexical_f1,
+    lexical_f1_batch,
+    retrieval_scores,
+)
+from rag_bencher.pipelines.utils import debug_config
+from rag_bencher.utils.cache import cache_get, cache_set
+from rag_bencher.utils.tracing import StageTrace
+
+METRIC_KEYS = ("lexical_f1", "bow_cosine", "context_recall")
+# Scored only for QA examples that name their gold passages.
+RETRIEVAL_KEYS = (
+    *(f"recall@{c}" for c in RETRIEVAL_CUTOFFS),
+    "mrr",
+    *(f"ndcg@{c}" for c in RETRIEVAL_CUTOFFS),
+)
+# Scored for every row of a retrieval-only run, which has no answer to compare.
+CONTEXT_KEYS = ("context_recall",)
+# Questions sent through the retrieval stage at once by run_retrieval.
+RETRIEVAL_BATCH_SIZE = 256
+# Answered examples scored together by score_results; also the most rows a stopped run has not yet written.
+SCORE_BATCH_SIZE = 64
+# Optional QA fields listing the passages an answer needs, and the retrieved-entry field each is matched against.
+GOLD_FIELDS = (("gold_chunk_ids", "chunk_id"), ("gold_sources", "source"))
+
+Answer = Tuple[str, Mapping[str, Any]]
+
+
+@dataclass(frozen=True)
+class ExampleResult:
+    """Outcome of running one QA example through a chain; ``cached`` answers were not recomputed.
+
+    ``stages`` holds the seconds spent in each pipeline stage (see :mod:`rag_bencher.utils.tracing`).
+    """
+
+    example: Dict[str, Any]
+    answer: str
+    debug: Mapping[str, Any]
+    seconds: float
+    cached: bool = False
+    stages: Mapping[str, float] = field(default_factory=dict)
+
+
+def iter_jsonl(path: str) -> Iterator[Dict[str, Any]]:
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def retrieved_items(dbg: Mapping[str, Any]) -> List[Mapping[str, Any]]:
+    """Return the retrieved entries (or top rerank candidates) from a debug payload."""
+    if dbg.get("retrieved"):
+        return list(dbg["retrieved"])
+    if dbg.get("candidates"):
+        return list(dbg["candidates"][:5])
+    return []
+
+
+def ranked_items(dbg: Mapping[str, Any]) -> List[Mapping[str, Any]]:
+    """Return the full retrieval ranking from a debug payload (all rerank candidates, best first)."""
+    return list(dbg.get("retrieved") or dbg.get("candidates") or [])
+
+
+def gold_labels(ex: Mapping[str, Any], dbg: Mapping[str, Any]) -> Optional[Tuple[List[str], List[str]]]:
+    """Return the ranked retrieved ids and the gold ids of an example, or ``None`` without gold ids.
+
+    ``gold_chunk_ids`` are matched against chunk ids, ``gold_sources`` against document sources.
+    """
+    for gold_field, item_field in GOLD_FIELDS:
+        gold = ex.get(gold_field)
+        if gold:
+            ranked = [str(r.get(item_field)) for r in ranked_items(dbg) if r.get(item_field) is not None]
+            return ranked, [str(g) for g in gold]
+    return None
+
+
+def score_retrieval(ex: Mapping[str, Any], dbg: Mapping[str, Any]) -> Dict[str, float]:
+    """Return the :data:`RETRIEVAL_KEYS` metrics of one example, or nothing without gold ids."""
+    labels = gold_labels(ex, dbg)
+    if labels is None:
+        return {}
+    ranked, gold = labels
+    return {key: float(values[0]) for key, values in retrieval_scores([ranked], [gold]).items()}
+
+
+def retrieved_text(dbg: Mapping[str, Any]) -> str:
+    """Join the retrieved (or top rerank candidate) previews from a debug payload."""
+    return "\n".join(r.get("preview", "") for r in retrieved_items(dbg))
+
+
+def score_answer(answer: str, reference: str, dbg: Mapping[str, Any]) -> Dict[str, float]:
+    return {
+        "lexical_f1": lexical_f1(answer, reference),
+        "bow_cosine": bow_cosine(answer, reference),
+        **score_context(reference, dbg),
+    }
+
+
+def score_context(reference: str, dbg: Mapping[str, Any]) -> Dict[str, float]:
+    """Return the :data:`CONTEXT_KEYS` metrics, which need the retrieved context but no answer."""
+    retrieved = retrieved_text(dbg)
+    return {"context_recall": context_recall(reference, retrieved) if retrieved else 0.0}
+
+
+def score_answers(
+    answers: Sequence[str],
+    references: Sequence[str],
+    dbgs: Sequence[Mapping[str, Any]],
+    vocab: Optional[Vocabulary] = None,
+) -> Dict[str, FloatArray]:
+    """Vectorized :func:`score_answer`; returns one array per metric in :data:`METRIC_KEYS`.
+
+    Each answer, reference and retrieved context is tokenized once and the metrics are computed
+    with array operations, so rescoring a large results file takes seconds. Pass a shared
+    ``vocab`` when scoring a file in several batches.
+    """
+    vocab = vocab or Vocabulary()
+    preds = vocab.bags(answers)
+    refs = vocab.bags(references)
+    retrieved = vocab.bags(retrieved_text(d) for d in dbgs)
+    return {
+        "lexical_f1": lexical_f1_batch(preds, refs),
+        "bow_cosine": bow_cosine_batch(preds, refs),
+        # Same argument order as score_answer.
+        "context_recall": context_recall_batch(refs, retrieved),
+    }
+
+
+def score_results(
+    results: Iterable[ExampleResult], batch_size: int = SCORE_BATCH_SIZE
+) -> Iterator[Tuple[ExampleResult, Dict[str, float]]]:
+    """Yield each result with its :data:`METRIC_KEYS` and retrieval metrics, in completion order.
+
+    Results are scored ``batch_size`` at a time with :func:`score_answers`, sharing one vocabulary.
+    """
+    vocab = Vocabulary()
+    it = iter(results)
+    while batch := list(islice(it, max(1, batch_size))):
+        scores = score_answers(
+            [r.answer for r in batch], [r.example["reference_answer"] for r in batch], [r.debug for r in batch], vocab
+        )
+        for i, res in enumerate(batch):
+            metrics = {key: float(values[i]) for key, values in scores.items()}
+            metrics.update(score_retrieval(res.example, res.debug))
+            yield res, metrics
+
+
+def invoke_with_debug(
+    chain: Any,
+    debug: Callable[[], Mapping[str, Any]],
+    question: str,
+    trace: Optional[StageTrace] = None,
+    callbacks: Sequence[BaseCallbackHandler] = (),
+) -> Answer:
+    """Run ``chain`` on one question and return the answer with that invocation's debug payload.
+
+    Pipelines publish debug data into a per-call sink; chains that do not fall back to ``debug()``.
+    Stage timings are recorded into ``trace``, if given, and ``callbacks`` (e.g. a usage tracker)
+    see every model call.
+    """
+    sink: Dict[str, Any] = {}
+    config = debug_config(sink, trace)
+    if callbacks:
+        config["callbacks"] = list(callbacks)
+    answer = chain.invoke(question, config=config)
+    return answer, (sink or debug())
+
+
+def _run_example(
+    chain: Any,
+    debug: Callable[[], Mapping[str, Any]],
+    ex: Dict[str, Any],
+    cache_key: Optional[str] = None,
+    callbacks: Sequence[BaseCallbackHandler] = (),
+) -> ExampleResult:
+    start = time.perf_counter()
+    if cache_key is not None:
+        hit = cache_get(cache_key, ex["question"])
+        if isinstance(hit, dict) and isinstance(hit.get("answer"), str):
+            return ExampleResult(
+                example=ex,
+                answer=hit["answer"],
+                debug=hit.get("debug") or {},
+                seconds=time.perf_counter() - start,
+                cached=True,
+            )
+    trace = StageTrace()
+    answer, dbg = invoke_with_debug(chain, debug, ex["question"], trace, callbacks)
+    seconds = time.perf_counter() - start
+    if cache_key is not None:
+        # The debug payload is cached with the answer so context metrics can be scored on a hit.
+        cache_set(cache_key, ex["question"], {"answer": answer, "debug": json.loads(json.dumps(dbg, default=str))})
+    return ExampleResult(example=ex, answer=answer, debug=dbg, seconds=seconds, stages=trace.seconds())
+
+
+def run_examples(
+    chain: Any,
+    debug: Callable[[], Mapping[str, Any]],
+    examples: Iterable[Dict[str, Any]],
+    *,
+    concurrency: int = 1,
+    cache_key: Optional[str] = None,
+    callbacks: Sequence[BaseCallbackHandler] = (),
+) -> Iterator[ExampleResult]:
+    """Yield an :class:`ExampleResult` for each QA example in input order.
+
+    With ``concurrency > 1`` up to ``concurrency`` questions are in flight on a thread pool;
+    at most ``2 * concurrency`` results are buffered so memory stays flat for large QA sets.
+    With a ``cache_key`` (a pipeline fingerprint) answers are served from and saved to the
+    answer cache under that key and the question. ``callbacks`` are attached to every invocation.
+    """
+    if concurrency <= 1:
+        for ex in examples:
+            yield _run_example(chain, debug, ex, cache_key, callbacks)
+        return
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="rag-bencher-qa") as pool:
+        pending: Deque[Future[ExampleResult]] = deque()
+        for ex in examples:
+            pending.append(pool.submit(_run_example, chain, debug, ex, cache_key, callbacks))
+            if len(pending) >= 2 * concurrency:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def run_retrieval(
+    retrieve: Callable[[List[str], List[StageTrace]], Sequence[Mapping[str, Any]]],
+    examples: Iterable[Dict[str, Any]],
+    *,
+    batch_size: int = RETRIEVAL_BATCH_SIZE,
+) -> Iterator[ExampleResult]:
+    """Yield an answerless :class:`ExampleResult` per QA example, retrieving ``batch_size`` questions at a time.
+
+    ``retrieve`` maps questions to their debug payloads, recording each question's stage timings
+    into the matching trace (see ``PipelineSelection.retrieve``); ``seconds`` is the batch time
+    divided evenly over its questions.
+    """
+    it = iter(examples)
+    while batch := list(islice(it, max(1, batch_size))):
+        traces = [StageTrace() for _ in batch]
+        start = time.perf_counter()
+        dbgs = retrieve([ex["question"] for ex in batch], traces)
+        seconds = (time.perf_counter() - start) / len(batch)
+        for ex, dbg, trace in zip(batch, dbgs, traces, strict=True):
+            yield ExampleResult(example=ex, answer="", debug=dbg, seconds=seconds, stages=trace.seconds())
@@ -1,10 +1,50 @@
+from __future__ import annotations
+
+import math
+import re
 from collections import Counter
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Collection, Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+import numpy.typing as npt
+
+IntArray = npt.NDArray[np.int64]
+FloatArray = npt.NDArray[np.float64]
+
+# Runs of letters and digits: the tokens left by blanking every non-alphanumeric character.
+_WORD = re.compile(r"[^\W_]+")
+# Vocabulary.bags tokenizes a whole batch in one pass, with this character between texts as a token of its own.
+_SEP = "\x00"
+_WORD_OR_SEP = re.compile(r"[^\W_]+|\x00")
+
+
+def _ascii_table(keep: bytes) -> bytes:
+    # Byte translation that lowercases ASCII letters and blanks every other non-alphanumeric byte.
+    return bytes(c if chr(c).isalnum() or c in keep else 32 for c in bytes(range(128)).lower()) + bytes(range(128, 256))
+
+
+_ASCII = _ascii_table(b"")
+_ASCII_OR_SEP = _ascii_table(_SEP.encode())
+
+
+def _lower_tokens(s: str, sep: bool = False) -> list[str]:
+    if s.isascii():
+        # Fast path: one C-level translate and split instead of a regex scan.
+        return s.encode("ascii").translate(_ASCII_OR_SEP if sep else _ASCII).decode("ascii").split()
+    # Lowercasing can change the length of some non-ASCII characters, so tokens are cut first.
+    # A capital sigma always lowers to "σ" character by character, never to the final "ς".
+    return list(map(str.lower, (_WORD_OR_SEP if sep else _WORD).findall(s.replace("Σ", "σ"))))
+
 
+@lru_cache(maxsize=1024)
+def _tok(s: str) -> tuple[str, ...]:
+    """Tokenize a string: lowercase, strip punctuation, and split on whitespace.
 
-def _tok(s: str) -> list[str]:
-    """Tokenize a string: lowercase, strip punctuation, and split on whitespace."""
-    normalized = "".join(ch.lower() if ch.isalnum() else " " for ch in s)
-    return [t for t in normalized.split() if t]
+    Results are memoized, so scoring one answer against its reference and context tokenizes each once.
+    """
+    return tuple(_lower_tokens(s))
 
 
 def lexical_f1(p: str, r: str) -> float:
@@ -26,13 +66,7 @@ def bow_cosine(p: str, r: str) -> float:
         return 0.0
     keys = set(P) | set(R)
     dp = sum(P[k] * R[k] for k in keys)
-    import math
-
-    return (
-        0.0
-        if not P or not R
-        else dp / (math.sqrt(sum(v * v for v in P.values())) * math.sqrt(sum(v * v for v in R.values())))
-    )
+    return dp / (math.sqrt(sum(v * v for v in P.values())) * math.sqrt(sum(v * v for v in R.values())))
 
 
 def context_recall(context: str, reference: str) -> float:
@@ -47,3 +81,138 @@ def context_recall(context: str, reference: str) -> float:
     ctx_tokens = set(_tok(context))
     hits = len(ref_tokens & ctx_tokens)
     return hits / len(ref_tokens)
+
+
+@dataclass(frozen=True)
+class TokenBags:
+    """Bag-of-words of ``n`` texts as parallel arrays sorted by (row, token id).
+
+    Entry ``i`` says text ``rows[i]`` holds token ``ids[i]`` ``counts[i]`` times.
+    """
+
+    n: int
+    rows: IntArray
+    ids: IntArray
+    counts: IntArray
+
+
+class Vocabulary:
+    """Maps tokens to integer ids; bags built by the same vocabulary can be compared."""
+
+    def __init__(self) -> None:
+        self._ids: Dict[str, int] = {_SEP: 0}
+
+    def bags(self, texts: Iterable[str]) -> TokenBags:
+        """Tokenize each text once and return their token counts."""
+        texts = list(texts)
+        joined = f" {_SEP} ".join(texts)
+        if joined.count(_SEP) == max(0, len(texts) - 1):
+            tokens = _lower_tokens(joined, sep=True)
+        else:
+            tokens = []
+            for i, text in enumerate(texts):
+                tokens.extend(((_SEP,) if i else ()) + _tok(text))
+        ids = self._ids
+        for t in dict.fromkeys(tokens):
+            if t not in ids:
+                ids[t] = len(ids)
+        flat = np.fromiter(map(ids.__getitem__, tokens), dtype=np.int64, count=len(tokens))
+        sep = flat == 0
+        rows = np.cumsum(sep)[~sep]
+        stride = len(ids)
+        keys, counts = np.unique(rows * stride + flat[~sep], return_counts=True)
+        return TokenBags(len(texts), keys // stride, keys % stride, counts.astype(np.int64))
+
+
+def _shared(a: TokenBags, b: TokenBags) -> Tuple[IntArray, IntArray, IntArray]:
+    # Rows and counts of the (row, token) pairs present in both bags.
+    if a.n != b.n:
+        raise ValueError(f"Cannot compare {a.n} texts with {b.n}")
+    stride = int(max(a.ids.max(initial=0), b.ids.max(initial=0))) + 1
+    _, ia, ib = np.intersect1d(
+        a.rows * stride + a.ids, b.rows * stride + b.ids, assume_unique=True, return_indices=True
+    )
+    return a.rows[ia], a.counts[ia], b.counts[ib]
+
+
+def _per_row(bags: TokenBags, values: IntArray) -> FloatArray:
+    return np.bincount(bags.rows, weights=values, minlength=bags.n)
+
+
+def _ratio(num: FloatArray, den: FloatArray) -> FloatArray:
+    # bincount of an empty batch (no shared tokens) yields integers even with weights.
+    out = np.zeros(num.shape, dtype=np.float64)
+    np.divide(num, den, out=out, where=den > 0)
+    return out
+
+
+def lexical_f1_batch(preds: TokenBags, refs: TokenBags) -> FloatArray:
+    """Return :func:`lexical_f1` of every (prediction, reference) row."""
+    rows, cp, cr = _shared(preds, refs)
+    overlap = np.bincount(rows, weights=np.minimum(cp, cr), minlength=preds.n)
+    # 2PR/(P+R) with P = overlap/|pred| and R = overlap/|ref| reduces to 2*overlap/(|pred|+|ref|).
+    return _ratio(2 * overlap, _per_row(preds, preds.counts) + _per_row(refs, refs.counts))
+
+
+def bow_cosine_batch(preds: TokenBags, refs: TokenBags) -> FloatArray:
+    """Return :func:`bow_cosine` of every (prediction, reference) row."""
+    rows, cp, cr = _shared(preds, refs)
+    dot = np.bincount(rows, weights=cp * cr, minlength=preds.n)
+    norms = np.sqrt(_per_row(preds, preds.counts**2) * _per_row(refs, refs.counts**2))
+    return _ratio(dot, norms)
+
+
+def context_recall_batch(contexts: TokenBags, references: TokenBags) -> FloatArray:
+    """Return :func:`context_recall` of every (context, reference) row."""
+    rows, _, _ = _shared(contexts, references)
+    hits = np.bincount(rows, minlength=contexts.n).astype(np.float64)
+    return _ratio(hits, np.bincount(references.rows, minlength=references.n).astype(np.float64))
+
+
+# Rank cutoffs of the retrieval metrics; the deepest one also bounds MRR.
+RETRIEVAL_CUTOFFS = (1, 5, 10)
+
+
+def retrieval_scores(
+    ranked: Sequence[Sequence[str]], gold: Sequence[Collection[str]], cutoffs: Sequence[int] = RETRIEVAL_CUTOFFS
+) -> Dict[str, FloatArray]:
+    """Score ranked retrieval results against gold ids, one row per query.
+
+    Returns ``recall@c`` and ``ndcg@c`` for each cutoff ``c`` plus ``mrr``, with binary relevance.
+    A gold id retrieved several times (e.g. a gold source split into many chunks) counts at its
+    first rank only. Rows without gold ids score 0.
+    """
+    if len(ranked) != len(gold):
+        raise ValueError(f"Cannot score {len(ranked)} rankings against {len(gold)} gold sets")
+    n, depth = len(ranked), max(cutoffs)
+    ids: Dict[str, int] = {}
+    grid = np.full((n, depth), -1, dtype=np.int64)
+    for i, items in enumerate(ranked):
+        row = [ids.setdefault(x, len(ids)) for x in items[:depth]]
+        grid[i, : len(row)] = row
+    gold_rows: List[int] = []
+    gold_ids: List[int] = []
+    for i, labels in enumerate(gold):
+        for x in set(labels):
+            gold_rows.append(i)
+            gold_ids.append(ids.setdefault(x, len(ids)))
+    stride = len(ids) + 1
+    keys = np.arange(n, dtype=np.int64)[:, None] * stride + grid
+    hit = (grid >= 0) & np.isin(keys, np.asarray(gold_rows, dtype=np.int64) * stride + gold_ids)
+    # Keep the first occurrence of each (row, id) pair.
+    first = np.zeros(n * depth, dtype=bool)
+    first[np.unique(keys.ravel(), return_index=True)[1]] = True
+    hit &= first.reshape(n, depth)
+
+    n_gold = np.bincount(np.asarray(gold_rows, dtype=np.int64), minlength=n).astype(np.float64)
+    discounts = 1.0 / np.log2(np.arange(2, depth + 2))
+    ideal = np.concatenate(([0.0], np.cumsum(discounts)))
+    out: Dict[str, FloatArray] = {}
+    for c in cutoffs:
+        out[f"recall@{c}"] = _ratio(hit[:, :c].sum(axis=1).astype(np.float64), n_gold)
+    found = hit.any(axis=1)
+    out["mrr"] = np.where(found, 1.0 / (hit.argmax(axis=1) + 1), 0.0)
+    for c in cutoffs:
+        dcg = (hit[:, :c] * discounts[:c]).sum(axis=1)
+        out[f"ndcg@{c}"] = _ratio(dcg, ideal[np.minimum(n_gold, c).astype(np.int64)])
+    return out
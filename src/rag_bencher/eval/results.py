@@ -0,0 +1,250 @@
+from __future__ import annotations
+
+import json
+import os
+import time
+from pathlib import Path
+from types import TracebackType
+from typing import IO, Any, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Set, Tuple, Type, Union
+
+import numpy as np
+
+from rag_bencher.eval.harness import METRIC_KEYS, RETRIEVAL_KEYS, ExampleResult, ranked_items, retrieved_items
+from rag_bencher.utils.tracing import STAGES
+
+# Rows are flushed to the OS after every write; fsync (the expensive part) is batched.
+FSYNC_EVERY = 50
+FSYNC_INTERVAL_S = 5.0
+# Latency percentiles reported for the whole example and each pipeline stage.
+PERCENTILES = (50, 95, 99)
+
+
+def example_id(ex: Mapping[str, Any], index: int) -> str:
+    """Return the question id of a QA example, falling back to its position in the file."""
+    value = ex.get("id")
+    return str(index) if value is None else str(value)
+
+
+def with_ids(examples: Iterable[Dict[str, Any]], skip: Optional[Set[str]] = None) -> Iterator[Dict[str, Any]]:
+    """Yield examples with an ``id`` set, leaving out those whose id is in ``skip``."""
+    for index, ex in enumerate(examples):
+        qid = example_id(ex, index)
+        if skip and qid in skip:
+            continue
+        yield {**ex, "id": qid}
+
+
+def result_row(result: ExampleResult, metrics: Mapping[str, float], **fields: Any) -> Dict[str, Any]:
+    """Build the JSONL row recorded for one answered example."""
+    ex = result.example
+    return {
+        **fields,
+        "id": ex.get("id"),
+        "question": ex.get("question"),
+        "answer": result.answer,
+        "retrieved": [
+            {k: r[k] for k in ("source", "chunk_id", "preview", "score") if k in r}
+            for r in retrieved_items(result.debug)
+        ],
+        "metrics": dict(metrics),
+        "timings": row_timings(result),
+        "cached": result.cached,
+    }
+
+
+def retrieval_row(result: ExampleResult, metrics: Mapping[str, float], **fields: Any) -> Dict[str, Any]:
+    """Build the JSONL row recorded for one example of a retrieval-only run: the full ranking, no answer."""
+    ex = result.example
+    return {
+        **fields,
+        "id": ex.get("id"),
+        "question": ex.get("question"),
+        "retrieved": [
+            {k: r[k] for k in ("source", "chunk_id", "preview", "score") if k in r} for r in ranked_items(result.debug)
+        ],
+        "metrics": dict(metrics),
+        "timings": row_timings(result),
+    }
+
+
+def row_timings(result: ExampleResult) -> Dict[str, float]:
+    """Return the ``timings`` of a row: ``total_s`` plus ``<stage>_s`` for each traced pipeline stage."""
+    return {"total_s": round(result.seconds, 6), **{f"{k}_s": round(v, 6) for k, v in result.stages.items()}}
+
+
+class MetricTotals:
+    """Running metric sums, so averages need no per-row storage.
+
+    Retrieval metrics are averaged over the rows that have them (examples with gold ids) and
+    only reported once one has been seen.
+    """
+
+    def __init__(self, keys: Sequence[str] = METRIC_KEYS) -> None:
+        self.count = 0
+        self.keys = tuple(keys)
+        self._sums: Dict[str, float] = dict.fromkeys(self.keys, 0.0)
+        self._counts: Dict[str, int] = {}
+
+    def add(self, metrics: Mapping[str, Any]) -> None:
+        self.count += 1
+        for k in self.keys:
+            self._sums[k] += float(metrics.get(k, 0.0))
+        for k in RETRIEVAL_KEYS:
+            if k in metrics:
+                self._sums[k] = self._sums.get(k, 0.0) + float(metrics[k])
+                self._counts[k] = self._counts.get(k, 0) + 1
+
+    def averages(self) -> Dict[str, float]:
+        out: Dict[str, float] = {}
+        for k, v in self._sums.items():
+            n = self._counts.get(k, self.count)
+            out[k] = v / n if n else 0.0
+        return out
+
+
+class StageLatencies:
+    """Per-row latencies of a run, summarized as :data:`PERCENTILES` for the total and each stage.
+
+    Rows answered from the cache are skipped: nothing ran, so their timings say nothing about the pipeline.
+    """
+
+    def __init__(self) -> None:
+        self._samples: Dict[str, List[float]] = {}
+
+    def add(self, row: Mapping[str, Any]) -> None:
+        """Record the ``timings`` of a results row."""
+        if row.get("cached"):
+            return
+        for key, value in (row.get("timings") or {}).items():
+            if key.endswith("_s") and isinstance(value, (int, float)):
+                self._samples.setdefault(key[:-2], []).append(float(value))
+
+    def percentiles(self) -> Dict[str, Dict[str, float]]:
+        """Return ``{"total": {"p50": ..., "p95": ..., "p99": ...}, <stage>: {...}}`` in seconds."""
+        order = {name: i for i, name in enumerate(("total", *STAGES))}
+        out: Dict[str, Dict[str, float]] = {}
+        for name in sorted(self._samples, key=lambda n: (order.get(n, len(order)), n)):
+            values = np.percentile(np.asarray(self._samples[name]), PERCENTILES)
+            out[name] = {f"p{p}": round(float(v), 6) for p, v in zip(PERCENTILES, values, strict=True)}
+        return out
+
+
+class ResultsSink:
+    """Append-only JSONL writer for per-question benchmark results.
+
+    Each row is flushed as soon as it is written; ``os.fsync`` runs every ``fsync_every``
+    rows or ``fsync_interval`` seconds, whichever comes first, and on close. A partial
+    trailing line left behind by a crash is dropped when the file is reopened.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        *,
+        fsync_every: int = FSYNC_EVERY,
+        fsync_interval: float = FSYNC_INTERVAL_S,
+    ) -> None:
+        self.path = Path(path)
+        self.fsync_every = max(1, fsync_every)
+        self.fsync_interval = fsync_interval
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        _drop_partial_line(self.path)
+        self._fh: IO[str] = open(self.path, "a", encoding="utf-8")
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def write(self, row: Mapping[str, Any]) -> None:
+        self._fh.write(json.dumps(row, ensure_ascii=False, default=str) + "\n")
+        self._fh.flush()
+        self._unsynced += 1
+        if self._unsynced >= self.fsync_every or time.monotonic() - self._last_sync >= self.fsync_interval:
+            self.sync()
+
+    def sync(self) -> None:
+        """Force written rows to stable storage."""
+        self._fh.flush()
+        os.fsync(self._fh.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def close(self) -> None:
+        if self._fh.closed:
+            return
+        self.sync()
+        self._fh.close()
+
+    def __enter__(self) -> "ResultsSink":
+        """Return the sink for use in a ``with`` block."""
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc: Optional[BaseException],
+        tb: Optional[TracebackType],
+    ) -> None:
+        """Sync and close the results file."""
+        self.close()
+
+
+def read_results(path: Union[str, Path]) -> Iterator[Dict[str, Any]]:
+    """Yield rows from a results file, skipping blank or truncated lines."""
+    p = Path(path)
+    if not p.exists():
+        return
+    with open(p, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(row, dict):
+                yield row
+
+
+def load_completed(
+    path: Union[str, Path],
+    *,
+    config: Optional[str] = None,
+    keys: Sequence[str] = METRIC_KEYS,
+    latency: Optional[StageLatencies] = None,
+) -> Tuple[Set[str], MetricTotals]:
+    """Return the ids already answered in ``path`` and the running totals of their ``keys`` metrics.
+
+    With ``config`` set only rows recorded for that config are considered. The timings of those
+    rows are added to ``latency``, if given.
+    """
+    done: Set[str] = set()
+    totals = MetricTotals(keys)
+    for row in read_results(path):
+        if config is not None and row.get("config") != config:
+            continue
+        qid = row.get("id")
+        if qid is None or str(qid) in done:
+            continue
+        done.add(str(qid))
+        totals.add(row.get("metrics") or {})
+        if latency is not None:
+            latency.add(row)
+    return done, totals
+
+
+def _drop_partial_line(path: Path) -> None:
+    if not path.exists():
+        return
+    with open(path, "rb+") as fh:
+        end = fh.seek(0, os.SEEK_END)
+        pos = end
+        while pos > 0:
+            step = min(4096, pos)
+            fh.seek(pos - step)
+            chunk = fh.read(step)
+            newline = chunk.rfind(b"\n")
+            if newline != -1:
+                pos = pos - step + newline + 1
+                break
+            pos -= step
+        if pos != end:
+            fh.truncate(pos)
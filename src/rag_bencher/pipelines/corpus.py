@@ -0,0 +1,325 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, cast
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+from rag_bencher.eval.dataset_loader import LOAD_BATCH_SIZE, FileCorpus
+from rag_bencher.utils.chunking import DEFAULT_CHUNK_OVERLAP, DEFAULT_CHUNK_SIZE, Chunker, ChunkParams
+from rag_bencher.utils.embedding_cache import embed_queries, with_embedding_cache
+from rag_bencher.utils.factories import embedding_model_id
+from rag_bencher.utils.hashing import document_hash, text_hash
+from rag_bencher.utils.ingest import IngestStats, ingest
+from rag_bencher.vector.faiss_ann import (
+    RECALL_BLOCK_ROWS,
+    AnnSpec,
+    ann_recall,
+    ann_spec_from_env,
+    build_faiss_ann,
+    describe,
+    effective_spec,
+    index_vector_blocks,
+)
+from rag_bencher.vector.file_index import SyncStats
+from rag_bencher.vector.local import (
+    build_local_vectorstore,
+    load_local_vectorstore,
+    save_local_vectorstore,
+    sync_file_index,
+)
+
+# Public env knob: RAG_BENCH_DISABLE_INDEX_CACHE=1 stops saving/loading indexes under INDEX_ROOT.
+DISABLE_INDEX_CACHE_ENV = "RAG_BENCH_DISABLE_INDEX_CACHE"
+INDEX_ROOT = Path(".ragbencher_cache") / "indexes"
+
+
+@dataclass(frozen=True)
+class CorpusIndexKey:
+    """Identity of a chunked and embedded corpus."""
+
+    doc_hashes: tuple[str, ...]
+    chunk_size: int
+    chunk_overlap: int
+    embedding_model: str
+    index_spec: Optional[AnnSpec] = None
+    chunk_tokenizer: Optional[str] = None
+
+    def digest(self) -> str:
+        """Return a stable hash of the key, used to name and validate persisted indexes."""
+        return text_hash(json.dumps(asdict(self), sort_keys=True))
+
+
+@dataclass(frozen=True)
+class CorpusIndex:
+    """Chunks of a corpus together with the vector store built over them.
+
+    ``embeddings`` is the (possibly cache-wrapped) model the store was built with. When the
+    index was loaded from disk ``splits`` reads chunks lazily from the saved chunk file.
+    ``sync_stats`` reports what an incremental file index sync re-embedded and ``ingest_stats``
+    the per-stage throughput of the chunking and embedding done to build the index. ``ann_spec``
+    is the approximate index actually built, which can differ from ``key.index_spec`` on small corpora.
+    """
+
+    key: Optional[CorpusIndexKey]
+    splits: Sequence[Document]
+    vectorstore: VectorStore
+    embeddings: Embeddings
+    sync_stats: Optional[SyncStats] = None
+    ingest_stats: Optional[IngestStats] = None
+    ann_spec: Optional[AnnSpec] = None
+
+    def recall(self, questions: Sequence[str], k: int) -> Optional[float]:
+        """Recall@k of an approximate index against exact search for ``questions``; ``None`` for exact indexes."""
+        if self.ann_spec is None:
+            return None
+        index = cast(Any, self.vectorstore).index
+        queries = embed_queries(self.embeddings, list(questions))
+        exact: Iterable[Any]
+        if self.ann_spec.kind == "ivf_pq":
+            # PQ codes are lossy, so exact vectors are re-read block by block from the (normally cached) model.
+            exact = (
+                self.embeddings.embed_documents([d.page_content for d in self.splits[i : i + RECALL_BLOCK_ROWS]])
+                for i in range(0, len(self.splits), RECALL_BLOCK_ROWS)
+            )
+        else:
+            exact = index_vector_blocks(index)
+        return ann_recall(index, exact, queries, k)
+
+
+_INDEXES: dict[CorpusIndexKey, CorpusIndex] = {}
+_LOCK = threading.Lock()
+_RECORDING = threading.local()
+
+
+@contextmanager
+def recording_indexes() -> Iterator[List[CorpusIndex]]:
+    """Collect the indexes :func:`get_corpus_index` hands out on this thread while the block runs."""
+    previous = getattr(_RECORDING, "indexes", None)
+    used: List[CorpusIndex] = []
+    _RECORDING.indexes = used
+    try:
+        yield used
+    finally:
+        _RECORDING.indexes = previous
+
+
+def corpus_index_key(
+    docs: Sequence[Document],
+    embeddings: Embeddings,
+    *,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    chunk_overlap: int = DEFAULT_CHUNK_OVERLAP,
+    chunk_tokenizer: Optional[str] = None,
+    index_spec: Optional[AnnSpec] = None,
+) -> Optional[CorpusIndexKey]:
+    """Return the sharing key for ``docs`` or ``None`` when the embedding model cannot be identified."""
+    model_id = embedding_model_id(embeddings)
+    if model_id is None:
+        return None
+    return CorpusIndexKey(
+        doc_hashes=tuple(document_hash(d) for d in docs),
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        embedding_model=model_id,
+        index_spec=index_spec,
+        chunk_tokenizer=chunk_tokenizer,
+    )
+
+
+def get_corpus_index(
+    docs: Sequence[Document],
+    embeddings: Embeddings,
+    *,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    chunk_overlap: int = DEFAULT_CHUNK_OVERLAP,
+    chunk_tokenizer: Optional[str] = None,
+    index_spec: Optional[AnnSpec] = None,
+) -> CorpusIndex:
+    """Split and embed ``docs``, reusing an index built earlier in this process when the key matches.
+
+    Indexes are keyed by document content hashes, chunking parameters and the embedding
+    model id, so a multi-config sweep only embeds the corpus once per unique setup. Backends
+    with an on-disk format also persist the index under :data:`INDEX_ROOT`, so later processes
+    map it instead of re-chunking and re-embedding.
+
+    A :class:`FileCorpus` is synced into a per-file index instead: only files whose content
+    changed since the last run are re-chunked and re-embedded.
+
+    ``chunk_tokenizer`` names a fast tokenizer and makes chunk sizes count its tokens instead of characters.
+
+    ``index_spec`` (or ``RAG_BENCH_VECTORSTORE=faiss-<kind>``) selects an approximate FAISS index.
+    """
+    spec = index_spec or ann_spec_from_env()
+    params = ChunkParams(chunk_size, chunk_overlap, chunk_tokenizer)
+    index = _file_corpus_index(docs, embeddings, params) if spec is None else None
+    if index is None:
+        key = corpus_index_key(
+            docs,
+            embeddings,
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            chunk_tokenizer=chunk_tokenizer,
+            index_spec=spec,
+        )
+        if key is None:
+            index = _build_index(None, docs, embeddings, params, spec)
+        else:
+            with _LOCK:
+                shared = _INDEXES.get(key)
+                if shared is None:
+                    shared = _build_index(key, docs, embeddings, params, spec)
+                    _INDEXES[key] = shared
+            index = shared
+    recorded = getattr(_RECORDING, "indexes", None)
+    if recorded is not None:
+        recorded.append(index)
+    return index
+
+
+def ann_indexes() -> list[CorpusIndex]:
+    """Return the shared indexes built with an approximate FAISS index."""
+    with _LOCK:
+        return [index for index in _INDEXES.values() if index.ann_spec is not None]
+
+
+def ann_report(
+    questions: Sequence[str], k: int, indexes: Optional[Iterable[CorpusIndex]] = None
+) -> List[Dict[str, Any]]:
+    """Return the settings and recall@k against exact search of the approximate ``indexes``.
+
+    ``indexes`` defaults to every approximate index built so far; exact indexes among them are skipped.
+    """
+    rows: List[Dict[str, Any]] = []
+    # An index handed out more than once is reported once.
+    unique = {id(index): index for index in (ann_indexes() if indexes is None else indexes)}
+    for index in unique.values():
+        if index.ann_spec is not None:
+            rows.append({**describe(index.ann_spec), "k": k, "recall": index.recall(questions, k)})
+    return rows
+
+
+def ingest_report(indexes: Optional[Iterable[CorpusIndex]] = None) -> List[Dict[str, Any]]:
+    """Return the per-stage ingest throughput of the ``indexes`` that were chunked or embedded.
+
+    ``indexes`` defaults to every index built in this process.
+    """
+    if indexes is None:
+        with _LOCK:
+            indexes = list(_INDEXES.values())
+    unique = {id(index): index for index in indexes}
+    return [
+        {"embedding_model": index.key.embedding_model if index.key else None, **index.ingest_stats.as_dict()}
+        for index in unique.values()
+        if index.ingest_stats is not None
+    ]
+
+
+def clear_corpus_indexes() -> None:
+    """Drop every shared index held by this process."""
+    with _LOCK:
+        _INDEXES.clear()
+
+
+def _build_index(
+    key: Optional[CorpusIndexKey],
+    docs: Sequence[Document],
+    embeddings: Embeddings,
+    params: ChunkParams,
+    spec: Optional[AnnSpec] = None,
+) -> CorpusIndex:
+    embed = with_embedding_cache(embeddings)
+    # Only the exact NumPy store has an on-disk format; ANN indexes are rebuilt per process.
+    directory = None if spec is not None else _index_dir(key)
+    if key is not None and directory is not None:
+        stored = load_local_vectorstore(directory, embed, model_id=key.embedding_model, corpus_hash=key.digest())
+        if stored is not None:
+            return CorpusIndex(key=key, splits=stored.chunks, vectorstore=stored, embeddings=embed)
+    chunker = Chunker(params)
+    # File corpora are read in parallel batches so raw file contents never all sit in memory at once.
+    if isinstance(docs, FileCorpus):
+        batches: Iterable[List[Document]] = docs.iter_batches()
+    else:
+        listed = list(docs)
+        batches = (listed[i : i + LOAD_BATCH_SIZE] for i in range(0, len(listed), LOAD_BATCH_SIZE))
+    splits: List[Document] = []
+    blocks: List[Any] = []
+
+    def collect(chunks: List[Document], vectors: Any) -> None:
+        splits.extend(chunks)
+        blocks.append(vectors)
+
+    # Chunks carry stable chunk ids, so retrieval fuses and deduplicates hits by chunk rather than by text.
+    stats = ingest(batches, chunker, embed, collect)
+    vectors = np.concatenate(blocks) if blocks else None
+    if spec is not None:
+        spec = effective_spec(spec, len(splits))
+        vectorstore = build_faiss_ann(splits, embed, spec, vectors=vectors)
+    else:
+        vectorstore = build_local_vectorstore(splits, embed, vectors=vectors)
+    if key is not None and directory is not None:
+        save_local_vectorstore(vectorstore, directory, model_id=key.embedding_model, corpus_hash=key.digest())
+    return CorpusIndex(
+        key=key, splits=splits, vectorstore=vectorstore, embeddings=embed, ingest_stats=stats, ann_spec=spec
+    )
+
+
+def _file_corpus_index(docs: Sequence[Document], embeddings: Embeddings, params: ChunkParams) -> Optional[CorpusIndex]:
+    if not isinstance(docs, FileCorpus) or _index_cache_disabled():
+        return None
+    model_id = embedding_model_id(embeddings)
+    if model_id is None:
+        return None
+    # Keyed by path: the sync itself notices edits, so the files are not read to build the key.
+    key = CorpusIndexKey(
+        doc_hashes=tuple(f"file:{p}" for p in docs.paths),
+        chunk_size=params.chunk_size,
+        chunk_overlap=params.chunk_overlap,
+        embedding_model=model_id,
+        chunk_tokenizer=params.tokenizer,
+    )
+    with _LOCK:
+        shared = _INDEXES.get(key)
+        if shared is not None:
+            return shared
+        embed = with_embedding_cache(embeddings)
+        tag = params.tag()
+        synced = sync_file_index(
+            INDEX_ROOT / f"files-{text_hash(f'{model_id}|{tag}')[:24]}",
+            docs.paths,
+            embed,
+            Chunker(params),
+            model_id=model_id,
+            params=tag,
+        )
+        if synced is None:
+            return None
+        store, stats = synced
+        shared = CorpusIndex(
+            key=key,
+            splits=store.live_chunks,
+            vectorstore=store,
+            embeddings=embed,
+            sync_stats=stats,
+            ingest_stats=stats.ingest,
+        )
+        _INDEXES[key] = shared
+    return shared
+
+
+def _index_cache_disabled() -> bool:
+    return (os.getenv(DISABLE_INDEX_CACHE_ENV) or "").strip().lower() in {"1", "true", "yes", "on"}
+
+
+def _index_dir(key: Optional[CorpusIndexKey]) -> Optional[Path]:
+    if key is None or _index_cache_disabled():
+        return None
+    return INDEX_ROOT / key.digest()[:24]
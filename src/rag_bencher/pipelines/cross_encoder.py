@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+import threading
+from functools import lru_cache
+from typing import Any, Dict, List, Sequence
+
+from rag_bencher.utils.torch_utils import device_str
+
+DEFAULT_MAX_BATCH_SIZE = 32
+DEFAULT_MAX_LENGTH = 512
+
+
+class CrossEncoderScorer:
+    """Scores (question, passage) pairs with a sequence-classification reranker.
+
+    Pairs are tokenized once, sorted by token length and run in padded batches of at
+    most ``max_batch_size`` so short passages are not padded out to the longest one.
+    """
+
+    def __init__(self, tokenizer: Any, model: Any, *, device: str = "cpu", max_length: int = DEFAULT_MAX_LENGTH):
+        self.tokenizer = tokenizer
+        self.model = model
+        self.device = device
+        self.max_length = max_length
+        # One forward pass at a time keeps peak memory at a single batch when questions run concurrently.
+        self._lock = threading.Lock()
+
+    def score(
+        self, question: str, passages: Sequence[str], *, max_batch_size: int = DEFAULT_MAX_BATCH_SIZE
+    ) -> List[float]:
+        """Return one relevance score per passage, in input order; higher is more relevant."""
+        if not passages:
+            return []
+        import torch
+
+        enc = self.tokenizer([question] * len(passages), list(passages), truncation=True, max_length=self.max_length)
+        order = sorted(range(len(passages)), key=lambda i: len(enc["input_ids"][i]))
+        scores = [0.0] * len(passages)
+        step = max(1, max_batch_size)
+        for start in range(0, len(order), step):
+            bucket = order[start : start + step]
+            features: Dict[str, Any] = {key: [enc[key][i] for i in bucket] for key in enc.keys()}
+            batch = self.tokenizer.pad(features, padding=True, return_tensors="pt")
+            with self._lock, torch.inference_mode():
+                logits = self.model(**{k: v.to(self.device) for k, v in batch.items()}).logits
+            # Single-logit rerankers (bge, ms-marco) score directly; otherwise take the "relevant" class.
+            values = logits[:, 0] if logits.shape[-1] == 1 else logits[:, -1]
+            for i, value in zip(bucket, values.float().cpu().tolist(), strict=True):
+                scores[i] = float(value)
+        return scores
+
+
+@lru_cache(maxsize=None)
+def load_cross_encoder(model_name: str, device: str | None = None) -> CrossEncoderScorer:
+    """Load ``model_name`` once per process and device (defaults to the global device policy)."""
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    dev = device or device_str()
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModelForSequenceClassification.from_pretrained(model_name)
+    model.to(dev)
+    model.eval()
+    return CrossEncoderScorer(tokenizer, model, device=dev)
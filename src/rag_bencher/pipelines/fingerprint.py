@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+import json
+import os
+from typing import Any, Mapping, Optional, Sequence
+
+from langchain_core.documents import Document
+
+from rag_bencher.eval.dataset_loader import FileCorpus
+from rag_bencher.utils.hashing import document_hash, text_hash
+
+# Bump when the answer a pipeline produces changes for reasons the fingerprint cannot see.
+FINGERPRINT_VERSION = 1
+
+
+def corpus_fingerprint(docs: Sequence[Document]) -> str:
+    """Return a hash of the corpus content.
+
+    A :class:`FileCorpus` is hashed by path, size and mtime instead, so computing the
+    fingerprint never reads the files; touching a file therefore counts as a change.
+    """
+    if isinstance(docs, FileCorpus):
+        parts = []
+        for path in docs.paths:
+            st = os.stat(path)
+            parts.append(f"{path}\x00{st.st_size}\x00{st.st_mtime_ns}")
+        return text_hash("\x01".join(parts))
+    return text_hash("\x01".join(document_hash(d) for d in docs))
+
+
+def pipeline_fingerprint(
+    cfg: Any,
+    docs: Sequence[Document],
+    *,
+    pipeline_id: str,
+    prompts: Sequence[str],
+    llm: Mapping[str, Any],
+    embedding_model: Optional[str],
+) -> str:
+    """Return a hash identifying everything that determines a pipeline's answers.
+
+    It covers the config (minus the data paths, which the corpus hash replaces, and the device),
+    the corpus content, the embedding model, the prompt templates and the answering LLM.
+    Answers cached under the same fingerprint and question can be reused.
+    """
+    config = dict(cfg.model_dump())
+    config.pop("data", None)
+    runtime = config.get("runtime")
+    if isinstance(runtime, dict):
+        config["runtime"] = {k: v for k, v in runtime.items() if k != "device"}
+    payload = {
+        "version": FINGERPRINT_VERSION,
+        "pipeline": pipeline_id,
+        "config": config,
+        "corpus": corpus_fingerprint(docs),
+        "embedding_model": embedding_model,
+        "prompts": list(prompts),
+        "llm": dict(llm),
+    }
+    return "pipeline:" + text_hash(json.dumps(payload, sort_keys=True, default=str))
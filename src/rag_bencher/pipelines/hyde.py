@@ -1,42 +1,69 @@
-from typing import Any, Callable, Dict, List, Optional, cast
+from typing import Any, Callable, Dict, List, Optional, Sequence, cast
 
 from langchain_core.documents import Document
 from langchain_core.embeddings import Embeddings
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import PromptTemplate
-from langchain_core.runnables import RunnableLambda, RunnablePassthrough, RunnableSerializable
-from langchain_openai import ChatOpenAI
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+from langchain_core.runnables import RunnableConfig, RunnableLambda, RunnablePassthrough, RunnableSerializable
 
 from rag_bencher.pipelines.base import BuildResult
-from rag_bencher.pipelines.utils import has_openai_key, resolve_chat_llm
+from rag_bencher.pipelines.corpus import get_corpus_index
+from rag_bencher.pipelines.utils import (
+    ANSWER_PROMPT,
+    ChatOpenAI,
+    has_openai_key,
+    publish_debug,
+    resolve_chat_llm,
+    retrieved_entry,
+    traced,
+)
+from rag_bencher.utils.chunking import DEFAULT_CHUNK_OVERLAP, DEFAULT_CHUNK_SIZE
 from rag_bencher.utils.factories import make_hf_embeddings
-from rag_bencher.vector.local import build_local_vectorstore
+from rag_bencher.utils.tracing import stage
+from rag_bencher.vector.faiss_ann import AnnSpec
 
 HYP_PROMPT = """You will draft a hypothetical answer to help retrieve relevant passages.
 Question: {question}
 Draft a concise, factual paragraph:"""
+# Templates that shape this pipeline's answers; part of its cache fingerprint.
+PROMPTS = (HYP_PROMPT, ANSWER_PROMPT)
 
 
 def _fallback_hypothesis(question: str) -> str:
     return f"This is a draft answer about: {question}. It outlines likely definitions, key concepts, and use cases."
 
 
+def planned_queries(question: str, *, generated: bool) -> List[str]:
+    """Return the retrieval query known before the chain runs; LLM hypotheses are not."""
+    return [] if generated else [_fallback_hypothesis(question)]
+
+
 def build_chain(
-    docs: List[Document],
+    docs: Sequence[Document],
     model: str = "gpt-4o-mini",
     k: int = 4,
     llm: Optional[RunnableSerializable[Any, Any]] = None,
     embeddings: Optional[Embeddings] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    chunk_overlap: int = DEFAULT_CHUNK_OVERLAP,
+    chunk_tokenizer: Optional[str] = None,
+    index_spec: Optional[AnnSpec] = None,
 ) -> BuildResult:
-    splitter = RecursiveCharacterTextSplitter(chunk_size=800, chunk_overlap=120)
-    splits = splitter.split_documents(docs)
     embed = embeddings or make_hf_embeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
-    vect = build_local_vectorstore(splits, embed)
+    index = get_corpus_index(
+        docs,
+        embed,
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        chunk_tokenizer=chunk_tokenizer,
+        index_spec=index_spec,
+    )
+    # Every local store (NumPy, in-memory, FAISS) searches by vector with scores.
+    vect = cast(Any, index.vectorstore)
 
     openai_ok = has_openai_key()
     if openai_ok and llm is None:
-        llm_h = ChatOpenAI(model=model, temperature=0)
+        llm_h: RunnableSerializable[Any, Any] = ChatOpenAI(model=model, temperature=0)
         hyp_tmpl = PromptTemplate.from_template(HYP_PROMPT)
 
         def gen_hyp(q: str) -> str:
@@ -54,17 +81,21 @@ def build_chain(
             self._generator = generator
             self._last_debug: Dict[str, Any] = {"pipeline": "hyde", "hypothesis": "", "retrieved": []}
 
-        def __call__(self, question: str) -> str:
-            hyp = self._generator(question)
-            docs_h = vect.similarity_search(hyp, k=k)
-            context = "\n\n".join(d.page_content for d in docs_h)
-            self._last_debug = {
+        def __call__(self, question: str, config: Optional[RunnableConfig] = None) -> str:
+            with stage("query_generation"):
+                hyp = self._generator(question)
+            with stage("embedding"):
+                hv = index.embeddings.embed_query(hyp)
+            with stage("vector_search"):
+                hits = vect.similarity_search_with_score_by_vector(hv, k=k)
+            context = "\n\n".join(d.page_content for d, _ in hits)
+            dbg: Dict[str, Any] = {
                 "pipeline": "hyde",
                 "hypothesis": hyp,
-                "retrieved": [
-                    {"source": d.metadata.get("source", ""), "preview": d.page_content[:160]} for d in docs_h
-                ],
+                "retrieved": [retrieved_entry(d, score=float(score)) for d, score in hits],
             }
+            self._last_debug = dbg
+            publish_debug(config, dbg)
             return context
 
         @property
@@ -73,12 +104,7 @@ def build_chain(
 
     context_builder = _ContextBuilder(gen_hyp)
 
-    template = (
-        "You are a helpful assistant. Use the context to answer.\n"
-        "If the answer is not in the context, say you don't know.\n"
-        "Context:\n{context}\n\nQuestion: {question}\nAnswer:"
-    )
-    prompt = PromptTemplate.from_template(template)
+    prompt = PromptTemplate.from_template(ANSWER_PROMPT)
 
     chain = cast(
         RunnableSerializable[str, str],
@@ -86,8 +112,8 @@ def build_chain(
             "context": RunnableLambda(context_builder),
             "question": RunnablePassthrough(),
         }
-        | prompt
-        | llm_answer
+        | traced(prompt, "prompt")
+        | traced(llm_answer, "llm")
         | StrOutputParser(),
     )
 
@@ -1,17 +1,28 @@
-from typing import Any, Callable, Dict, List, Optional, cast
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, cast
 
 from langchain_core.documents import Document
 from langchain_core.embeddings import Embeddings
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import PromptTemplate
-from langchain_core.runnables import RunnableLambda, RunnablePassthrough, RunnableSerializable
-from langchain_openai import ChatOpenAI
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+from langchain_core.runnables import RunnableConfig, RunnableLambda, RunnablePassthrough, RunnableSerializable
 
 from rag_bencher.pipelines.base import BuildResult
-from rag_bencher.pipelines.utils import has_openai_key, resolve_chat_llm
+from rag_bencher.pipelines.corpus import get_corpus_index
+from rag_bencher.pipelines.utils import (
+    ANSWER_PROMPT,
+    ChatOpenAI,
+    has_openai_key,
+    publish_debug,
+    resolve_chat_llm,
+    retrieved_entry,
+    traced,
+)
+from rag_bencher.utils.chunking import DEFAULT_CHUNK_OVERLAP, DEFAULT_CHUNK_SIZE
+from rag_bencher.utils.embedding_cache import embed_queries
 from rag_bencher.utils.factories import make_hf_embeddings
-from rag_bencher.vector.local import build_local_vectorstore
+from rag_bencher.utils.tracing import stage
+from rag_bencher.vector.faiss_ann import AnnSpec
+from rag_bencher.vector.local import batch_similarity_search
 
 GEN_PROMPT = """You are an expert at generating diverse search queries.
 Produce {n} different queries that could retrieve context to answer the user's question.
@@ -19,6 +30,8 @@ Return one query per line, no numbering.
 
 Question: {question}
 """
+# Templates that shape this pipeline's answers; part of its cache fingerprint.
+PROMPTS = (GEN_PROMPT, ANSWER_PROMPT)
 
 
 def _fallback_queries(question: str, n: int) -> List[str]:
@@ -32,6 +45,11 @@ def _fallback_queries(question: str, n: int) -> List[str]:
     return variants[: max(1, n)]
 
 
+def planned_queries(question: str, n_queries: int, *, generated: bool) -> List[str]:
+    """Return the queries known before the chain runs: all fallback variants, or just ``question`` with an LLM."""
+    return [question] if generated else _fallback_queries(question, n_queries)
+
+
 def _dedupe_queries(base: str, generated: List[str], limit: int) -> List[str]:
     uniq: List[str] = []
     for candidate in [base] + generated:
@@ -42,23 +60,61 @@ def _dedupe_queries(base: str, generated: List[str], limit: int) -> List[str]:
     return uniq
 
 
+# Rank offset from the original RRF paper; damps the influence of the very top ranks.
+RRF_K = 60
+
+
+def _chunk_key(doc: Document) -> str:
+    return str(doc.metadata.get("chunk_id") or doc.id or doc.page_content)
+
+
+def _fuse(rankings: Sequence[Sequence[Document]], rrf_k: int = RRF_K) -> List[Tuple[Document, float]]:
+    """Reciprocal-rank fusion of per-query hit lists, keyed on chunk id, best first."""
+    scores: Dict[str, float] = {}
+    docs: Dict[str, Document] = {}
+    for hits in rankings:
+        for rank, doc in enumerate(hits, start=1):
+            key = _chunk_key(doc)
+            docs.setdefault(key, doc)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank)
+    ordered = sorted(scores.items(), key=lambda kv: kv[1], reverse=True)
+    return [(docs[key], score) for key, score in ordered]
+
+
 def build_chain(
-    docs: List[Document],
+    docs: Sequence[Document],
     model: str = "gpt-4o-mini",
     k: int = 4,
     n_queries: int = 3,
     llm: Optional[RunnableSerializable[Any, Any]] = None,
     embeddings: Optional[Embeddings] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    chunk_overlap: int = DEFAULT_CHUNK_OVERLAP,
+    chunk_tokenizer: Optional[str] = None,
+    context_k: Optional[int] = None,
+    index_spec: Optional[AnnSpec] = None,
 ) -> BuildResult:
-    splitter = RecursiveCharacterTextSplitter(chunk_size=800, chunk_overlap=120)
-    splits = splitter.split_documents(docs)
+    """Build a multi-query RAG chain.
+
+    Each generated query retrieves ``k`` chunks; the hit lists are fused with reciprocal-rank
+    fusion and the top ``context_k`` chunks (default ``k``) form the prompt context.
+    """
     embed = embeddings or make_hf_embeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
-    vect = build_local_vectorstore(splits, embed)
+    index = get_corpus_index(
+        docs,
+        embed,
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        chunk_tokenizer=chunk_tokenizer,
+        index_spec=index_spec,
+    )
+    vect = index.vectorstore
+    context_limit = context_k or k
 
     llm_answer = resolve_chat_llm(model, override=llm)
     openai_ok = has_openai_key()
     if openai_ok and llm is None:
-        llm_gen = ChatOpenAI(model=model, temperature=0)
+        llm_gen: RunnableSerializable[Any, Any] = ChatOpenAI(model=model, temperature=0)
         gen_tmpl = PromptTemplate.from_template(GEN_PROMPT)
 
         def gen_queries(q: str) -> List[str]:
@@ -76,25 +132,23 @@ def build_chain(
             self._query_fn = query_fn
             self._last_debug: Dict[str, Any] = {"pipeline": "multi_query", "queries": [], "retrieved": []}
 
-        def __call__(self, question: str) -> str:
-            queries = self._query_fn(question)
-            seen: set[str] = set()
-            aggregated: List[Document] = []
-            for qr in queries:
-                docs_q = vect.similarity_search(qr, k=k)
-                for d in docs_q:
-                    key = d.page_content[:200]
-                    if key not in seen:
-                        seen.add(key)
-                        aggregated.append(d)
-            context = "\n\n".join(d.page_content for d in aggregated[: max(k, len(aggregated))])
-            self._last_debug = {
+        def __call__(self, question: str, config: Optional[RunnableConfig] = None) -> str:
+            with stage("query_generation"):
+                queries = self._query_fn(question)
+            # All sub-queries are embedded in one batch and searched in one batched kNN call.
+            with stage("embedding"):
+                vectors = embed_queries(index.embeddings, queries)
+            with stage("vector_search"):
+                hits = batch_similarity_search(vect, vectors, k=k)
+            fused = _fuse(hits)[:context_limit]
+            context = "\n\n".join(d.page_content for d, _ in fused)
+            dbg: Dict[str, Any] = {
                 "pipeline": "multi_query",
                 "queries": queries,
-                "retrieved": [
-                    {"source": d.metadata.get("source", ""), "preview": d.page_content[:160]} for d in aggregated
-                ],
+                "retrieved": [retrieved_entry(d, score=score) for d, score in fused],
             }
+            self._last_debug = dbg
+            publish_debug(config, dbg)
             return context
 
         @property
@@ -103,12 +157,7 @@ def build_chain(
 
     context_builder = _ContextBuilder(gen_queries)
 
-    template = (
-        "You are a helpful assistant. Use the context to answer.\n"
-        "If the answer is not in the context, say you don't know.\n"
-        "Context:\n{context}\n\nQuestion: {question}\nAnswer:"
-    )
-    prompt = PromptTemplate.from_template(template)
+    prompt = PromptTemplate.from_template(ANSWER_PROMPT)
 
     chain = cast(
         RunnableSerializable[str, str],
@@ -116,8 +165,8 @@ def build_chain(
             "context": RunnableLambda(context_builder),
             "question": RunnablePassthrough(),
         }
-        | prompt
-        | llm_answer
+        | traced(prompt, "prompt")
+        | traced(llm_answer, "llm")
         | StrOutputParser(),
     )
 
@@ -1,48 +1,84 @@
-from typing import Any, List, Optional, cast
+from typing import Any, List, Optional, Sequence, Tuple, cast
 
 from langchain_core.documents import Document
 from langchain_core.embeddings import Embeddings
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import PromptTemplate
 from langchain_core.retrievers import BaseRetriever
-from langchain_core.runnables import RunnablePassthrough, RunnableSerializable
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+from langchain_core.runnables import Runnable, RunnableConfig, RunnableLambda, RunnablePassthrough, RunnableSerializable
 
 from rag_bencher.pipelines.base import BuildResult
-from rag_bencher.pipelines.utils import resolve_chat_llm
+from rag_bencher.pipelines.corpus import get_corpus_index
+from rag_bencher.pipelines.utils import publish_debug, resolve_chat_llm, retrieved_entry, traced
+from rag_bencher.utils.chunking import DEFAULT_CHUNK_OVERLAP, DEFAULT_CHUNK_SIZE
 from rag_bencher.utils.factories import make_hf_embeddings
-from rag_bencher.vector.local import build_local_vectorstore
+from rag_bencher.utils.tracing import stage
+from rag_bencher.vector.faiss_ann import AnnSpec
+
+ANSWER_PROMPT = (
+    "Use the context to answer.\n" "Context:\n{context}\n\n" "Question: {question}\n" "Answer (end with ###END):"
+)
+# Templates that shape this pipeline's answers; part of its cache fingerprint.
+PROMPTS = (ANSWER_PROMPT,)
+
+
+def _unscored(docs: List[Document]) -> List[Tuple[Document, Optional[float]]]:
+    return [(d, None) for d in docs]
 
 
 def build_chain(
-    docs: List[Document],
+    docs: Sequence[Document],
     model: str = "gpt-4o-mini",
     k: int = 4,
     llm: Optional[RunnableSerializable[Any, Any]] = None,
     embeddings: Optional[Embeddings] = None,
     retriever: Optional[BaseRetriever] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    chunk_overlap: int = DEFAULT_CHUNK_OVERLAP,
+    chunk_tokenizer: Optional[str] = None,
+    index_spec: Optional[AnnSpec] = None,
 ) -> BuildResult:
-    splitter = RecursiveCharacterTextSplitter(chunk_size=800, chunk_overlap=120)
-    splits = splitter.split_documents(docs)
-    embed = embeddings or make_hf_embeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
-    retr: BaseRetriever
+    retrieve: Runnable[str, List[Tuple[Document, Optional[float]]]]
     if retriever is None:
-        vect = build_local_vectorstore(splits, embed)
-        retr = cast(BaseRetriever, vect.as_retriever(search_kwargs={"k": k}))
+        embed = embeddings or make_hf_embeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+        index = get_corpus_index(
+            docs,
+            embed,
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            chunk_tokenizer=chunk_tokenizer,
+            index_spec=index_spec,
+        )
+        # Every local store (NumPy, in-memory, FAISS) searches by vector with scores.
+        vect = cast(Any, index.vectorstore)
+
+        def search(q: str) -> List[Tuple[Document, Optional[float]]]:
+            with stage("embedding"):
+                qv = index.embeddings.embed_query(q)
+            with stage("vector_search"):
+                return list(vect.similarity_search_with_score_by_vector(qv, k=k))
+
+        retrieve = RunnableLambda(search)
     else:
-        retr = retriever
-    prompt = PromptTemplate.from_template(
-        "Use the context to answer.\n" "Context:\n{context}\n\n" "Question: {question}\n" "Answer (end with ###END):"
-    )
+        # A caller-supplied retriever returns bare documents; their rows carry no score.
+        retrieve = traced(retriever, "vector_search") | RunnableLambda(_unscored)
+    prompt = PromptTemplate.from_template(ANSWER_PROMPT)
     base_llm: RunnableSerializable[Any, Any] = resolve_chat_llm(model, override=llm)
     llm_with_stop = cast(RunnableSerializable[Any, Any], base_llm.bind(stop=["###END"]))
 
-    def ctx_join(d: List[Document]) -> str:
-        return "\n\n".join(x.page_content for x in d)
+    def ctx_join(hits: List[Tuple[Document, Optional[float]]], config: Optional[RunnableConfig] = None) -> str:
+        retrieved = [
+            retrieved_entry(x) if score is None else retrieved_entry(x, score=float(score)) for x, score in hits
+        ]
+        publish_debug(config, {"pipeline": "naive_rag", "retrieved": retrieved})
+        return "\n\n".join(x.page_content for x, _ in hits)
 
     chain = cast(
         RunnableSerializable[str, str],
-        {"context": retr | ctx_join, "question": RunnablePassthrough()} | prompt | llm_with_stop | StrOutputParser(),
+        {"context": retrieve | RunnableLambda(ctx_join), "question": RunnablePassthrough()}
+        | traced(prompt, "prompt")
+        | traced(llm_with_stop, "llm")
+        | StrOutputParser(),
     )
 
     def metadata() -> dict[str, Any]:
@@ -1,30 +1,39 @@
-from typing import Any, Dict, List, Optional, cast
+from typing import Any, Dict, List, Optional, Sequence, cast
 
 import numpy as np
 from langchain_core.documents import Document
 from langchain_core.embeddings import Embeddings
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import PromptTemplate
-from langchain_core.runnables import RunnableLambda, RunnablePassthrough, RunnableSerializable
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+from langchain_core.runnables import RunnableConfig, RunnableLambda, RunnablePassthrough, RunnableSerializable
 from numpy.typing import ArrayLike
 
 from rag_bencher.pipelines.base import BuildResult
-from rag_bencher.pipelines.utils import resolve_chat_llm
+from rag_bencher.pipelines.corpus import get_corpus_index
+from rag_bencher.pipelines.cross_encoder import DEFAULT_MAX_BATCH_SIZE, load_cross_encoder
+from rag_bencher.pipelines.utils import ANSWER_PROMPT, publish_debug, resolve_chat_llm, retrieved_entry, traced
+from rag_bencher.utils.chunking import DEFAULT_CHUNK_OVERLAP, DEFAULT_CHUNK_SIZE
 from rag_bencher.utils.factories import make_hf_embeddings
-from rag_bencher.vector.local import build_local_vectorstore
+from rag_bencher.utils.tracing import stage
+from rag_bencher.vector.faiss_ann import AnnSpec
+from rag_bencher.vector.local import stored_vectors
 
+RERANK_METHODS = ("cosine", "cross_encoder")
+# Templates that shape this pipeline's answers; part of its cache fingerprint.
+PROMPTS = (ANSWER_PROMPT,)
 
-def _cosine(u: ArrayLike, v: ArrayLike) -> float:
-    un = np.linalg.norm(u)
-    vn = np.linalg.norm(v)
-    if un == 0 or vn == 0:
-        return 0.0
-    return float(np.dot(u, v) / (un * vn))
+
+def _cosine_scores(query: ArrayLike, matrix: ArrayLike) -> np.ndarray[Any, np.dtype[np.float64]]:
+    """Cosine similarity of ``query`` against every row of ``matrix``; zero vectors score 0."""
+    q = np.asarray(query, dtype=np.float64)
+    m = np.asarray(matrix, dtype=np.float64).reshape(-1, q.shape[0])
+    norms = np.linalg.norm(m, axis=1) * np.linalg.norm(q)
+    dots = m @ q
+    return np.divide(dots, norms, out=np.zeros_like(dots), where=norms > 0)
 
 
 def build_chain(
-    docs: List[Document],
+    docs: Sequence[Document],
     model: str = "gpt-4o-mini",
     k: int = 8,
     rerank_top_k: int = 4,
@@ -32,39 +41,61 @@ def build_chain(
     cross_encoder_model: str = "BAAI/bge-reranker-base",
     llm: Optional[RunnableSerializable[Any, Any]] = None,
     embeddings: Optional[Embeddings] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    chunk_overlap: int = DEFAULT_CHUNK_OVERLAP,
+    chunk_tokenizer: Optional[str] = None,
+    max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+    index_spec: Optional[AnnSpec] = None,
 ) -> BuildResult:
-    splitter = RecursiveCharacterTextSplitter(chunk_size=800, chunk_overlap=120)
-    splits = splitter.split_documents(docs)
+    if method not in RERANK_METHODS:
+        raise ValueError(f"Unknown rerank method {method!r}. Expected one of: {', '.join(RERANK_METHODS)}.")
+    scorer = load_cross_encoder(cross_encoder_model) if method == "cross_encoder" else None
     embed = embeddings or make_hf_embeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
-    vect = build_local_vectorstore(splits, embed)
+    index = get_corpus_index(
+        docs,
+        embed,
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        chunk_tokenizer=chunk_tokenizer,
+        index_spec=index_spec,
+    )
+    vect = index.vectorstore
 
     class _ContextBuilder:
         def __init__(self) -> None:
             self._last_debug: Dict[str, Any] = {"pipeline": "rerank", "method": method, "candidates": []}
 
-        def __call__(self, question: str) -> str:
-            candidates = vect.similarity_search(question, k=k)
-            qv = embed.embed_query(question)
+        def __call__(self, question: str, config: Optional[RunnableConfig] = None) -> str:
+            # One query embedding serves both the search and the rerank; candidate vectors are read
+            # back from the store or, failing that, embedded in a single (usually cached) batch.
+            with stage("embedding"):
+                qv = index.embeddings.embed_query(question)
+            with stage("vector_search"):
+                candidates = vect.similarity_search_by_vector(qv, k=k)
             scores: List[tuple[Document, float]] = []
-            for d in candidates:
-                dv = embed.embed_query(d.page_content)
-                scores.append((d, _cosine(qv, dv)))
-            scores.sort(key=lambda x: x[1], reverse=True)
+            with stage("rerank"):
+                if candidates and scorer is not None:
+                    texts = [d.page_content for d in candidates]
+                    scores = list(
+                        zip(candidates, scorer.score(question, texts, max_batch_size=max_batch_size), strict=True)
+                    )
+                elif candidates:
+                    vectors = stored_vectors(vect, candidates)
+                    if vectors is None:
+                        with stage("embedding"):
+                            vectors = index.embeddings.embed_documents([d.page_content for d in candidates])
+                    scores = list(zip(candidates, _cosine_scores(qv, vectors).tolist(), strict=True))
+                scores.sort(key=lambda x: x[1], reverse=True)
             chosen = [d for d, _ in scores[:rerank_top_k]]
             context = "\n\n".join(d.page_content for d in chosen)
-            self._last_debug = {
+            dbg: Dict[str, Any] = {
                 "pipeline": "rerank",
                 "method": method,
                 "rerank_top_k": rerank_top_k,
-                "candidates": [
-                    {
-                        "score": float(sc),
-                        "preview": doc.page_content[:160],
-                        "source": doc.metadata.get("source", ""),
-                    }
-                    for doc, sc in scores[:20]
-                ],
+                "candidates": [retrieved_entry(doc, score=float(sc)) for doc, sc in scores[:20]],
             }
+            self._last_debug = dbg
+            publish_debug(config, dbg)
             return context
 
         @property
@@ -72,12 +103,7 @@ def build_chain(
             return self._last_debug
 
     context_builder = _ContextBuilder()
-    template = (
-        "You are a helpful assistant. Use the context to answer.\n"
-        "If the answer is not in the context, say you don't know.\n"
-        "Context:\n{context}\n\nQuestion: {question}\nAnswer:"
-    )
-    prompt = PromptTemplate.from_template(template)
+    prompt = PromptTemplate.from_template(ANSWER_PROMPT)
     llm_answer = resolve_chat_llm(model, override=llm)
 
     chain = cast(
@@ -86,8 +112,8 @@ def build_chain(
             "context": RunnableLambda(context_builder),
             "question": RunnablePassthrough(),
         }
-        | prompt
-        | llm_answer
+        | traced(prompt, "prompt")
+        | traced(llm_answer, "llm")
         | StrOutputParser(),
     )
 
@@ -1,27 +1,87 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Any, Callable, Mapping, Optional
+from functools import partial
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
 
 from langchain_core.documents import Document
-from langchain_core.runnables import RunnableSerializable
+from langchain_core.runnables import RunnableConfig, RunnableSerializable
 
 from rag_bencher.config import BenchConfig, load_config
-from rag_bencher.pipelines import hyde as hy
-from rag_bencher.pipelines import multi_query as mq
-from rag_bencher.pipelines import naive_rag
-from rag_bencher.pipelines import rerank as rr
+from rag_bencher.pipelines.corpus import CorpusIndex, recording_indexes
+from rag_bencher.pipelines.fingerprint import pipeline_fingerprint
+from rag_bencher.pipelines.utils import context_stage, debug_config, has_openai_key
 from rag_bencher.providers.base import build_chat_adapter, build_embeddings_adapter
+from rag_bencher.utils.embedding_cache import PREFETCH_BATCH_SIZE, prefetch_queries
+from rag_bencher.utils.tracing import StageTrace
+from rag_bencher.vector.faiss_ann import ann_spec_from_config
+
+
+def _question_only(question: str) -> List[str]:
+    return [question]
 
 
 @dataclass(frozen=True)
 class PipelineSelection:
-    """Container describing a configured pipeline."""
+    """Container describing a configured pipeline.
+
+    ``query_texts`` maps a question to the strings the pipeline will embed for it that are known
+    up front, and ``indexes`` are the corpus indexes the pipeline searches. ``fingerprint``
+    identifies everything that shapes the answers and keys the answer cache; it is ``None``
+    when the embedding model cannot be identified.
+    """
 
     pipeline_id: str
     config: BenchConfig
     chain: RunnableSerializable[str, str]
     debug: Callable[[], Mapping[str, Any]]
+    query_texts: Callable[[str], List[str]] = _question_only
+    indexes: Tuple[CorpusIndex, ...] = ()
+    fingerprint: Optional[str] = None
+
+    def prefetch_queries(self, questions: Iterable[str], batch_size: int = PREFETCH_BATCH_SIZE) -> int:
+        """Embed the query-side strings of ``questions`` in large batches before the run.
+
+        The vectors land in each index's embedding cache, so the pipelines only embed live on a
+        miss. Returns the number of texts embedded (0 when no index is cache-backed).
+        """
+        if not self.indexes:
+            return 0
+        texts = list(dict.fromkeys(t for q in questions for t in self.query_texts(q)))
+        sent = 0
+        models: set[str] = set()
+        for index in self.indexes:
+            model = index.key.embedding_model if index.key is not None else str(id(index.embeddings))
+            if model not in models:
+                models.add(model)
+                sent += prefetch_queries(index.embeddings, texts, batch_size)
+        return sent
+
+    def retrieve(
+        self,
+        questions: Sequence[str],
+        traces: Optional[Sequence[StageTrace]] = None,
+        *,
+        concurrency: int = 1,
+    ) -> List[Dict[str, Any]]:
+        """Run only the retrieval stage of the chain and return each question's debug payload.
+
+        No answer is generated, so the cost is the query embeddings (run :meth:`prefetch_queries`
+        first to batch them) and the vector searches, at most ``concurrency`` at a time. Each
+        question's stage timings are recorded into the matching entry of ``traces``, if given.
+        """
+        stage = context_stage(self.chain)
+        if stage is None:
+            raise ValueError(f"Pipeline {self.pipeline_id!r} has no retrieval stage that can run on its own")
+        if traces is not None and len(traces) != len(questions):
+            raise ValueError(f"Got {len(traces)} traces for {len(questions)} questions")
+        sinks: List[Dict[str, Any]] = [{} for _ in questions]
+        configs: List[RunnableConfig] = [
+            {**debug_config(sink, traces[i] if traces is not None else None), "max_concurrency": concurrency}
+            for i, sink in enumerate(sinks)
+        ]
+        stage.batch(list(questions), config=configs)
+        return sinks
 
 
 def _build_provider_adapters(cfg: BenchConfig) -> tuple[Optional[RunnableSerializable[Any, Any]], Optional[Any]]:
@@ -34,13 +94,26 @@ def _build_provider_adapters(cfg: BenchConfig) -> tuple[Optional[RunnableSeriali
     return llm_obj, emb_obj
 
 
+def _llm_params(cfg: BenchConfig, llm_obj: Optional[Any]) -> Mapping[str, Any]:
+    # Mirrors resolve_chat_llm: a provider adapter, else OpenAI with a key, else the offline echo model.
+    if llm_obj is not None:
+        backend = "provider"
+    elif has_openai_key():
+        backend = "openai"
+    else:
+        backend = "offline"
+    return {"backend": backend, "model": cfg.model.name, "temperature": 0.0}
+
+
 def select_pipeline(
     cfg_path: str,
-    docs: list[Document],
+    docs: Sequence[Document],
     cfg: BenchConfig | None = None,
 ) -> PipelineSelection:
     """Build the runnable chain and debug hook for the pipeline described by ``cfg_path``.
 
+    Only the selected pipeline module is imported, so unused pipelines never load their dependencies.
+
     Parameters
     ----------
     cfg_path:
@@ -52,48 +125,104 @@ def select_pipeline(
     """
     bench_cfg = cfg or load_config(cfg_path)
     llm_obj, emb_obj = _build_provider_adapters(bench_cfg)
+    index_spec = ann_spec_from_config(bench_cfg.vector)
+    # Whether query rewriting (multi-query, HyDE) goes through an LLM, which makes its output unknowable up front.
+    generated = has_openai_key() and llm_obj is None
+    query_texts: Callable[[str], List[str]] = _question_only
+    chunk_size, chunk_overlap = bench_cfg.chunking.chunk_size, bench_cfg.chunking.chunk_overlap
+    chunk_tokenizer = bench_cfg.chunking.chunk_tokenizer()
+    prompts: Sequence[str]
 
-    if bench_cfg.rerank is not None:
-        rrc = bench_cfg.rerank
-        chain, debug = rr.build_chain(
-            docs,
-            model=bench_cfg.model.name,
-            k=bench_cfg.retriever.k,
-            rerank_top_k=rrc.top_k,
-            method=rrc.method,
-            cross_encoder_model=rrc.cross_encoder_model or "BAAI/bge-reranker-base",
-            llm=llm_obj,
-            embeddings=emb_obj,
-        )
-        pipeline_id = "rerank"
-    elif bench_cfg.multi_query is not None:
-        mq_cfg = bench_cfg.multi_query
-        chain, debug = mq.build_chain(
-            docs,
-            model=bench_cfg.model.name,
-            k=bench_cfg.retriever.k,
-            n_queries=mq_cfg.n_queries,
-            llm=llm_obj,
-            embeddings=emb_obj,
-        )
-        pipeline_id = "multi_query"
-    elif bench_cfg.hyde is not None:
-        chain, debug = hy.build_chain(
-            docs,
-            model=bench_cfg.model.name,
-            k=bench_cfg.retriever.k,
-            llm=llm_obj,
-            embeddings=emb_obj,
-        )
-        pipeline_id = "hyde"
-    else:
-        chain, debug = naive_rag.build_chain(
+    with recording_indexes() as used:
+        if bench_cfg.rerank is not None:
+            from rag_bencher.pipelines import rerank as rr
+
+            rrc = bench_cfg.rerank
+            chain, debug = rr.build_chain(
+                docs,
+                model=bench_cfg.model.name,
+                k=bench_cfg.retriever.k,
+                rerank_top_k=rrc.top_k,
+                method=rrc.method,
+                cross_encoder_model=rrc.cross_encoder_model or "BAAI/bge-reranker-base",
+                max_batch_size=rrc.max_batch_size,
+                llm=llm_obj,
+                embeddings=emb_obj,
+                index_spec=index_spec,
+                chunk_size=chunk_size,
+                chunk_overlap=chunk_overlap,
+                chunk_tokenizer=chunk_tokenizer,
+            )
+            pipeline_id, prompts = "rerank", rr.PROMPTS
+        elif bench_cfg.multi_query is not None:
+            from rag_bencher.pipelines import multi_query as mq
+
+            mq_cfg = bench_cfg.multi_query
+            chain, debug = mq.build_chain(
+                docs,
+                model=bench_cfg.model.name,
+                k=bench_cfg.retriever.k,
+                n_queries=mq_cfg.n_queries,
+                context_k=mq_cfg.context_k,
+                llm=llm_obj,
+                embeddings=emb_obj,
+                index_spec=index_spec,
+                chunk_size=chunk_size,
+                chunk_overlap=chunk_overlap,
+                chunk_tokenizer=chunk_tokenizer,
+            )
+            pipeline_id, prompts = "multi_query", mq.PROMPTS
+            query_texts = partial(mq.planned_queries, n_queries=mq_cfg.n_queries, generated=generated)
+        elif bench_cfg.hyde is not None:
+            from rag_bencher.pipelines import hyde as hy
+
+            chain, debug = hy.build_chain(
+                docs,
+                model=bench_cfg.model.name,
+                k=bench_cfg.retriever.k,
+                llm=llm_obj,
+                embeddings=emb_obj,
+                index_spec=index_spec,
+                chunk_size=chunk_size,
+                chunk_overlap=chunk_overlap,
+                chunk_tokenizer=chunk_tokenizer,
+            )
+            pipeline_id, prompts = "hyde", hy.PROMPTS
+            query_texts = partial(hy.planned_queries, generated=generated)
+        else:
+            from rag_bencher.pipelines import naive_rag
+
+            chain, debug = naive_rag.build_chain(
+                docs,
+                model=bench_cfg.model.name,
+                k=bench_cfg.retriever.k,
+                llm=llm_obj,
+                embeddings=emb_obj,
+                index_spec=index_spec,
+                chunk_size=chunk_size,
+                chunk_overlap=chunk_overlap,
+                chunk_tokenizer=chunk_tokenizer,
+            )
+            pipeline_id, prompts = "naive", naive_rag.PROMPTS
+
+    models = {index.key.embedding_model if index.key is not None else None for index in used}
+    fingerprint = None
+    if used and None not in models:
+        fingerprint = pipeline_fingerprint(
+            bench_cfg,
             docs,
-            model=bench_cfg.model.name,
-            k=bench_cfg.retriever.k,
-            llm=llm_obj,
-            embeddings=emb_obj,
+            pipeline_id=pipeline_id,
+            prompts=prompts,
+            llm=_llm_params(bench_cfg, llm_obj),
+            embedding_model="|".join(sorted(str(m) for m in models)),
         )
-        pipeline_id = "naive"
 
-    return PipelineSelection(pipeline_id=pipeline_id, config=bench_cfg, chain=chain, debug=debug)
+    return PipelineSelection(
+        pipeline_id=pipeline_id,
+        config=bench_cfg,
+        chain=chain,
+        debug=debug,
+        query_texts=query_texts,
+        indexes=tuple(used),
+        fingerprint=fingerprint,
+    )
@@ -1,8 +1,23 @@
 import os
-from typing import Any, Optional, cast
+from typing import Any, Dict, Mapping, Optional, cast
 
-from langchain_core.runnables import RunnableLambda, RunnableSerializable
-from langchain_openai import ChatOpenAI
+from langchain_core.documents import Document
+from langchain_core.runnables import Runnable, RunnableConfig, RunnableLambda, RunnableSerializable
+
+from rag_bencher.utils.lazy import LazyCallable
+from rag_bencher.utils.tracing import TRACE_KEY, StageTrace, stage
+
+# The OpenAI SDK is only imported once an OpenAI model is built; offline runs never load it.
+ChatOpenAI = LazyCallable("langchain_openai", "ChatOpenAI")
+
+# Key under RunnableConfig["configurable"] holding a per-invocation dict that pipelines fill with debug data.
+DEBUG_SINK_KEY = "rag_bencher_debug"
+# Answer prompt shared by the HyDE, multi-query and rerank pipelines.
+ANSWER_PROMPT = (
+    "You are a helpful assistant. Use the context to answer.\n"
+    "If the answer is not in the context, say you don't know.\n"
+    "Context:\n{context}\n\nQuestion: {question}\nAnswer:"
+)
 
 
 def has_openai_key() -> bool:
@@ -19,7 +34,7 @@ def resolve_chat_llm(
     if override is not None:
         return override
     if has_openai_key():
-        return ChatOpenAI(model=model, temperature=temperature)
+        return cast(RunnableSerializable[Any, Any], ChatOpenAI(model=model, temperature=temperature))
 
     def _offline(prompt: Any) -> str:
         text = prompt if isinstance(prompt, str) else str(prompt)
@@ -27,3 +42,52 @@ def resolve_chat_llm(
 
     offline_chain = RunnableLambda(_offline)
     return cast(RunnableSerializable[Any, Any], offline_chain)
+
+
+def debug_config(sink: Dict[str, Any], trace: Optional[StageTrace] = None) -> RunnableConfig:
+    """Return a config asking pipelines to record this invocation's debug payload into ``sink``.
+
+    With a ``trace`` the time spent in each pipeline stage is recorded into it as well.
+    """
+    configurable: Dict[str, Any] = {DEBUG_SINK_KEY: sink}
+    if trace is not None:
+        configurable[TRACE_KEY] = trace
+    return {"configurable": configurable}
+
+
+def publish_debug(config: Optional[RunnableConfig], payload: Mapping[str, Any]) -> None:
+    """Copy ``payload`` into the debug sink carried by ``config``, if any."""
+    sink = ((config or {}).get("configurable") or {}).get(DEBUG_SINK_KEY)
+    if isinstance(sink, dict):
+        sink.update(payload)
+
+
+def traced(runnable: Runnable[Any, Any], name: str) -> RunnableSerializable[Any, Any]:
+    """Wrap ``runnable`` so each call is timed as stage ``name`` of the invocation's trace."""
+
+    def _run(value: Any, config: RunnableConfig) -> Any:
+        with stage(name):
+            return runnable.invoke(value, config)
+
+    return cast(RunnableSerializable[Any, Any], RunnableLambda(_run, name=name))
+
+
+def context_stage(chain: Any) -> Optional[Runnable[Any, Any]]:
+    """Return the stage of a pipeline chain that builds the context for a question, if any.
+
+    Built-in chains start with a ``{"context": ..., "question": ...}`` map. Running only the
+    ``context`` branch retrieves and publishes the debug payload without generating an answer.
+    """
+    steps = getattr(getattr(chain, "first", None), "steps__", None)
+    stage = steps.get("context") if isinstance(steps, Mapping) else None
+    return stage if isinstance(stage, Runnable) else None
+
+
+def retrieved_entry(doc: Document, **extra: Any) -> Dict[str, Any]:
+    """Describe a retrieved chunk for a debug payload: source, stable ``chunk_id`` and a short preview."""
+    return {
+        "source": doc.metadata.get("source", ""),
+        "chunk_id": doc.metadata.get("chunk_id"),
+        "preview": doc.page_content[:160],
+        **extra,
+    }
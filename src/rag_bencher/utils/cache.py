@@ -1,10 +1,31 @@
+from __future__ import annotations
+
+import atexit
 import hashlib
 import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Any, Final, Optional
+from typing import Any, Dict, Final, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+# Public env knobs: RAG_BENCH_CACHE_TTL expires answers older than that many seconds (default: never),
+# RAG_BENCH_CACHE_MB caps the answer cache size (default 1024).
+TTL_ENV = "RAG_BENCH_CACHE_TTL"
+MAX_MB_ENV = "RAG_BENCH_CACHE_MB"
+DB_FILE = "answers.sqlite"
 
 D: Final[Path] = Path(".ragbencher_cache")
-D.mkdir(exist_ok=True, parents=True)
+
+_DEFAULT_MAX_MB = 1024
+# Writes between two size checks; each check sums the stored bytes.
+_CHECK_EVERY = 256
+# After eviction the store is trimmed to this fraction of its budget to avoid evicting on every write.
+_EVICT_TO = 0.8
+# SQLite limits the number of bound parameters per statement.
+_MAX_VARS = 500
 
 
 def K(m: str, p: str) -> str:
@@ -12,16 +33,206 @@ def K(m: str, p: str) -> str:
     return hashlib.sha256((m + "||" + p).encode()).hexdigest()
 
 
-def cache_get(m: str, p: str) -> Optional[Any]:
-    f = D / (K(m, p) + ".json")
-    if f.exists():
+class AnswerStore:
+    """Single-file SQLite store of JSON values keyed by :func:`K`.
+
+    The database runs in WAL mode, so several benchmark processes can read while one writes.
+    Entries older than ``ttl`` seconds are treated as misses, and once the values outgrow
+    ``max_bytes`` the least recently read entries are evicted. Reads take no write lock: access
+    times are kept in memory and written with the next write, eviction, flush or close. Answers
+    left behind by the old one-file-per-entry cache in ``directory`` are imported on open.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        *,
+        ttl: Optional[float] = None,
+        max_bytes: int = _DEFAULT_MAX_MB << 20,
+        filename: str = DB_FILE,
+    ) -> None:
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._writes = 0
+        # Access times of lookup hits, written with the next put, eviction, flush or close.
+        self._touched: Dict[str, float] = {}
+        directory.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(directory / filename, timeout=30.0, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS answers ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+            "created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS answers_accessed ON answers (accessed)")
+        if filename == DB_FILE:
+            self._import_legacy()
+
+    def __len__(self) -> int:
+        """Return the number of stored entries, expired ones included."""
+        with self._lock:
+            return int(self._db.execute("SELECT COUNT(*) FROM answers").fetchone()[0])
+
+    def get_many(self, keys: Sequence[str]) -> List[Optional[Any]]:
+        """Return the stored value for each key, or ``None`` on a miss or an expired entry."""
+        now = time.time()
+        oldest = now - self.ttl if self.ttl is not None else float("-inf")
+        found: Dict[str, Any] = {}
+        with self._lock:
+            for part in _chunks(list(dict.fromkeys(keys))):
+                marks = ",".join("?" * len(part))
+                rows = self._db.execute(
+                    f"SELECT key, value FROM answers WHERE key IN ({marks}) AND created >= ?", (*part, oldest)
+                ).fetchall()
+                for key, value in rows:
+                    try:
+                        found[key] = json.loads(value)
+                    except ValueError:
+                        continue
+                    self._touched[key] = now
+        return [found.get(key) for key in keys]
+
+    def put_many(self, items: Iterable[Tuple[str, Any]]) -> None:
+        """Store ``(key, value)`` pairs in one transaction, replacing existing entries."""
+        now = time.time()
+        rows = [(key, text, len(text), now, now) for key, text in ((k, json.dumps(v)) for k, v in items)]
+        if not rows:
+            return
+        with self._lock:
+            with self._transaction():
+                self._write_touched()
+                self._db.executemany("INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?, ?)", rows)
+            self._writes += len(rows)
+            if self._writes >= _CHECK_EVERY:
+                self._writes = 0
+                self._evict()
+
+    def evict(self) -> None:
+        """Drop expired entries, then the least recently read ones until under budget."""
+        with self._lock:
+            self._evict()
+
+    def clear(self) -> None:
+        """Drop every entry."""
+        with self._lock:
+            self._db.execute("DELETE FROM answers")
+
+    def flush(self) -> None:
+        """Persist access times gathered by lookups since the last write."""
+        with self._lock:
+            if self._touched:
+                with self._transaction():
+                    self._write_touched()
+
+    def close(self) -> None:
+        """Persist pending access times and close the database connection."""
+        self.flush()
+        with self._lock:
+            self._db.close()
+
+    def _write_touched(self) -> None:
+        touched, self._touched = self._touched, {}
+        self._db.executemany(
+            "UPDATE answers SET accessed = MAX(accessed, ?) WHERE key = ?", ((t, k) for k, t in touched.items())
+        )
+
+    def _evict(self) -> None:
+        with self._transaction():
+            self._write_touched()
+            if self.ttl is not None:
+                self._db.execute("DELETE FROM answers WHERE created < ?", (time.time() - self.ttl,))
+            total = int(self._db.execute("SELECT TOTAL(size) FROM answers").fetchone()[0])
+            if total <= self.max_bytes:
+                return
+            excess = total - int(self.max_bytes * _EVICT_TO)
+            doomed: List[str] = []
+            for key, size in self._db.execute("SELECT key, size FROM answers ORDER BY accessed, rowid"):
+                if excess <= 0:
+                    break
+                doomed.append(key)
+                excess -= size
+            for part in _chunks(doomed):
+                self._db.execute(f"DELETE FROM answers WHERE key IN ({','.join('?' * len(part))})", part)
+
+    @contextmanager
+    def _transaction(self) -> Iterator[None]:
+        # BEGIN IMMEDIATE takes the write lock up front, so concurrent writers wait instead of failing.
+        self._db.execute("BEGIN IMMEDIATE")
         try:
-            return json.loads(f.read_text("utf-8"))
+            yield
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+        self._db.execute("COMMIT")
+
+    def _import_legacy(self) -> None:
+        legacy = [f for f in self.directory.glob("*.json") if len(f.stem) == 64]
+        rows: List[Tuple[str, str, int, float, float]] = []
+        for f in legacy:
+            try:
+                text = f.read_text("utf-8")
+                json.loads(text)
+            except (OSError, ValueError):
+                continue
+            mtime = f.stat().st_mtime
+            rows.append((f.stem, text, len(text), mtime, mtime))
+        if rows:
+            with self._transaction():
+                self._db.executemany("INSERT OR IGNORE INTO answers VALUES (?, ?, ?, ?, ?)", rows)
+            for key, *_ in rows:
+                (self.directory / f"{key}.json").unlink(missing_ok=True)
+
+
+_STORES: Dict[Path, AnswerStore] = {}
+_STORES_LOCK = threading.Lock()
+
+
+def answer_store(filename: str = DB_FILE) -> AnswerStore:
+    """Return the process-wide store in ``filename`` under :data:`D`, configured from the environment."""
+    path = D.resolve() / filename
+    with _STORES_LOCK:
+        store = _STORES.get(path)
+        if store is None:
+            ttl = os.getenv(TTL_ENV)
+            max_mb = int(os.getenv(MAX_MB_ENV) or _DEFAULT_MAX_MB)
+            store = AnswerStore(path.parent, ttl=float(ttl) if ttl else None, max_bytes=max_mb << 20, filename=filename)
+            _STORES[path] = store
+        return store
+
+
+@atexit.register
+def _flush_stores() -> None:
+    with _STORES_LOCK:
+        stores = list(_STORES.values())
+    for store in stores:
+        try:
+            store.flush()
         except Exception:
-            return None
-    return None
+            pass
+
+
+def cache_get(m: str, p: str) -> Optional[Any]:
+    """Return the cached answer of model ``m`` to prompt ``p``, or ``None``."""
+    return answer_store().get_many([K(m, p)])[0]
 
 
 def cache_set(m: str, p: str, o: Any) -> None:
-    f = D / (K(m, p) + ".json")
-    f.write_text(json.dumps(o), "utf-8")
+    """Cache ``o`` as the answer of model ``m`` to prompt ``p``."""
+    answer_store().put_many([(K(m, p), o)])
+
+
+def cache_get_many(m: str, prompts: Sequence[str]) -> List[Optional[Any]]:
+    """Return the cached answer of model ``m`` to each prompt, in one query."""
+    return answer_store().get_many([K(m, p) for p in prompts])
+
+
+def cache_set_many(m: str, answers: Iterable[Tuple[str, Any]]) -> None:
+    """Cache ``(prompt, answer)`` pairs of model ``m`` in one transaction."""
+    answer_store().put_many((K(m, p), o) for p, o in answers)
+
+
+def _chunks(keys: List[str]) -> Iterable[List[str]]:
+    return (keys[i : i + _MAX_VARS] for i in range(0, len(keys), _MAX_VARS))
@@ -1,30 +1,242 @@
-from typing import Any, Dict, List
+from __future__ import annotations
+
+import json
+import os
+import threading
+from dataclasses import asdict, dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+from uuid import UUID
 
 from langchain_core.callbacks.base import BaseCallbackHandler
 from langchain_core.outputs import LLMResult
 
+from rag_bencher.utils.llm_cache import CACHED_FLAG
+
+# Public env knob: RAG_BENCH_PRICING names a JSON file of {"<model>": {"input_per_1k": ..., "output_per_1k": ...}}
+# entries that extend or override PRICING.
+PRICING_ENV = "RAG_BENCH_PRICING"
+# Encoding used to estimate tokens of models tiktoken does not know.
+DEFAULT_ENCODING = "o200k_base"
+# Hugging Face offline switches; tiktoken would otherwise try to download its vocabularies.
+OFFLINE_ENVS = ("HF_HUB_OFFLINE", "TRANSFORMERS_OFFLINE")
+
+
+@dataclass(frozen=True)
+class ModelPrice:
+    """USD price per 1000 input (prompt) and output (completion) tokens."""
+
+    input_per_1k: float
+    output_per_1k: float
+
+
+# List prices of common OpenAI chat models. Versioned names (e.g. "gpt-4o-mini-2024-07-18")
+# use the entry of their longest matching prefix.
+PRICING: Dict[str, ModelPrice] = {
+    "gpt-4o-mini": ModelPrice(0.00015, 0.0006),
+    "gpt-4o": ModelPrice(0.0025, 0.01),
+    "gpt-4.1-nano": ModelPrice(0.0001, 0.0004),
+    "gpt-4.1-mini": ModelPrice(0.0004, 0.0016),
+    "gpt-4.1": ModelPrice(0.002, 0.008),
+    "gpt-3.5-turbo": ModelPrice(0.0005, 0.0015),
+    "o3-mini": ModelPrice(0.0011, 0.0044),
+}
+
+
+def load_pricing(path: Optional[str] = None) -> Dict[str, ModelPrice]:
+    """Return :data:`PRICING` updated with the entries of the JSON file ``path`` (default: ``RAG_BENCH_PRICING``)."""
+    prices = dict(PRICING)
+    path = path or os.getenv(PRICING_ENV)
+    if path:
+        for model, entry in json.loads(Path(path).read_text(encoding="utf-8")).items():
+            prices[model] = ModelPrice(float(entry["input_per_1k"]), float(entry["output_per_1k"]))
+    return prices
+
+
+def price_for(model: str, pricing: Mapping[str, ModelPrice]) -> Optional[ModelPrice]:
+    """Return the price of ``model``, matching the longest table entry it starts with."""
+    if model in pricing:
+        return pricing[model]
+    matches = [name for name in pricing if model.startswith(name)]
+    return pricing[max(matches, key=len)] if matches else None
+
+
+@lru_cache(maxsize=None)
+def _encoding(model: Optional[str]) -> Any:
+    # tiktoken (the optional "tokens" extra) fetches its vocabularies on first use; None when unavailable.
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model) if model else tiktoken.get_encoding(DEFAULT_ENCODING)
+    except KeyError:
+        return _encoding(None) if model else None
+    except Exception:
+        return None
+
+
+def offline_env() -> bool:
+    """Return whether an offline switch in :data:`OFFLINE_ENVS` is set."""
+    return any((os.getenv(name) or "").strip().lower() in {"1", "true", "yes", "on"} for name in OFFLINE_ENVS)
+
+
+def count_tokens(texts: Sequence[str], model: Optional[str] = None, *, offline: bool = False) -> int:
+    """Estimate the tokens of ``texts`` for ``model``: batched tiktoken when available, else whitespace words.
+
+    ``offline`` (or an offline env switch) skips tiktoken, whose vocabularies may need a download.
+    """
+    if not texts:
+        return 0
+    encoding = None if offline or offline_env() else _encoding(model)
+    if encoding is None:
+        return sum(len(t.split()) for t in texts)
+    return sum(len(ids) for ids in encoding.encode_ordinary_batch(list(texts)))
+
+
+@dataclass
+class ModelUsage:
+    """Usage of one model. ``estimated_calls`` had no provider token counts; ``cached_calls`` cost nothing."""
+
+    calls: int = 0
+    cached_calls: int = 0
+    estimated_calls: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cost_usd: float = 0.0
+
 
 class UsageTracker(BaseCallbackHandler):
-    def __init__(self, cost_per_1k_input: float = 0.0, cost_per_1k_output: float = 0.0) -> None:
-        self.calls: int = 0
-        self.in_tok: int = 0
-        self.out_tok: int = 0
-        self.cpi: float = cost_per_1k_input
-        self.cpo: float = cost_per_1k_output
-
-    def on_llm_start(self, serialized: Dict[str, Any], prompts: List[str], **kw: Any) -> None:
-        self.in_tok += sum(len(p.split()) for p in prompts)
-
-    def on_llm_end(self, response: LLMResult, **kw: Any) -> None:
-        self.calls += 1
-        try:
-            outs: List[str] = []
-            for gens in response.generations:
-                for g in gens:
-                    outs.append(getattr(g, "text", "") or "")
-            self.out_tok += sum(len(t.split()) for t in outs)
-        except Exception:
-            pass
-
-    def summary(self) -> Dict[str, int]:
-        return {"calls": self.calls, "input_tokens": self.in_tok, "output_tokens": self.out_tok}
+    """Count LLM calls, tokens and their estimated cost, per model.
+
+    Token counts come from the usage metadata the provider returns; calls without it are
+    estimated with :func:`count_tokens`. Costs use ``pricing`` (default :func:`load_pricing`);
+    models missing from it are charged ``cost_per_1k_input``/``cost_per_1k_output``. Calls
+    answered by the LLM cache are counted but add no tokens or cost. ``offline`` trackers never
+    load tiktoken. One tracker may be shared by concurrent invocations.
+    """
+
+    def __init__(
+        self,
+        cost_per_1k_input: float = 0.0,
+        cost_per_1k_output: float = 0.0,
+        pricing: Optional[Mapping[str, ModelPrice]] = None,
+        *,
+        offline: bool = False,
+    ) -> None:
+        self.default_price = ModelPrice(cost_per_1k_input, cost_per_1k_output)
+        self.offline = offline
+        self.pricing: Mapping[str, ModelPrice] = load_pricing() if pricing is None else pricing
+        self._models: Dict[str, ModelUsage] = {}
+        # Prompts and model name of each LLM run in flight, keyed by run id.
+        self._pending: Dict[Optional[UUID], Tuple[List[str], Optional[str]]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def calls(self) -> int:
+        """Total LLM calls over all models."""
+        return int(self.summary()["calls"])
+
+    @property
+    def in_tok(self) -> int:
+        """Total input tokens over all models."""
+        return int(self.summary()["input_tokens"])
+
+    @property
+    def out_tok(self) -> int:
+        """Total output tokens over all models."""
+        return int(self.summary()["output_tokens"])
+
+    @property
+    def cpi(self) -> float:
+        """Fallback USD price per 1000 input tokens."""
+        return self.default_price.input_per_1k
+
+    @property
+    def cpo(self) -> float:
+        """Fallback USD price per 1000 output tokens."""
+        return self.default_price.output_per_1k
+
+    def on_llm_start(
+        self, serialized: Dict[str, Any], prompts: List[str], *, run_id: Optional[UUID] = None, **kw: Any
+    ) -> None:
+        with self._lock:
+            self._pending[run_id] = (list(prompts), _start_model(kw))
+
+    def on_llm_end(self, response: LLMResult, *, run_id: Optional[UUID] = None, **kw: Any) -> None:
+        with self._lock:
+            prompts, model = self._pending.pop(run_id, ([], None))
+        generations = [g for gens in (getattr(response, "generations", None) or []) for g in gens]
+        model = _response_model(response, generations) or model or "unknown"
+        cached = bool(generations) and all((g.generation_info or {}).get(CACHED_FLAG) for g in generations)
+        usage = None if cached else _reported_usage(response, generations)
+        if cached:
+            tokens = (0, 0)
+        elif usage is not None:
+            tokens = usage
+        else:
+            texts = [g.text or "" for g in generations]
+            tokens = (
+                count_tokens(prompts, model, offline=self.offline),
+                count_tokens(texts, model, offline=self.offline),
+            )
+        price = price_for(model, self.pricing) or self.default_price
+        cost = (tokens[0] * price.input_per_1k + tokens[1] * price.output_per_1k) / 1000
+        with self._lock:
+            stats = self._models.setdefault(model, ModelUsage())
+            stats.calls += 1
+            stats.cached_calls += cached
+            stats.estimated_calls += not cached and usage is None
+            stats.input_tokens += tokens[0]
+            stats.output_tokens += tokens[1]
+            stats.cost_usd += cost
+
+    def on_llm_error(self, error: BaseException, *, run_id: Optional[UUID] = None, **kw: Any) -> None:
+        with self._lock:
+            self._pending.pop(run_id, None)
+
+    def summary(self) -> Dict[str, Any]:
+        """Return totals over all models plus a ``models`` breakdown."""
+        with self._lock:
+            models = {name: asdict(stats) for name, stats in self._models.items()}
+        totals: Dict[str, Any] = asdict(ModelUsage())
+        for stats in models.values():
+            for key, value in stats.items():
+                totals[key] += value
+        totals["cost_usd"] = round(totals["cost_usd"], 6)
+        return {**totals, "models": models}
+
+
+def _start_model(kw: Mapping[str, Any]) -> Optional[str]:
+    params = kw.get("invocation_params") or {}
+    metadata = kw.get("metadata") or {}
+    name = params.get("model_name") or params.get("model") or metadata.get("ls_model_name")
+    return str(name) if name else None
+
+
+def _response_model(response: LLMResult, generations: Sequence[Any]) -> Optional[str]:
+    # The provider echoes the exact (often versioned) model it ran.
+    name = (getattr(response, "llm_output", None) or {}).get("model_name")
+    for g in generations:
+        message = getattr(g, "message", None)
+        name = name or (getattr(message, "response_metadata", None) or {}).get("model_name")
+    return str(name) if name else None
+
+
+def _reported_usage(response: LLMResult, generations: Sequence[Any]) -> Optional[Tuple[int, int]]:
+    # Standard per-message usage metadata first, then the legacy OpenAI-style ``token_usage`` block.
+    found = False
+    tokens = [0, 0]
+    for g in generations:
+        usage = getattr(getattr(g, "message", None), "usage_metadata", None)
+        if usage:
+            found = True
+            tokens[0] += int(usage.get("input_tokens") or 0)
+            tokens[1] += int(usage.get("output_tokens") or 0)
+    if found:
+        return tokens[0], tokens[1]
+    usage = (getattr(response, "llm_output", None) or {}).get("token_usage")
+    if usage:
+        return int(usage.get("prompt_tokens") or 0), int(usage.get("completion_tokens") or 0)
+    return None
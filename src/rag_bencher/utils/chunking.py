@@ -0,0 +1,226 @@
+from __future__ import annotations
+
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from functools import lru_cache
+from itertools import islice
+from typing import Any, Callable, Deque, Generator, Iterable, Iterator, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+from .hashing import document_hash, text_hash
+from .lazy import LazyCallable
+
+DEFAULT_CHUNK_SIZE = 800
+DEFAULT_CHUNK_OVERLAP = 120
+# Tokenizer of the default embedding model; token chunks sized with it fit that model's window.
+DEFAULT_TOKENIZER = "sentence-transformers/all-MiniLM-L6-v2"
+# Public env knob: RAG_BENCH_CHUNK_WORKERS sets the chunking process count. The default 0 chunks in the
+# calling thread; worker processes re-import the caller's main module, which must then be guarded.
+CHUNK_WORKERS_ENV = "RAG_BENCH_CHUNK_WORKERS"
+# Documents handed to one chunking worker at a time by chunk_documents.
+CHUNK_BATCH_SIZE = 64
+
+Split = Callable[[List[Document]], List[Document]]
+
+# langchain_text_splitters takes ~0.3s to import; token chunking never needs it.
+RecursiveCharacterTextSplitter = LazyCallable("langchain_text_splitters", "RecursiveCharacterTextSplitter")
+
+
+@dataclass(frozen=True)
+class ChunkParams:
+    """Chunking settings; part of every chunk id and index key.
+
+    Sizes count characters, or tokens of ``tokenizer`` (a Hugging Face model id or path) when set.
+    """
+
+    chunk_size: int = DEFAULT_CHUNK_SIZE
+    chunk_overlap: int = DEFAULT_CHUNK_OVERLAP
+    tokenizer: Optional[str] = None
+
+    def __post_init__(self) -> None:
+        """Validate that consecutive chunks make progress."""
+        if self.chunk_size < 1 or not 0 <= self.chunk_overlap < self.chunk_size:
+            raise ValueError(
+                f"Need chunk_size >= 1 and 0 <= chunk_overlap < chunk_size, got {self.chunk_size}/{self.chunk_overlap}"
+            )
+
+    def tag(self) -> str:
+        """Return a short string identifying these settings."""
+        unit = "chars" if self.tokenizer is None else f"tokens:{self.tokenizer}"
+        return f"{unit}:{self.chunk_size}/{self.chunk_overlap}"
+
+
+def chunk_key(doc: Document, params: ChunkParams) -> str:
+    """Return a hash identifying the chunks of ``doc`` split with ``params``; chunk ids start with it."""
+    return text_hash(document_hash(doc) + "\x00" + params.tag())
+
+
+class Chunker:
+    """Picklable splitter that stamps each chunk with a stable id and its character offsets.
+
+    ``chunk_id`` is ``<chunk key prefix>-<n>``, the same in every run and process for the same
+    document and parameters; ``start_index``/``end_index`` locate the chunk in the source text.
+
+    Token chunks are windows of ``chunk_size`` tokens cut at the offsets a fast tokenizer reports
+    while encoding the whole batch at once, so chunk text is sliced from the source, never decoded.
+    """
+
+    def __init__(self, params: ChunkParams) -> None:
+        self.params = params
+        self._splitter: Any = None
+        if params.tokenizer is None:
+            self._splitter = RecursiveCharacterTextSplitter(
+                chunk_size=params.chunk_size, chunk_overlap=params.chunk_overlap, add_start_index=True
+            )
+
+    def __call__(self, docs: List[Document]) -> List[Document]:
+        """Split ``docs`` into chunks, in document order."""
+        if self.params.tokenizer is not None:
+            return self._split_tokens(docs, self.params.tokenizer)
+        out: List[Document] = []
+        for doc in docs:
+            prefix = chunk_key(doc, self.params)[:16]
+            for n, chunk in enumerate(self._splitter.split_documents([doc])):
+                start = int(chunk.metadata.get("start_index", 0))
+                chunk.metadata.update(start_index=start, end_index=start + len(chunk.page_content))
+                chunk.metadata["chunk_id"] = f"{prefix}-{n}"
+                out.append(chunk)
+        return out
+
+    def _split_tokens(self, docs: List[Document], tokenizer: str) -> List[Document]:
+        if not docs:
+            return []
+        encoded = load_tokenizer(tokenizer)(
+            [d.page_content for d in docs],
+            add_special_tokens=False,
+            return_offsets_mapping=True,
+            return_attention_mask=False,
+            return_token_type_ids=False,
+            verbose=False,
+        )
+        out: List[Document] = []
+        for doc, offsets in zip(docs, encoded["offset_mapping"], strict=True):
+            prefix = chunk_key(doc, self.params)[:16]
+            for n, (start, end) in enumerate(token_windows(offsets, self.params.chunk_size, self.params.chunk_overlap)):
+                metadata = {**doc.metadata, "start_index": start, "end_index": end, "chunk_id": f"{prefix}-{n}"}
+                out.append(Document(page_content=doc.page_content[start:end], metadata=metadata))
+        return out
+
+
+def token_windows(offsets: List[Tuple[int, int]], size: int, overlap: int) -> Iterator[Tuple[int, int]]:
+    """Yield the character span of each window of ``size`` tokens, consecutive windows sharing ``overlap``."""
+    start = 0
+    while start < len(offsets):
+        end = min(start + size, len(offsets))
+        yield offsets[start][0], offsets[end - 1][1]
+        if end == len(offsets):
+            return
+        start = end - overlap
+
+
+@lru_cache(maxsize=None)
+def load_tokenizer(name: str) -> Any:
+    """Load the fast (Rust-backed) tokenizer ``name`` once per process."""
+    from transformers import AutoTokenizer  # heavy import, only needed for token chunking
+
+    tokenizer = AutoTokenizer.from_pretrained(name, use_fast=True)
+    if not tokenizer.is_fast:
+        raise ValueError(f"Token chunking needs a fast tokenizer with offset mappings; {name!r} has none")
+    return tokenizer
+
+
+def chunk_workers() -> int:
+    """Return the chunking process count from ``RAG_BENCH_CHUNK_WORKERS``; 0 (no pool) by default."""
+    raw = os.getenv(CHUNK_WORKERS_ENV)
+    return int(raw) if raw else 0
+
+
+def chunk_documents(docs: Iterable[Document], params: ChunkParams, *, workers: Optional[int] = None) -> List[Document]:
+    """Split ``docs`` with ``params`` across a process pool of ``workers`` (default :func:`chunk_workers`)."""
+    return [chunk for chunks, _ in iter_chunk_batches(_batched(docs), Chunker(params), workers) for chunk in chunks]
+
+
+def iter_chunk_batches(
+    batches: Iterable[List[Document]], split: Split, workers: Optional[int] = None
+) -> Generator[Tuple[List[Document], float], None, None]:
+    """Apply ``split`` to each batch in a process pool, yielding ``(chunks, busy seconds)`` in input order.
+
+    ``split`` must be picklable. Input that fits in one batch is split in the calling thread,
+    since starting worker processes would cost more than the work. If the pool breaks (e.g. a
+    worker could not start because the caller's main module is not guarded by
+    ``if __name__ == "__main__":``), the remaining batches are split in the calling thread.
+    """
+    count = chunk_workers() if workers is None else workers
+    if count < 1:
+        for batch in batches:
+            yield _split_timed(split, batch)
+        return
+    pool: Optional[ProcessPoolExecutor] = None
+    first: Optional[List[Document]] = None
+    # Each batch with its pool future, or None once the pool is broken and it must be split here.
+    in_flight: Deque[Tuple[List[Document], Optional[Future[Tuple[List[Document], float]]]]] = deque()
+    broken = False
+
+    def submit(batch: List[Document]) -> None:
+        nonlocal broken
+        future = None
+        if not broken and pool is not None:
+            try:
+                future = pool.submit(_split_timed, split, batch)
+            except BrokenProcessPool:
+                broken = True
+        in_flight.append((batch, future))
+
+    def collect() -> Tuple[List[Document], float]:
+        nonlocal broken
+        batch, future = in_flight.popleft()
+        if future is not None:
+            try:
+                return future.result()
+            except BrokenProcessPool:
+                broken = True
+        return _split_timed(split, batch)
+
+    try:
+        for batch in batches:
+            if pool is None:
+                if first is None:
+                    first = batch
+                    continue
+                pool = ProcessPoolExecutor(max_workers=count, mp_context=_mp_context())
+                submit(first)
+            submit(batch)
+            # Keep every worker busy with one batch queued behind it.
+            if len(in_flight) >= 2 * count:
+                yield collect()
+        if pool is None and first is not None:
+            yield _split_timed(split, first)
+        while in_flight:
+            yield collect()
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+
+def _batched(docs: Iterable[Document]) -> Iterator[List[Document]]:
+    it = iter(docs)
+    while batch := list(islice(it, CHUNK_BATCH_SIZE)):
+        yield batch
+
+
+def _split_timed(split: Split, docs: List[Document]) -> Tuple[List[Document], float]:
+    started = time.perf_counter()
+    chunks = split(docs)
+    return chunks, time.perf_counter() - started
+
+
+def _mp_context() -> Any:
+    # Forking a process that runs threads can deadlock; start workers from a clean server instead.
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
@@ -0,0 +1,376 @@
+from __future__ import annotations
+
+import atexit
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from .factories import embedding_model_id
+from .hashing import text_hash
+from .tracing import stage
+
+# Public env knobs: RAG_BENCH_DISABLE_EMBED_CACHE=1 turns the cache off,
+# RAG_BENCH_EMBED_CACHE_MB caps the vector file size per model (default 2048).
+DISABLE_ENV = "RAG_BENCH_DISABLE_EMBED_CACHE"
+MAX_MB_ENV = "RAG_BENCH_EMBED_CACHE_MB"
+ROOT = Path(".ragbencher_cache") / "embeddings"
+INDEX_FILE = "index.sqlite"
+
+_DEFAULT_MAX_MB = 2048
+# Distinct query texts embedded per model call by :func:`prefetch_queries`.
+PREFETCH_BATCH_SIZE = 256
+# After eviction the store is trimmed to this fraction of its budget to avoid compacting on every write.
+_EVICT_TO = 0.8
+# Surviving rows copied per read while compacting the vector file.
+_EVICT_BLOCK_ROWS = 65536
+# SQLite limits the number of bound parameters per statement.
+_MAX_VARS = 500
+
+
+class EmbeddingStore:
+    """Content-addressed float32 vector store for a single embedding model.
+
+    Vectors live in an append-only ``vectors-<generation>.f32`` file that is read through
+    ``numpy.memmap``. A SQLite index in WAL mode maps text hashes to rows and keeps the access
+    times used for least-recently-used eviction once the file outgrows ``max_bytes``. Appends and
+    evictions run inside one SQLite write transaction, so processes sharing the directory take
+    turns writing while lookups keep reading a consistent snapshot.
+    """
+
+    def __init__(self, directory: Path, model_id: str, max_bytes: int) -> None:
+        self.directory = directory
+        self.model_id = model_id
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # Access times of lookup hits, written with the next append or flush.
+        self._touched: Dict[str, int] = {}
+        self._mmap: Optional[np.memmap[Any, np.dtype[np.float32]]] = None
+        self._mapped = (-1, 0)
+        directory.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(directory / INDEX_FILE, timeout=30.0, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value NOT NULL)")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS rows (key TEXT PRIMARY KEY, row INTEGER NOT NULL, accessed INTEGER NOT NULL)"
+        )
+        with self._transaction():
+            self._validate()
+
+    def _vectors_path(self, generation: int) -> Path:
+        return self.directory / f"vectors-{generation}.f32"
+
+    def __len__(self) -> int:
+        """Return the number of cached vectors."""
+        with self._lock:
+            return int(self._db.execute("SELECT COUNT(*) FROM rows").fetchone()[0])
+
+    def _meta(self) -> Dict[str, Any]:
+        return dict(self._db.execute("SELECT name, value FROM meta").fetchall())
+
+    def _set_meta(self, **values: Any) -> None:
+        self._db.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)", values.items())
+
+    def _validate(self) -> None:
+        meta = self._meta()
+        if not meta:
+            self._import_legacy()
+            meta = self._meta()
+        count = meta.get("count", 0)
+        if count and (meta.get("model", self.model_id) != self.model_id or self._size(meta) < count * meta["dim"] * 4):
+            # Another model's index, or the vector file is missing or was truncated; start over.
+            self._db.execute("DELETE FROM rows")
+            self._set_meta(count=0)
+        self._set_meta(model=self.model_id)
+
+    def _size(self, meta: Dict[str, Any]) -> int:
+        try:
+            return self._vectors_path(meta.get("generation", 0)).stat().st_size
+        except OSError:
+            return 0
+
+    def _import_legacy(self) -> None:
+        # Stores written before the SQLite index kept it in ``index.json``; their vector files are unchanged.
+        legacy = self.directory / "index.json"
+        try:
+            meta = json.loads(legacy.read_text("utf-8"))
+        except (OSError, ValueError):
+            return
+        if meta.get("model") == self.model_id and meta.get("dim"):
+            rows = ((key, int(entry[0]), int(entry[1])) for key, entry in meta.get("rows", {}).items())
+            self._db.executemany("INSERT OR IGNORE INTO rows VALUES (?, ?, ?)", rows)
+            self._set_meta(
+                dim=int(meta["dim"]), generation=int(meta.get("generation", 0)), count=int(meta.get("count", 0))
+            )
+        legacy.unlink(missing_ok=True)
+
+    def _matrix(self, meta: Dict[str, Any]) -> Optional[np.memmap[Any, np.dtype[np.float32]]]:
+        generation, count, dim = meta.get("generation", 0), meta.get("count", 0), meta.get("dim", 0)
+        if count == 0 or dim == 0:
+            return None
+        if self._mmap is None or self._mapped != (generation, count):
+            try:
+                self._mmap = np.memmap(self._vectors_path(generation), dtype=np.float32, mode="r", shape=(count, dim))
+            except (OSError, ValueError):
+                # Replaced by another process's eviction since the index snapshot was read.
+                return None
+            self._mapped = (generation, count)
+        return self._mmap
+
+    def get_many(self, keys: Sequence[str]) -> List[Optional[np.ndarray[Any, np.dtype[np.float32]]]]:
+        """Return the cached vector for each key, or ``None`` on a miss."""
+        with self._lock:
+            # One read transaction, so the rows and the vector file generation come from the same snapshot.
+            self._db.execute("BEGIN")
+            try:
+                meta = self._meta()
+                found: Dict[str, int] = {}
+                for part in _chunks(list(dict.fromkeys(keys))):
+                    marks = ",".join("?" * len(part))
+                    found.update(self._db.execute(f"SELECT key, row FROM rows WHERE key IN ({marks})", part))
+            finally:
+                self._db.execute("COMMIT")
+            matrix = self._matrix(meta)
+            now = time.time_ns()
+            out: List[Optional[np.ndarray[Any, np.dtype[np.float32]]]] = []
+            for key in keys:
+                row = found.get(key)
+                if matrix is None or row is None or row >= matrix.shape[0]:
+                    out.append(None)
+                    continue
+                self._touched[key] = now
+                out.append(np.array(matrix[row]))
+            return out
+
+    def put_many(self, keys: Sequence[str], vectors: Sequence[Sequence[float]]) -> None:
+        """Append vectors for ``keys`` and index them, evicting old rows when over budget."""
+        if not keys:
+            return
+        arr = np.asarray(vectors, dtype=np.float32)
+        if arr.ndim != 2 or arr.shape[0] != len(keys):
+            raise ValueError("Expected one vector per key")
+        with self._lock:
+            with self._transaction():
+                meta = self._meta()
+                dim = meta.get("dim") or int(arr.shape[1])
+                if arr.shape[1] != dim:
+                    raise ValueError(f"Embedding dimension changed from {dim} to {arr.shape[1]}")
+                generation, start = meta.get("generation", 0), meta.get("count", 0)
+                path = self._vectors_path(generation)
+                # Rows past ``count`` were never indexed (a writer died mid-append) and are overwritten.
+                with open(path, "r+b" if path.exists() else "wb") as fh:
+                    fh.seek(start * dim * 4)
+                    fh.write(arr.tobytes())
+                self._write_touched()
+                now = time.time_ns()
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO rows VALUES (?, ?, ?)",
+                    ((key, start + offset, now) for offset, key in enumerate(keys)),
+                )
+                count = start + len(keys)
+                self._set_meta(dim=dim, generation=generation, count=count)
+                if count * dim * 4 > self.max_bytes:
+                    self._evict(dim, generation, count)
+            self._drop_old_generations()
+
+    def flush(self) -> None:
+        """Persist access times gathered by lookups since the last write."""
+        with self._lock:
+            if self._touched:
+                with self._transaction():
+                    self._write_touched()
+
+    def close(self) -> None:
+        """Close the index database."""
+        with self._lock:
+            self._db.close()
+
+    def _write_touched(self) -> None:
+        touched, self._touched = self._touched, {}
+        self._db.executemany(
+            "UPDATE rows SET accessed = MAX(accessed, ?) WHERE key = ?", ((t, k) for k, t in touched.items())
+        )
+
+    def _evict(self, dim: int, generation: int, count: int) -> None:
+        keep = max(0, int(self.max_bytes * _EVICT_TO) // (dim * 4))
+        newest = self._db.execute(
+            "SELECT key, row, accessed FROM rows ORDER BY accessed DESC, rowid DESC LIMIT ?", (keep,)
+        ).fetchall()
+        newest.sort(key=lambda entry: entry[1])
+        source = np.memmap(self._vectors_path(generation), dtype=np.float32, mode="r", shape=(count, dim))
+        # Survivors go to a new generation file; readers of the old one keep a consistent view.
+        with open(self._vectors_path(generation + 1), "wb") as fh:
+            for i in range(0, len(newest), _EVICT_BLOCK_ROWS):
+                rows = [row for _, row, _ in newest[i : i + _EVICT_BLOCK_ROWS]]
+                fh.write(np.asarray(source[rows], dtype=np.float32).tobytes())
+        del source
+        self._db.execute("DELETE FROM rows")
+        self._db.executemany(
+            "INSERT INTO rows VALUES (?, ?, ?)", ((key, i, accessed) for i, (key, _, accessed) in enumerate(newest))
+        )
+        self._set_meta(generation=generation + 1, count=len(newest))
+
+    def _drop_old_generations(self) -> None:
+        current = self._meta().get("generation", 0)
+        for path in self.directory.glob("vectors-*.f32"):
+            suffix = path.stem.rpartition("-")[2]
+            if suffix.isdigit() and int(suffix) < current:
+                try:
+                    path.unlink(missing_ok=True)
+                except OSError:
+                    # Still mapped by a reader on a platform that forbids it; retried after the next eviction.
+                    pass
+
+    @contextmanager
+    def _transaction(self) -> Iterator[None]:
+        # BEGIN IMMEDIATE takes the write lock up front, so concurrent writers wait instead of failing.
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+        self._db.execute("COMMIT")
+
+
+def _chunks(keys: List[str]) -> Iterable[List[str]]:
+    return (keys[i : i + _MAX_VARS] for i in range(0, len(keys), _MAX_VARS))
+
+
+class CachedEmbeddings(Embeddings):
+    """``Embeddings`` wrapper that serves repeated texts from an :class:`EmbeddingStore`.
+
+    Document and query vectors are keyed separately because some providers embed them differently.
+    """
+
+    def __init__(self, inner: Embeddings, store: EmbeddingStore) -> None:
+        self.inner = inner
+        self.store = store
+        self.model_id = store.model_id
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed(texts, "d:", self.inner.embed_documents)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed([text], "q:", lambda missing: [self.inner.embed_query(t) for t in missing])[0]
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Embed several queries, computing the uncached ones in one batch where the model allows it."""
+        return self._embed(texts, "q:", lambda missing: embed_queries(self.inner, missing))
+
+    def _embed(
+        self, texts: List[str], prefix: str, compute: Callable[[List[str]], List[List[float]]]
+    ) -> List[List[float]]:
+        # Vector stores embed search queries themselves, so query embedding is timed here.
+        with stage("embedding"):
+            return self._lookup_or_compute(texts, prefix, compute)
+
+    def _lookup_or_compute(
+        self, texts: List[str], prefix: str, compute: Callable[[List[str]], List[List[float]]]
+    ) -> List[List[float]]:
+        keys = [prefix + text_hash(t) for t in texts]
+        cached = self.store.get_many(keys)
+        missing: Dict[str, str] = {}
+        for key, text, vec in zip(keys, texts, cached, strict=True):
+            if vec is None:
+                missing.setdefault(key, text)
+        fresh: Dict[str, List[float]] = {}
+        if missing:
+            vectors = compute(list(missing.values()))
+            fresh = dict(zip(missing.keys(), vectors, strict=True))
+            self.store.put_many(list(fresh.keys()), list(fresh.values()))
+        return [fresh[key] if vec is None else vec.tolist() for key, vec in zip(keys, cached, strict=True)]
+
+
+# Embedding classes whose ``embed_query(t)`` equals ``embed_documents([t])[0]``; others (e.g. Vertex AI,
+# which tags queries with a retrieval task type) are embedded one query at a time.
+_SYMMETRIC_EMBEDDINGS = frozenset({"HuggingFaceEmbeddings", "OpenAIEmbeddings", "AzureOpenAIEmbeddings"})
+
+
+def embed_queries(embeddings: Embeddings, texts: List[str]) -> List[List[float]]:
+    """Embed ``texts`` as queries with as few model calls as possible.
+
+    Models known to embed queries and documents the same way get a single
+    ``embed_documents`` batch; the rest fall back to ``embed_query`` per text.
+    """
+    if not texts:
+        return []
+    if isinstance(embeddings, CachedEmbeddings):
+        return embeddings.embed_queries(texts)
+    symmetric = any(cls.__name__ in _SYMMETRIC_EMBEDDINGS for cls in type(embeddings).__mro__)
+    if len(texts) == 1 or not symmetric or getattr(embeddings, "query_encode_kwargs", None):
+        return [embeddings.embed_query(t) for t in texts]
+    return embeddings.embed_documents(texts)
+
+
+def prefetch_queries(embeddings: Embeddings, texts: Iterable[str], batch_size: int = PREFETCH_BATCH_SIZE) -> int:
+    """Embed ``texts`` as queries ahead of time, ``batch_size`` distinct texts per call.
+
+    Only cache-wrapped embeddings keep the vectors, so later ``embed_query`` calls for the same
+    text are served from the cache; anything else is a no-op. Returns the number of texts sent.
+    """
+    if not isinstance(embeddings, CachedEmbeddings):
+        return 0
+    seen: set[str] = set()
+    batch: List[str] = []
+    sent = 0
+    for text in texts:
+        if text in seen:
+            continue
+        seen.add(text)
+        batch.append(text)
+        if len(batch) >= max(1, batch_size):
+            embeddings.embed_queries(batch)
+            sent += len(batch)
+            batch = []
+    if batch:
+        embeddings.embed_queries(batch)
+        sent += len(batch)
+    return sent
+
+
+_STORES: Dict[tuple[str, str], EmbeddingStore] = {}
+_STORES_LOCK = threading.Lock()
+
+
+def get_embedding_store(model_id: str) -> EmbeddingStore:
+    """Return the process-wide store for ``model_id`` under :data:`ROOT`."""
+    key = (str(ROOT), model_id)
+    with _STORES_LOCK:
+        store = _STORES.get(key)
+        if store is None:
+            max_mb = float(os.getenv(MAX_MB_ENV) or _DEFAULT_MAX_MB)
+            store = EmbeddingStore(ROOT / text_hash(model_id)[:16], model_id, int(max_mb * 1024 * 1024))
+            _STORES[key] = store
+    return store
+
+
+@atexit.register
+def _flush_stores() -> None:
+    with _STORES_LOCK:
+        stores = list(_STORES.values())
+    for store in stores:
+        try:
+            store.flush()
+        except Exception:
+            pass
+
+
+def with_embedding_cache(embeddings: Embeddings) -> Embeddings:
+    """Wrap ``embeddings`` with the persistent cache when it is enabled and the model is identifiable."""
+    if isinstance(embeddings, CachedEmbeddings):
+        return embeddings
+    if (os.getenv(DISABLE_ENV) or "").strip().lower() in {"1", "true", "yes", "on"}:
+        return embeddings
+    model_id = embedding_model_id(embeddings)
+    if model_id is None:
+        return embeddings
+    return CachedEmbeddings(embeddings, get_embedding_store(model_id))
@@ -36,3 +36,22 @@ def make_hf_embeddings(
         model_kwargs=mk,
         encode_kwargs=encode_kwargs or {},
     )
+
+
+# Attribute names used by the supported LangChain embeddings to carry their model/deployment id.
+_MODEL_ID_ATTRS = ("model_name", "model_id", "model", "deployment", "azure_deployment")
+
+
+def embedding_model_id(embeddings: Any) -> Optional[str]:
+    """Return a stable identifier for the model behind ``embeddings``.
+
+    Returns ``None`` when no model id can be found, so callers can avoid sharing
+    vectors between embeddings they cannot tell apart.
+    """
+    for attr in _MODEL_ID_ATTRS:
+        value = getattr(embeddings, attr, None)
+        if isinstance(value, str) and value:
+            encode = getattr(embeddings, "encode_kwargs", None)
+            suffix = f"|{sorted(encode.items())}" if isinstance(encode, dict) and encode else ""
+            return f"{type(embeddings).__name__}:{value}{suffix}"
+    return None
@@ -0,0 +1,15 @@
+import hashlib
+import json
+
+from langchain_core.documents import Document
+
+
+def text_hash(text: str) -> str:
+    """Return the SHA256 hex digest of a UTF-8 string."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def document_hash(doc: Document) -> str:
+    """Return a content hash covering the document text and its metadata."""
+    meta = json.dumps(doc.metadata, sort_keys=True, default=str)
+    return text_hash(doc.page_content + "\x00" + meta)
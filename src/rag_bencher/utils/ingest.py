@@ -0,0 +1,193 @@
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Generator, Iterable, List, Optional
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from .chunking import Split
+from .chunking import chunk_workers as chunk_workers_setting
+from .chunking import iter_chunk_batches
+
+# Chunks sent to the embedding model per call.
+EMBED_BATCH_SIZE = 256
+# Batches buffered between two stages; bounds memory when a later stage is the slow one.
+QUEUE_SIZE = 4
+
+Sink = Callable[[List[Document], np.ndarray[Any, np.dtype[np.float32]]], None]
+
+
+@dataclass
+class StageStats:
+    """Items one ingest stage produced and the time it spent working on them."""
+
+    name: str
+    workers: int = 1
+    items: int = 0
+    seconds: float = 0.0
+
+    @property
+    def per_second(self) -> float:
+        """Throughput of the stage across its workers while busy."""
+        return self.items * self.workers / self.seconds if self.seconds > 0 else 0.0
+
+
+@dataclass
+class IngestStats:
+    """Per-stage throughput of one :func:`ingest` run; ``wall_seconds`` covers the whole run."""
+
+    stages: List[StageStats] = field(default_factory=list)
+    wall_seconds: float = 0.0
+
+    def stage(self, name: str) -> StageStats:
+        """Return the stats of the stage called ``name``."""
+        return next(s for s in self.stages if s.name == name)
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Return the stats as a JSON-serializable dict for reports."""
+        return {
+            "wall_seconds": round(self.wall_seconds, 3),
+            "stages": {
+                s.name: {
+                    "items": s.items,
+                    "workers": s.workers,
+                    "seconds": round(s.seconds, 3),
+                    "per_second": round(s.per_second, 1),
+                }
+                for s in self.stages
+            },
+        }
+
+
+def ingest(
+    batches: Iterable[List[Document]],
+    split: Split,
+    embeddings: Embeddings,
+    sink: Sink,
+    *,
+    embed_batch_size: int = EMBED_BATCH_SIZE,
+    queue_size: int = QUEUE_SIZE,
+    chunk_workers: Optional[int] = None,
+) -> IngestStats:
+    """Load, chunk and embed documents as concurrent stages joined by bounded queues.
+
+    ``batches`` is drained on a loader thread and ``split`` runs in a process pool of
+    ``chunk_workers`` processes (see :func:`~rag_bencher.utils.chunking.iter_chunk_batches`).
+    The calling thread embeds chunks ``embed_batch_size`` at a time and hands each batch with
+    its vectors to ``sink`` in input order.
+    """
+    if embed_batch_size < 1 or queue_size < 1:
+        raise ValueError("embed_batch_size and queue_size must be at least 1")
+    workers = chunk_workers_setting() if chunk_workers is None else chunk_workers
+    load, chunk = StageStats("load"), StageStats("chunk", workers=max(1, workers))
+    embed, store = StageStats("embed"), StageStats("store")
+    loaded: queue.Queue[Any] = queue.Queue(maxsize=queue_size)
+    chunked: queue.Queue[Any] = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    started = time.perf_counter()
+    threads = [
+        threading.Thread(target=_pump, args=(_timed(iter(batches), load), loaded, stop), daemon=True),
+        threading.Thread(
+            target=_pump, args=(_chunk_stage(_drain(loaded, stop), split, workers, chunk), chunked, stop), daemon=True
+        ),
+    ]
+    for thread in threads:
+        thread.start()
+    try:
+        pending: List[Document] = []
+        for chunks in _drain(chunked, stop):
+            pending.extend(chunks)
+            while len(pending) >= embed_batch_size:
+                _embed(pending[:embed_batch_size], embeddings, sink, embed, store)
+                pending = pending[embed_batch_size:]
+        if pending:
+            _embed(pending, embeddings, sink, embed, store)
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+    return IngestStats(stages=[load, chunk, embed, store], wall_seconds=time.perf_counter() - started)
+
+
+@dataclass(frozen=True)
+class _Failed:
+    error: Exception
+
+
+_DONE = object()
+
+
+def _embed(chunks: List[Document], embeddings: Embeddings, sink: Sink, embed: StageStats, store: StageStats) -> None:
+    started = time.perf_counter()
+    vectors = np.asarray(embeddings.embed_documents([c.page_content for c in chunks]), dtype=np.float32)
+    embedded = time.perf_counter()
+    sink(chunks, vectors)
+    embed.items += len(chunks)
+    embed.seconds += embedded - started
+    store.items += len(chunks)
+    store.seconds += time.perf_counter() - embedded
+
+
+def _timed(batches: Any, stats: StageStats) -> Generator[List[Document], None, None]:
+    while True:
+        started = time.perf_counter()
+        batch = next(batches, None)
+        if batch is None:
+            return
+        stats.items += len(batch)
+        stats.seconds += time.perf_counter() - started
+        yield batch
+
+
+def _chunk_stage(
+    batches: Generator[List[Document], None, None], split: Split, workers: int, stats: StageStats
+) -> Generator[List[Document], None, None]:
+    chunked = iter_chunk_batches(batches, split, workers)
+    try:
+        for chunks, seconds in chunked:
+            stats.items += len(chunks)
+            stats.seconds += seconds
+            yield chunks
+    finally:
+        chunked.close()
+
+
+def _pump(items: Generator[Any, None, None], out: queue.Queue[Any], stop: threading.Event) -> None:
+    try:
+        for item in items:
+            if not _put(out, item, stop):
+                return
+    except Exception as exc:  # handed to the consumer, which re-raises it
+        _put(out, _Failed(exc), stop)
+        return
+    finally:
+        items.close()
+    _put(out, _DONE, stop)
+
+
+def _put(out: queue.Queue[Any], item: Any, stop: threading.Event) -> bool:
+    while not stop.is_set():
+        try:
+            out.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _drain(source: queue.Queue[Any], stop: threading.Event) -> Generator[Any, None, None]:
+    while not stop.is_set():
+        try:
+            item = source.get(timeout=0.1)
+        except queue.Empty:
+            continue
+        if item is _DONE:
+            return
+        if isinstance(item, _Failed):
+            raise item.error
+        yield item
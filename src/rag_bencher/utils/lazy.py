@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import importlib
+import importlib.util
+import sys
+from types import ModuleType
+from typing import Any
+
+
+def lazy_import(name: str) -> ModuleType:
+    """Return module ``name``, deferring its execution until one of its attributes is first used.
+
+    The module is registered in ``sys.modules`` (and on its parent package) right away, so
+    later regular imports and ``monkeypatch.setattr`` see the same object.
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    spec = importlib.util.find_spec(name)
+    if spec is None or spec.loader is None:
+        raise ModuleNotFoundError(f"No module named {name!r}", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    parent, _, child = name.rpartition(".")
+    if parent:
+        setattr(sys.modules[parent], child, module)
+    return module
+
+
+class LazyCallable:
+    """Stand-in for the callable ``module.attr`` (usually a class) that imports ``module`` on first call."""
+
+    def __init__(self, module: str, attr: str) -> None:
+        self.module = module
+        self.attr = attr
+
+    def resolve(self) -> Any:
+        """Import the module and return the real object."""
+        return getattr(importlib.import_module(self.module), self.attr)
+
+    def __call__(self, *args: Any, **kwargs: Any) -> Any:
+        """Construct or call the real object."""
+        return self.resolve()(*args, **kwargs)
+
+    def __repr__(self) -> str:
+        """Name the deferred object."""
+        return f"<lazy {self.module}.{self.attr}>"
@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import os
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.globals import get_llm_cache, set_llm_cache
+from langchain_core.messages import message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatGeneration, Generation
+
+from .cache import K, answer_store
+
+# Public env knob: RAG_BENCH_DISABLE_LLM_CACHE=1 leaves LLM calls uncached.
+DISABLE_ENV = "RAG_BENCH_DISABLE_LLM_CACHE"
+DB_FILE = "llm_calls.sqlite"
+# generation_info flag set on generations served from the cache, so usage tracking does not bill them.
+CACHED_FLAG = "rag_bencher_cached"
+
+
+class PersistentLLMCache(BaseCache):
+    """LangChain LLM cache persisted in an :class:`~rag_bencher.utils.cache.AnswerStore`.
+
+    Entries are keyed by the exact serialized prompt and LangChain's ``llm_string``, which
+    encodes the model class and its parameters (model name, temperature, stop words, ...).
+    Every model call in every pipeline goes through it while :func:`llm_cache` is active,
+    so a query expansion or HyDE hypothesis shared by several configs is generated once.
+    """
+
+    def __init__(self, filename: str = DB_FILE) -> None:
+        self.filename = filename
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        """Return the cached generations for ``prompt`` and ``llm_string``, or ``None``."""
+        hit = answer_store(self.filename).get_many([K(llm_string, prompt)])[0]
+        if not isinstance(hit, list):
+            return None
+        try:
+            return [_load_generation(g) for g in hit]
+        except (KeyError, TypeError, ValueError):
+            return None
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        """Store the generations an LLM returned for ``prompt`` and ``llm_string``."""
+        answer_store(self.filename).put_many([(K(llm_string, prompt), [_dump_generation(g) for g in return_val])])
+
+    def clear(self, **kwargs: Any) -> None:
+        """Drop every cached LLM response."""
+        answer_store(self.filename).clear()
+
+
+@contextmanager
+def llm_cache(enabled: bool = True) -> Iterator[Optional[BaseCache]]:
+    """Install :class:`PersistentLLMCache` as LangChain's global LLM cache while the block runs.
+
+    Nothing is installed when ``enabled`` is false, when ``RAG_BENCH_DISABLE_LLM_CACHE`` is set
+    or when the caller already installed a cache. Yields the active cache, if any.
+    """
+    previous = get_llm_cache()
+    disabled = (os.getenv(DISABLE_ENV) or "").strip().lower() in {"1", "true", "yes", "on"}
+    if not enabled or disabled or previous is not None:
+        yield previous if enabled and not disabled else None
+        return
+    cache = PersistentLLMCache()
+    set_llm_cache(cache)
+    try:
+        yield cache
+    finally:
+        set_llm_cache(previous)
+
+
+def _dump_generation(gen: Generation) -> Dict[str, Any]:
+    out: Dict[str, Any] = {"text": gen.text, "generation_info": gen.generation_info}
+    if isinstance(gen, ChatGeneration):
+        out["message"] = message_to_dict(gen.message)
+    return out
+
+
+def _load_generation(data: Dict[str, Any]) -> Generation:
+    info = {**(data["generation_info"] or {}), CACHED_FLAG: True}
+    if "message" in data:
+        return ChatGeneration(message=messages_from_dict([data["message"]])[0], generation_info=info)
+    return Generation(text=data["text"], generation_info=info)
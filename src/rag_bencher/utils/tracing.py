@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Dict, Iterator, Optional
+
+from langchain_core.runnables.config import ensure_config
+
+# Key under RunnableConfig["configurable"] holding the StageTrace of one invocation.
+TRACE_KEY = "rag_bencher_trace"
+# Stages the built-in pipelines record, in pipeline order.
+STAGES = ("query_generation", "embedding", "vector_search", "rerank", "prompt", "llm")
+
+
+class StageTrace:
+    """Seconds spent in each pipeline stage during one invocation.
+
+    Filled by :func:`stage` blocks, possibly from the worker threads of a parallel step.
+    """
+
+    def __init__(self) -> None:
+        self._seconds: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def add(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self._seconds[name] = self._seconds.get(name, 0.0) + seconds
+
+    def seconds(self) -> Dict[str, float]:
+        """Return the time recorded per stage so far."""
+        with self._lock:
+            return dict(self._seconds)
+
+
+@dataclass
+class _Span:
+    children: float = 0.0
+
+
+# Innermost open stage of the current thread or task.
+_OPEN: ContextVar[Optional[_Span]] = ContextVar("rag_bencher_stage", default=None)
+
+
+def current_trace() -> Optional[StageTrace]:
+    """Return the trace of the runnable invocation in progress, if it carries one."""
+    trace = (ensure_config().get("configurable") or {}).get(TRACE_KEY)
+    return trace if isinstance(trace, StageTrace) else None
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time the block as stage ``name`` of the current invocation's trace; a no-op outside one.
+
+    Stages nest: time spent in an inner stage (e.g. ``embedding`` inside ``vector_search``)
+    is recorded under the inner stage only, so the stages of an invocation never overlap.
+    """
+    trace = current_trace()
+    if trace is None:
+        yield
+        return
+    span = _Span()
+    parent = _OPEN.get()
+    token = _OPEN.set(span)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        _OPEN.reset(token)
+        if parent is not None:
+            parent.children += elapsed
+        trace.add(name, max(0.0, elapsed - span.children))
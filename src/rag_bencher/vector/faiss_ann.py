@@ -0,0 +1,197 @@
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass, fields, replace
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+from .numpy_store import SEARCH_BLOCK_ELEMENTS, normalize_rows, top_k_blocks
+
+ANN_KINDS = ("ivf_flat", "ivf_pq", "hnsw")
+# RAG_BENCH_VECTORSTORE values that select an approximate FAISS index with default parameters.
+ENV_MODES = {"faiss-ivf-flat": "ivf_flat", "faiss-ivf-pq": "ivf_pq", "faiss-hnsw": "hnsw"}
+# Public env knobs that tune env-selected indexes: RAG_BENCH_FAISS_NPROBE, RAG_BENCH_FAISS_EF_SEARCH,
+# RAG_BENCH_FAISS_TRAIN_SIZE.
+_ENV_PARAMS = {
+    "nprobe": "RAG_BENCH_FAISS_NPROBE",
+    "ef_search": "RAG_BENCH_FAISS_EF_SEARCH",
+    "train_size": "RAG_BENCH_FAISS_TRAIN_SIZE",
+}
+# Stored vectors read per block when computing exact search for recall.
+RECALL_BLOCK_ROWS = 4096
+
+
+@dataclass(frozen=True)
+class AnnSpec:
+    """Approximate-nearest-neighbour FAISS index settings.
+
+    ``nlist``/``nprobe`` apply to the IVF kinds, ``pq_m``/``pq_bits`` to IVF-PQ and
+    ``hnsw_m``/``ef_search`` to HNSW. ``train_size`` caps the vectors sampled for training.
+    """
+
+    kind: str
+    nlist: int = 1024
+    nprobe: int = 16
+    pq_m: int = 16
+    pq_bits: int = 8
+    hnsw_m: int = 32
+    ef_search: int = 64
+    train_size: int = 100_000
+    seed: int = 42
+
+    def __post_init__(self) -> None:
+        """Validate the index kind and numeric parameters."""
+        if self.kind not in ANN_KINDS:
+            raise ValueError(f"Unknown ANN index kind {self.kind!r}. Expected one of: {', '.join(ANN_KINDS)}.")
+        for f in fields(self):
+            value = getattr(self, f.name)
+            if f.name != "kind" and (not isinstance(value, int) or value < (0 if f.name == "seed" else 1)):
+                raise ValueError(f"ANN parameter {f.name} must be a positive integer, got {value!r}")
+
+    def factory_string(self, nlist: Optional[int] = None) -> str:
+        """Return the ``faiss.index_factory`` description of this index."""
+        if self.kind == "hnsw":
+            return f"HNSW{self.hnsw_m},Flat"
+        lists = nlist or self.nlist
+        if self.kind == "ivf_pq":
+            return f"IVF{lists},PQ{self.pq_m}x{self.pq_bits}"
+        return f"IVF{lists},Flat"
+
+
+def ann_spec_from_config(vector: Optional[Mapping[str, Any]]) -> Optional[AnnSpec]:
+    """Build an :class:`AnnSpec` from a ``vector: {name: faiss, index: ...}`` config block."""
+    if not vector or str(vector.get("name") or "").lower() != "faiss":
+        return None
+    params = {k: v for k, v in vector.items() if k not in {"name", "index"}}
+    known = {f.name for f in fields(AnnSpec)} - {"kind"}
+    unknown = sorted(set(params) - known)
+    if unknown:
+        raise ValueError(f"Unknown faiss vector option(s): {', '.join(unknown)}")
+    return AnnSpec(kind=str(vector.get("index") or "hnsw").lower(), **params)
+
+
+def ann_spec_from_env() -> Optional[AnnSpec]:
+    """Return the index selected by ``RAG_BENCH_VECTORSTORE=faiss-<kind>``, tuned by the FAISS env knobs."""
+    kind = ENV_MODES.get((os.getenv("RAG_BENCH_VECTORSTORE") or "").strip().lower())
+    if kind is None:
+        return None
+    overrides: Dict[str, Any] = {name: int(os.environ[env]) for name, env in _ENV_PARAMS.items() if os.getenv(env)}
+    return AnnSpec(kind=kind, **overrides)
+
+
+def effective_spec(spec: AnnSpec, rows: int) -> AnnSpec:
+    """Return the index :func:`build_faiss_ann` actually builds for ``spec`` over ``rows`` vectors.
+
+    IVF needs at least one training point per list, so small corpora get fewer lists; and each
+    PQ codebook trains ``2**pq_bits`` centroids, so too small a sample keeps IVF-PQ vectors
+    uncompressed (IVF-Flat).
+    """
+    if spec.kind == "hnsw":
+        return spec
+    sample = min(rows, spec.train_size)
+    spec = replace(spec, nlist=min(spec.nlist, max(1, sample)))
+    if spec.kind == "ivf_pq" and sample < 2**spec.pq_bits:
+        spec = replace(spec, kind="ivf_flat")
+    return spec
+
+
+def build_faiss_ann(
+    documents: Sequence[Document], embeddings: Embeddings, spec: AnnSpec, *, vectors: Optional[Any] = None
+) -> VectorStore:
+    """Embed ``documents`` and index them in a trained FAISS ANN index with inner-product (cosine) search.
+
+    Stored vectors are unit length, so inner-product ranking equals cosine ranking for any query norm.
+    ``vectors`` are precomputed embeddings of ``documents``. The index built is
+    :func:`effective_spec` of ``spec``; IVF-PQ raises ``ValueError`` unless ``pq_m`` divides the dimension.
+    """
+    import faiss
+    from langchain_community.docstore.in_memory import InMemoryDocstore
+    from langchain_community.vectorstores.faiss import FAISS
+    from langchain_community.vectorstores.utils import DistanceStrategy
+
+    docs = list(documents)
+    if vectors is None:
+        vectors = embeddings.embed_documents([d.page_content for d in docs])
+    vectors = normalize_rows(vectors)
+    n, dim = vectors.shape
+    if spec.kind == "ivf_pq" and dim % spec.pq_m:
+        raise ValueError(f"IVF-PQ pq_m={spec.pq_m} must divide the embedding dimension {dim}")
+    spec = effective_spec(spec, n)
+    rng = np.random.default_rng(spec.seed)
+    sample = vectors if n <= spec.train_size else vectors[np.sort(rng.choice(n, spec.train_size, replace=False))]
+    index = faiss.index_factory(dim, spec.factory_string(), faiss.METRIC_INNER_PRODUCT)
+    if not index.is_trained:
+        index.train(sample)
+    index.add(vectors)
+    params = faiss.ParameterSpace()
+    if spec.kind == "hnsw":
+        params.set_index_parameter(index, "efSearch", spec.ef_search)
+    else:
+        params.set_index_parameter(index, "nprobe", spec.nprobe)
+    ids = [str(i) for i in range(n)]
+    stored = {
+        i: Document(id=i, page_content=d.page_content, metadata=d.metadata) for i, d in zip(ids, docs, strict=True)
+    }
+    return FAISS(
+        embedding_function=embeddings,
+        index=index,
+        docstore=InMemoryDocstore(stored),
+        index_to_docstore_id=dict(enumerate(ids)),
+        distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT,
+    )
+
+
+def index_vector_blocks(index: Any, rows: int = RECALL_BLOCK_ROWS) -> Iterator[Any]:
+    """Yield the vectors stored in the FAISS ``index``, ``rows`` at a time.
+
+    Exact only for indexes that keep vectors uncompressed (IVF-Flat, HNSW); IVF-PQ reconstructions are lossy.
+    """
+    if hasattr(index, "make_direct_map"):
+        # IVF indexes need a row-id -> list map before rows can be reconstructed.
+        index.make_direct_map()
+    for start in range(0, index.ntotal, rows):
+        yield index.reconstruct_n(start, min(rows, index.ntotal - start))
+
+
+def ann_recall(index: Any, exact_vectors: Any, query_vectors: Any, k: int) -> float:
+    """Mean recall@k of ``index`` against exact cosine search over ``exact_vectors``.
+
+    ``index`` is the raw FAISS index (``store.index``); row ids are compared directly.
+    ``exact_vectors`` is a matrix or an iterable of consecutive row blocks (e.g.
+    :func:`index_vector_blocks`); exact scores are computed one bounded block at a time.
+    """
+    queries = normalize_rows(query_vectors)
+    if queries.shape[0] == 0:
+        return 1.0
+    blocks: Iterable[Any] = [exact_vectors] if hasattr(exact_vectors, "shape") else exact_vectors
+    step = max(1, SEARCH_BLOCK_ELEMENTS // queries.shape[0])
+
+    def scored() -> Iterator[Any]:
+        for block in blocks:
+            for start in range(0, len(block), step):
+                yield queries @ normalize_rows(block[start : start + step]).T
+
+    exact, _ = top_k_blocks(scored(), queries.shape[0], k)
+    top = exact.shape[1]
+    if top == 0:
+        return 1.0
+    _, approx = index.search(queries, top)
+    hits: List[float] = [len(set(e.tolist()) & set(a.tolist())) / top for e, a in zip(exact, approx, strict=True)]
+    return float(np.mean(hits))
+
+
+def describe(spec: AnnSpec) -> Dict[str, Any]:
+    """Return the tunables that matter for ``spec.kind``, for reports.
+
+    Pass the :func:`effective_spec` of an index to report the lists it was actually built with.
+    """
+    if spec.kind == "hnsw":
+        return {"kind": spec.kind, "hnsw_m": spec.hnsw_m, "ef_search": spec.ef_search}
+    out: Dict[str, Any] = {"kind": spec.kind, "nlist": spec.nlist, "nprobe": spec.nprobe, "train_size": spec.train_size}
+    if spec.kind == "ivf_pq":
+        out.update(pq_m=spec.pq_m, pq_bits=spec.pq_bits)
+    return out
@@ -0,0 +1,277 @@
+from __future__ import annotations
+
+import json
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from rag_bencher.utils.chunking import Split
+from rag_bencher.utils.hashing import text_hash
+from rag_bencher.utils.ingest import IngestStats, ingest
+from rag_bencher.utils.locking import exclusive_lock
+
+from .numpy_store import ChunkFile, NumpyVectorStore, normalize_rows
+
+FORMAT_VERSION = 1
+MANIFEST_FILE = "files.json"
+# Held exclusively for the whole of a sync, compaction included.
+LOCK_FILE = ".lock"
+# Changed files handed to the chunking stage at a time.
+READ_BATCH_SIZE = 64
+
+
+@dataclass(frozen=True)
+class SyncStats:
+    """What one :meth:`FileIndex.sync` did."""
+
+    added: int = 0
+    changed: int = 0
+    deleted: int = 0
+    unchanged: int = 0
+    chunks_embedded: int = 0
+    compacted: bool = False
+    ingest: Optional[IngestStats] = field(default=None, compare=False)
+
+
+class FileIndex:
+    """Vector index over text files that is updated in place as the files change.
+
+    ``files.json`` records each file's mtime, size, content hash and row range. A sync reads
+    only files whose mtime or size moved, re-chunks and re-embeds only those whose content
+    changed, appends their rows and retires the rows of changed or deleted files; the data
+    files are compacted once retired rows outnumber live ones. Files that still exist but are
+    not part of this sync stay indexed, so corpora sharing a model and chunking share a
+    directory. Rows are appended before the manifest is replaced, so an interrupted sync leaves
+    the previous index intact. A sync holds an exclusive lock on the directory's ``LOCK_FILE``,
+    so processes sharing a directory sync one at a time, each extending the latest manifest.
+    """
+
+    def __init__(self, directory: Path, embeddings: Embeddings, *, model_id: str, params: str) -> None:
+        self.directory = directory
+        self.embeddings = embeddings
+        self.model_id = model_id
+        self.params = params
+        self._manifest = self._read_manifest()
+
+    def _file(self, kind: str, generation: Optional[int] = None) -> Path:
+        gen = int(self._manifest["generation"]) if generation is None else generation
+        suffix = {"vectors": "f32", "chunks": "jsonl", "offsets": "i64"}[kind]
+        return self.directory / f"{kind}-{gen}.{suffix}"
+
+    def _read_manifest(self) -> Dict[str, Any]:
+        try:
+            manifest = json.loads((self.directory / MANIFEST_FILE).read_text("utf-8"))
+        except (OSError, ValueError):
+            manifest = None
+        if (
+            isinstance(manifest, dict)
+            and manifest.get("format") == FORMAT_VERSION
+            and manifest.get("model") == self.model_id
+            and manifest.get("params") == self.params
+        ):
+            return manifest
+        return self._empty_manifest()
+
+    def _empty_manifest(self) -> Dict[str, Any]:
+        return {
+            "format": FORMAT_VERSION,
+            "model": self.model_id,
+            "params": self.params,
+            "generation": 0,
+            "dim": None,
+            "rows": 0,
+            "chunk_bytes": 0,
+            "files": {},
+        }
+
+    def sync(self, paths: Iterable[str], split: Split, *, chunk_workers: Optional[int] = None) -> SyncStats:
+        """Bring the index in line with ``paths``, chunking new or changed files with ``split``.
+
+        Reading, chunking and embedding the changed files run as a :func:`~rag_bencher.utils.ingest.ingest`
+        pipeline, so ``split`` must be picklable when more than one batch of files changed.
+        """
+        with exclusive_lock(self.directory / LOCK_FILE):
+            # Another process may have synced since this index was opened; extend its manifest.
+            self._manifest = self._read_manifest()
+            return self._sync(paths, split, chunk_workers)
+
+    def sync_store(
+        self, paths: Iterable[str], split: Split, *, chunk_workers: Optional[int] = None
+    ) -> Tuple[NumpyVectorStore, SyncStats]:
+        """Like :meth:`sync`, then map the rows of ``paths`` as a vector store before releasing the lock.
+
+        Mapping under the lock means another process cannot compact the synced generation away first.
+        """
+        wanted = list(dict.fromkeys(paths))
+        with exclusive_lock(self.directory / LOCK_FILE):
+            self._manifest = self._read_manifest()
+            stats = self._sync(wanted, split, chunk_workers)
+            return self.store(wanted), stats
+
+    def _sync(self, paths: Iterable[str], split: Split, chunk_workers: Optional[int]) -> SyncStats:
+        self._recover()
+        files: Dict[str, Dict[str, Any]] = self._manifest["files"]
+        wanted = list(dict.fromkeys(paths))
+        fresh: Dict[str, Dict[str, Any]] = {}
+        touched: Dict[str, Dict[str, int]] = {}
+
+        def changed_files() -> Iterator[List[Document]]:
+            batch: List[Document] = []
+            for path in wanted:
+                st = os.stat(path)
+                entry = files.get(path)
+                if entry is not None and entry["mtime_ns"] == st.st_mtime_ns and entry["size"] == st.st_size:
+                    continue
+                text = Path(path).read_text(encoding="utf-8")
+                digest = text_hash(text)
+                if entry is not None and entry["sha256"] == digest:
+                    # Touched but not edited: keep the rows, refresh the stat fingerprint.
+                    touched[path] = {"mtime_ns": st.st_mtime_ns, "size": st.st_size}
+                    continue
+                fresh[path] = {"mtime_ns": st.st_mtime_ns, "size": st.st_size, "sha256": digest, "start": 0, "count": 0}
+                batch.append(Document(page_content=text, metadata={"source": path}))
+                if len(batch) == READ_BATCH_SIZE:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+
+        def append(chunks: List[Document], vectors: Any) -> None:
+            row = int(self._manifest["rows"])
+            for offset, chunk in enumerate(chunks):
+                entry = fresh[chunk.metadata["source"]]
+                if entry["count"] == 0:
+                    entry["start"] = row + offset
+                entry["count"] += 1
+            self._append(chunks, vectors)
+
+        stats = ingest(changed_files(), split, self.embeddings, append, chunk_workers=chunk_workers)
+        for path, stat in touched.items():
+            files[path].update(stat)
+        added = sum(path not in files for path in fresh)
+        files.update(fresh)
+        keep = set(wanted)
+        deleted = [path for path in files if path not in keep and not os.path.exists(path)]
+        for path in deleted:
+            del files[path]
+        live = sum(int(e["count"]) for e in files.values())
+        compacted = int(self._manifest["rows"]) - live > live
+        if compacted:
+            self._compact()
+        else:
+            self._write_manifest()
+        return SyncStats(
+            added=added,
+            changed=len(fresh) - added,
+            deleted=len(deleted),
+            unchanged=len(wanted) - len(fresh),
+            chunks_embedded=stats.stage("embed").items,
+            compacted=compacted,
+            ingest=stats,
+        )
+
+    def store(self, paths: Optional[Iterable[str]] = None) -> NumpyVectorStore:
+        """Map the index as a vector store that searches only the rows of ``paths`` (default: all files)."""
+        rows, dim = int(self._manifest["rows"]), self._manifest["dim"]
+        if rows == 0 or dim is None:
+            return NumpyVectorStore(self.embeddings, np.zeros((0, 0), dtype=np.float32), [])
+        vectors = np.memmap(self._file("vectors"), dtype=np.float32, mode="r", shape=(rows, int(dim)))
+        offsets = np.memmap(self._file("offsets"), dtype=np.int64, mode="r", shape=(rows + 1,))
+        files: Dict[str, Dict[str, Any]] = self._manifest["files"]
+        live = np.zeros(rows, dtype=bool)
+        selected = files.values() if paths is None else [files[p] for p in dict.fromkeys(paths) if p in files]
+        for entry in selected:
+            live[entry["start"] : entry["start"] + entry["count"]] = True
+        return NumpyVectorStore(self.embeddings, vectors, ChunkFile(self._file("chunks"), offsets), live=live)
+
+    def _append(self, chunks: List[Document], embedded: Any) -> None:
+        vectors = normalize_rows(embedded)
+        dim = self._manifest["dim"]
+        if dim is None:
+            self._manifest["dim"] = dim = int(vectors.shape[1])
+        elif vectors.shape[1] != dim:
+            raise ValueError(f"Embedding dimension changed from {dim} to {vectors.shape[1]}")
+        first = int(self._manifest["rows"])
+        pos = int(self._manifest["chunk_bytes"])
+        ends: List[int] = []
+        with open(self._file("chunks"), "ab") as fh:
+            for chunk in chunks:
+                line = _chunk_line(chunk.page_content, chunk.metadata)
+                fh.write(line)
+                pos += len(line)
+                ends.append(pos)
+        with open(self._file("vectors"), "ab") as fh:
+            fh.write(vectors.tobytes())
+        with open(self._file("offsets"), "ab") as fh:
+            fh.write(np.asarray(ends, dtype=np.int64).tobytes())
+        self._manifest["rows"] = first + len(chunks)
+        self._manifest["chunk_bytes"] = pos
+
+    def _recover(self) -> None:
+        """Drop rows appended after the last manifest write; start over if data files are missing rows."""
+        m = self._manifest
+        rows, dim = int(m["rows"]), int(m["dim"] or 0)
+        expected = {"vectors": rows * dim * 4, "offsets": (rows + 1) * 8, "chunks": int(m["chunk_bytes"])}
+        sizes = {kind: (self._file(kind).stat().st_size if self._file(kind).exists() else 0) for kind in expected}
+        if rows and any(sizes[kind] < size for kind, size in expected.items()):
+            for kind in expected:
+                self._file(kind).unlink(missing_ok=True)
+            self._manifest = m = {**self._empty_manifest(), "generation": int(m["generation"]) + 1}
+            expected = {"vectors": 0, "offsets": 8, "chunks": 0}
+        for kind, size in expected.items():
+            with open(self._file(kind), "ab") as fh:
+                if fh.tell() > size:
+                    fh.truncate(size)
+                elif kind == "offsets" and fh.tell() < size:
+                    fh.write(np.zeros(1, dtype=np.int64).tobytes())
+
+    def _compact(self) -> None:
+        """Copy live rows into a new generation of data files, keeping their relative order."""
+        old_gen = int(self._manifest["generation"])
+        new_gen = old_gen + 1
+        rows, dim = int(self._manifest["rows"]), int(self._manifest["dim"] or 0)
+        vectors = np.memmap(self._file("vectors"), dtype=np.float32, mode="r", shape=(rows, dim)) if rows else None
+        offsets = np.fromfile(self._file("offsets"), dtype=np.int64, count=rows + 1)
+        row = 0
+        pos = 0
+        ends: List[int] = []
+        with (
+            open(self._file("chunks"), "rb") as src,
+            open(self._file("vectors", new_gen), "wb") as vec_out,
+            open(self._file("chunks", new_gen), "wb") as chunk_out,
+        ):
+            for entry in sorted(self._manifest["files"].values(), key=lambda e: int(e["start"])):
+                start, count = int(entry["start"]), int(entry["count"])
+                if count and vectors is not None:
+                    vec_out.write(np.asarray(vectors[start : start + count]).tobytes())
+                    begin = int(offsets[start])
+                    src.seek(begin)
+                    block = src.read(int(offsets[start + count]) - begin)
+                    chunk_out.write(block)
+                    ends.extend((offsets[start + 1 : start + count + 1] - begin + pos).tolist())
+                    pos += len(block)
+                entry["start"] = row
+                row += count
+        np.asarray([0, *ends], dtype=np.int64).tofile(self._file("offsets", new_gen))
+        self._manifest.update(generation=new_gen, rows=row, chunk_bytes=pos)
+        del vectors
+        self._write_manifest()
+        for kind in ("vectors", "chunks", "offsets"):
+            self._file(kind, old_gen).unlink(missing_ok=True)
+
+    def _write_manifest(self) -> None:
+        for kind in ("vectors", "chunks", "offsets"):
+            with open(self._file(kind), "ab") as fh:
+                os.fsync(fh.fileno())
+        tmp = self.directory / f"{MANIFEST_FILE}.tmp"
+        tmp.write_text(json.dumps(self._manifest), "utf-8")
+        os.replace(tmp, self.directory / MANIFEST_FILE)
+
+
+def _chunk_line(text: str, metadata: Dict[str, Any]) -> bytes:
+    return json.dumps({"text": text, "metadata": metadata}, default=str).encode() + b"\n"
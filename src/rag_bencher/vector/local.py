@@ -2,42 +2,195 @@ import importlib.util
 import os
 import subprocess
 import sys
+import threading
+import weakref
 from functools import lru_cache
-from typing import Iterable
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, cast
 
+import numpy as np
 from langchain_core.documents import Document
 from langchain_core.embeddings import Embeddings
 from langchain_core.vectorstores import VectorStore
 
+from rag_bencher.utils.chunking import Split
+
+from .faiss_ann import ENV_MODES
+from .file_index import FileIndex, SyncStats
+from .numpy_store import NumpyVectorStore, read_manifest
+
 _VectorStoreFactory = type[VectorStore]
 
 
-def build_local_vectorstore(documents: Iterable[Document], embeddings: Embeddings) -> VectorStore:
-    """Construct a local vector store with FAISS when possible and a safe fallback otherwise."""
+def build_local_vectorstore(
+    documents: Iterable[Document], embeddings: Embeddings, *, vectors: Optional[Any] = None
+) -> VectorStore:
+    """Construct the local vector store selected by ``RAG_BENCH_VECTORSTORE`` (NumPy exact search by default).
+
+    ``vectors`` are precomputed embeddings of ``documents``; backends that cannot take them re-embed.
+    """
     factory = _resolve_factory()
     doc_list = list(documents)
+    if vectors is not None and factory is NumpyVectorStore:
+        return NumpyVectorStore.from_vectors(doc_list, vectors, embeddings)
+    if vectors is not None and hasattr(factory, "from_embeddings"):  # FAISS
+        pairs = [(d.page_content, [float(x) for x in v]) for d, v in zip(doc_list, vectors, strict=True)]
+        store: VectorStore = cast(Any, factory).from_embeddings(
+            pairs, embeddings, metadatas=[d.metadata for d in doc_list]
+        )
+        return store
     return factory.from_documents(doc_list, embeddings)
 
 
+def load_local_vectorstore(
+    directory: Path, embeddings: Embeddings, *, model_id: str, corpus_hash: str
+) -> Optional[NumpyVectorStore]:
+    """Map a saved index from ``directory`` when the local backend persists indexes and the manifest matches."""
+    if _resolve_factory() is not NumpyVectorStore:
+        return None
+    manifest = read_manifest(directory)
+    if manifest is None or manifest.get("model") != model_id or manifest.get("corpus") != corpus_hash:
+        return None
+    return NumpyVectorStore.load(directory, embeddings)
+
+
+def save_local_vectorstore(store: VectorStore, directory: Path, *, model_id: str, corpus_hash: str) -> bool:
+    """Persist ``store`` to ``directory`` if its backend has an on-disk format; return whether it was saved."""
+    if not isinstance(store, NumpyVectorStore):
+        return False
+    dtype = (os.getenv("RAG_BENCH_INDEX_DTYPE") or "float32").strip().lower()
+    store.save(directory, model_id=model_id, corpus_hash=corpus_hash, dtype=dtype)
+    return True
+
+
+def sync_file_index(
+    directory: Path, paths: Sequence[str], embeddings: Embeddings, split: Split, *, model_id: str, params: str
+) -> Optional[Tuple[NumpyVectorStore, SyncStats]]:
+    """Incrementally index the text files at ``paths`` under ``directory`` when the local backend persists indexes."""
+    if _resolve_factory() is not NumpyVectorStore:
+        return None
+    return FileIndex(directory, embeddings, model_id=model_id, params=params).sync_store(paths, split)
+
+
+def stored_vectors(store: VectorStore, docs: Sequence[Document]) -> Optional[List[List[float]]]:
+    """Return the vectors ``store`` already holds for ``docs``, or ``None`` when they cannot all be read back.
+
+    Lets callers score search hits without embedding their text a second time.
+    """
+    if isinstance(store, NumpyVectorStore):
+        return store.vectors_for(docs)
+    records = getattr(store, "store", None)  # InMemoryVectorStore keeps {id: {"vector": ..., ...}}
+    if not isinstance(records, dict):
+        return None
+    vectors: List[List[float]] = []
+    for doc in docs:
+        record = records.get(doc.id) if doc.id else None
+        if not isinstance(record, dict) or record.get("vector") is None:
+            return None
+        vectors.append(list(record["vector"]))
+    return vectors
+
+
+def batch_similarity_search(store: VectorStore, vectors: Sequence[Sequence[float]], k: int) -> List[List[Document]]:
+    """Return the ``k`` nearest chunks for each query vector.
+
+    NumPy, in-memory and FAISS stores answer all queries with a single matrix search; other
+    stores fall back to one ``similarity_search_by_vector`` call per vector.
+    """
+    if not vectors:
+        return []
+    if isinstance(store, NumpyVectorStore):
+        return [[store.chunks[i] for i, _ in hits] for hits in store.search_matrix(vectors, k)]
+    records = getattr(store, "store", None)
+    if isinstance(records, dict):
+        return _inmemory_batch_search(store, records, vectors, k)
+    if hasattr(getattr(store, "index", None), "search") and isinstance(
+        getattr(store, "index_to_docstore_id", None), dict
+    ):
+        return _faiss_batch_search(store, vectors, k)
+    return [store.similarity_search_by_vector(list(v), k=k) for v in vectors]
+
+
+_Matrix = np.ndarray[Any, np.dtype[np.float32]]
+# Normalized copies of in-memory store vectors with the records they were built from, rebuilt once
+# documents are added, replaced or deleted.
+_INMEMORY_MATRICES: "weakref.WeakKeyDictionary[VectorStore, Tuple[List[Dict[str, Any]], List[str], _Matrix]]" = (
+    weakref.WeakKeyDictionary()
+)
+_INMEMORY_LOCK = threading.Lock()
+
+
+def _normalize_rows(matrix: _Matrix) -> _Matrix:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return cast(_Matrix, np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0))
+
+
+def _same_records(held: List[Dict[str, Any]], ids: List[str], records: Dict[str, Any]) -> bool:
+    # Adding or replacing a document stores a new record dict, so identity catches every change.
+    return len(held) == len(records) and all(records.get(i) is r for i, r in zip(ids, held, strict=True))
+
+
+def _inmemory_batch_search(
+    store: VectorStore, records: Dict[str, Any], vectors: Sequence[Sequence[float]], k: int
+) -> List[List[Document]]:
+    with _INMEMORY_LOCK:
+        cached = _INMEMORY_MATRICES.get(store)
+        if cached is None or not _same_records(cached[0], cached[1], records):
+            ids = list(records.keys())
+            held = [records[i] for i in ids]
+            matrix = _normalize_rows(np.asarray([r["vector"] for r in held], dtype=np.float32))
+            cached = (held, ids, matrix)
+            _INMEMORY_MATRICES[store] = cached
+    _, ids, matrix = cached
+    if not ids:
+        return [[] for _ in vectors]
+    scores = _normalize_rows(np.asarray(vectors, dtype=np.float32)) @ matrix.T
+    top = min(k, len(ids))
+    out: List[List[Document]] = []
+    for row in scores:
+        best = np.argpartition(-row, top - 1)[:top]
+        best = best[np.argsort(-row[best], kind="stable")]
+        hits = [records[ids[i]] for i in best.tolist()]
+        out.append([Document(id=r["id"], page_content=r["text"], metadata=r["metadata"]) for r in hits])
+    return out
+
+
+def _faiss_batch_search(store: Any, vectors: Sequence[Sequence[float]], k: int) -> List[List[Document]]:
+    queries = np.asarray(vectors, dtype=np.float32)
+    if getattr(store, "_normalize_L2", False):
+        queries = _normalize_rows(queries)
+    _, indices = store.index.search(queries, k)
+    out: List[List[Document]] = []
+    for row in indices:
+        docs = [store.docstore.search(store.index_to_docstore_id[i]) for i in row.tolist() if i != -1]
+        out.append([d for d in docs if isinstance(d, Document)])
+    return out
+
+
 @lru_cache(maxsize=1)
 def _resolve_factory() -> _VectorStoreFactory:
     mode = (os.getenv("RAG_BENCH_VECTORSTORE") or "auto").strip().lower()
     disable_faiss = _is_truthy(os.getenv("RAG_BENCH_DISABLE_FAISS"))
 
-    if mode in {"memory", "inmemory", "in-memory"} or disable_faiss:
+    if mode == "numpy":
+        return NumpyVectorStore
+
+    if mode in {"memory", "inmemory", "in-memory"}:
         return _inmemory_factory()
 
-    if mode == "faiss":
+    if mode == "faiss" and not disable_faiss:
         if not _faiss_safe_to_import():
             raise RuntimeError(
                 "RAG_BENCH_VECTORSTORE=faiss but FAISS is unavailable or unsafe to import in this environment."
             )
         return _faiss_factory()
 
-    # Default to the safe in-memory implementation unless FAISS is explicitly requested.
-    if mode not in {"", "auto"}:
-        raise ValueError(f"Unknown RAG_BENCH_VECTORSTORE={mode!r}. Expected faiss or memory.")
-    return _inmemory_factory()
+    # Approximate faiss-* modes are built by the corpus index; anything else it builds gets exact search.
+    if mode not in {"", "auto", "faiss"} and mode not in ENV_MODES:
+        raise ValueError(f"Unknown RAG_BENCH_VECTORSTORE={mode!r}. Expected faiss, numpy or memory.")
+    # Default to exact NumPy search, also when RAG_BENCH_DISABLE_FAISS rules FAISS out: no native
+    # extension, so no FAISS import probe is needed.
+    return NumpyVectorStore
 
 
 def _faiss_factory() -> _VectorStoreFactory:
@@ -47,7 +200,9 @@ def _faiss_factory() -> _VectorStoreFactory:
 
 
 def _inmemory_factory() -> _VectorStoreFactory:
-    from langchain_community.vectorstores.inmemory import InMemoryVectorStore
+    # langchain_community.vectorstores.inmemory re-exports this class; importing it from core
+    # avoids pulling in (and warning about) the whole community package.
+    from langchain_core.vectorstores import InMemoryVectorStore
 
     return InMemoryVectorStore
 
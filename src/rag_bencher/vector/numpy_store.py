@@ -0,0 +1,358 @@
+from __future__ import annotations
+
+import json
+import mmap
+import os
+import shutil
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union, cast, overload
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+FORMAT_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+VECTORS_FILE = "vectors.npy"
+CHUNKS_FILE = "chunks.jsonl"
+OFFSETS_FILE = "offsets.npy"
+# Score-matrix elements computed per matmul block (64 MiB of float32); bounds search memory
+# regardless of corpus size, and converts mmapped float16 vectors one block at a time.
+SEARCH_BLOCK_ELEMENTS = 1 << 24
+
+_Matrix = np.ndarray[Any, np.dtype[Any]]
+
+
+def normalize_rows(matrix: Any) -> np.ndarray[Any, np.dtype[np.float32]]:
+    """Return ``matrix`` as float32 rows scaled to unit length; all-zero rows stay zero."""
+    m = np.asarray(matrix, dtype=np.float32)
+    if m.ndim == 1:
+        m = m.reshape(1, -1)
+    norms = np.linalg.norm(m, axis=1, keepdims=True)
+    return cast(np.ndarray[Any, np.dtype[np.float32]], np.divide(m, norms, out=np.zeros_like(m), where=norms > 0))
+
+
+def top_k_blocks(score_blocks: Iterable[_Matrix], n_queries: int, top: int) -> Tuple[_Matrix, _Matrix]:
+    """Return the rows and scores of the ``top`` best-scoring rows per query, best first.
+
+    ``score_blocks`` yields ``(n_queries, rows)`` score matrices of consecutive row blocks; each
+    block keeps only its ``top`` best candidates (``argpartition``) before being merged with the
+    running top-k, so memory stays bounded by one block.
+    """
+    best_rows = np.empty((n_queries, 0), dtype=np.int64)
+    best_scores = np.empty((n_queries, 0), dtype=np.float32)
+    start = 0
+    for scores in score_blocks:
+        width = scores.shape[1]
+        if width:
+            keep = min(top, width)
+            rows = np.argpartition(-scores, keep - 1, axis=1)[:, :keep]
+            best_rows = np.concatenate([best_rows, rows + start], axis=1)
+            best_scores = np.concatenate([best_scores, np.take_along_axis(scores, rows, axis=1)], axis=1)
+            if best_rows.shape[1] > top:
+                merged = np.argpartition(-best_scores, top - 1, axis=1)[:, :top]
+                best_rows = np.take_along_axis(best_rows, merged, axis=1)
+                best_scores = np.take_along_axis(best_scores, merged, axis=1)
+        start += width
+    order = np.argsort(-best_scores, axis=1, kind="stable")
+    return np.take_along_axis(best_rows, order, axis=1), np.take_along_axis(best_scores, order, axis=1)
+
+
+class ChunkFile(Sequence[Document]):
+    """Read-only chunk table backed by a memory-mapped JSON-lines file and a byte-offset index.
+
+    Opening costs two ``mmap`` calls regardless of corpus size; each chunk is parsed on access.
+    """
+
+    def __init__(self, chunks_path: Path, offsets: Union[Path, _Matrix]) -> None:
+        # ``offsets`` is an ``.npy`` file or an already mapped int64 array of row start offsets plus the end.
+        self._offsets = np.load(offsets, mmap_mode="r") if isinstance(offsets, Path) else offsets
+        with open(chunks_path, "rb") as fh:
+            size = os.fstat(fh.fileno()).st_size
+            self._mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+
+    def __len__(self) -> int:
+        """Return the number of chunks."""
+        return max(0, int(self._offsets.shape[0]) - 1)
+
+    @overload
+    def __getitem__(self, index: int) -> Document:  # noqa: D105
+        ...
+
+    @overload
+    def __getitem__(self, index: slice) -> List[Document]:  # noqa: D105
+        ...
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[Document, List[Document]]:
+        """Return the chunk(s) at ``index``."""
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self) or self._mm is None:
+            raise IndexError(index)
+        start, end = int(self._offsets[index]), int(self._offsets[index + 1])
+        record = json.loads(self._mm[start:end])
+        return Document(id=str(index), page_content=record["text"], metadata=record["metadata"])
+
+
+class RowView(Sequence[Document]):
+    """Lazy view of selected rows of a chunk table."""
+
+    def __init__(self, chunks: Sequence[Document], rows: _Matrix) -> None:
+        self._chunks = chunks
+        self._rows = rows
+
+    def __len__(self) -> int:
+        """Return the number of selected rows."""
+        return int(self._rows.shape[0])
+
+    @overload
+    def __getitem__(self, index: int) -> Document:  # noqa: D105
+        ...
+
+    @overload
+    def __getitem__(self, index: slice) -> List[Document]:  # noqa: D105
+        ...
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[Document, List[Document]]:
+        """Return the chunk(s) at ``index`` within the view."""
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        return self._chunks[int(self._rows[index])]
+
+
+class NumpyVectorStore(VectorStore):
+    """Exact cosine-similarity store over a normalized NumPy matrix.
+
+    Chunk ``i`` is returned with ``Document.id == str(i)``. :meth:`save` writes the native
+    on-disk format (``manifest.json``, ``vectors.npy``, ``chunks.jsonl``, ``offsets.npy``)
+    and :meth:`load` maps it back without reading vectors or chunk text into memory.
+    ``live`` optionally masks out rows (e.g. chunks of deleted files) from search.
+    """
+
+    def __init__(
+        self,
+        embedding: Embeddings,
+        vectors: _Matrix,
+        chunks: Sequence[Document],
+        *,
+        live: Optional[_Matrix] = None,
+    ) -> None:
+        if vectors.shape[0] != len(chunks):
+            raise ValueError(f"Got {vectors.shape[0]} vectors for {len(chunks)} chunks")
+        if live is not None and live.shape != (len(chunks),):
+            raise ValueError(f"Live mask covers {live.shape[0]} rows, expected {len(chunks)}")
+        self._embedding = embedding
+        self._vectors = vectors
+        self._chunks = chunks
+        self._live = live
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding
+
+    @property
+    def vectors(self) -> _Matrix:
+        """Normalized vectors, one row per chunk (may be a read-only memory map)."""
+        return self._vectors
+
+    @property
+    def chunks(self) -> Sequence[Document]:
+        return self._chunks
+
+    @property
+    def live_chunks(self) -> Sequence[Document]:
+        """Chunks that search can return, in row order."""
+        if self._live is None:
+            return self._chunks
+        return RowView(self._chunks, np.flatnonzero(self._live))
+
+    def __len__(self) -> int:
+        """Return the number of indexed chunks."""
+        return len(self._chunks)
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[Dict[Any, Any]]] = None,
+        *,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> "NumpyVectorStore":
+        store = cls(embedding, np.zeros((0, 0), dtype=np.float32), [])
+        store.add_texts(texts, metadatas)
+        return store
+
+    @classmethod
+    def from_vectors(cls, documents: Sequence[Document], vectors: Any, embedding: Embeddings) -> "NumpyVectorStore":
+        """Build a store from chunks whose embeddings were already computed."""
+        chunks = [
+            Document(id=str(row), page_content=d.page_content, metadata=dict(d.metadata))
+            for row, d in enumerate(documents)
+        ]
+        return cls(embedding, normalize_rows(vectors) if chunks else np.zeros((0, 0), dtype=np.float32), chunks)
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[Dict[Any, Any]]] = None,
+        *,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> List[str]:
+        text_list = list(texts)
+        if not text_list:
+            return []
+        metas = metadatas or [{} for _ in text_list]
+        fresh = normalize_rows(self._embedding.embed_documents(text_list))
+        start = len(self._chunks)
+        # One contiguous float32 matrix, so search is a plain matmul over row blocks.
+        self._vectors = fresh if start == 0 else np.vstack([np.asarray(self._vectors, dtype=np.float32), fresh])
+        chunks = list(self._chunks)
+        for offset, (text, meta) in enumerate(zip(text_list, metas, strict=True)):
+            chunks.append(Document(id=str(start + offset), page_content=text, metadata=dict(meta)))
+        self._chunks = chunks
+        if self._live is not None:
+            self._live = np.concatenate([self._live, np.ones(len(text_list), dtype=bool)])
+        return [str(start + i) for i in range(len(text_list))]
+
+    def vectors_for(self, docs: Sequence[Document]) -> Optional[List[List[float]]]:
+        """Return the stored (normalized) vectors of chunks previously returned by this store."""
+        rows: List[int] = []
+        for doc in docs:
+            if doc.id is None or not doc.id.isdigit() or int(doc.id) >= len(self._chunks):
+                return None
+            rows.append(int(doc.id))
+        return cast(List[List[float]], np.asarray(self._vectors[rows], dtype=np.float32).tolist())
+
+    def search_matrix(self, queries: Any, k: int) -> List[List[Tuple[int, float]]]:
+        """Return ``(row, cosine)`` pairs of the ``k`` best chunks for each query vector.
+
+        All queries are scored together, one block of stored rows at a time; each block keeps
+        only its ``k`` best candidates (``argpartition``) before being merged with the running top-k.
+        """
+        q = normalize_rows(queries)
+        n = len(self._chunks)
+        live_count = n if self._live is None else int(np.count_nonzero(self._live))
+        if live_count == 0 or k <= 0 or q.shape[0] == 0:
+            return [[] for _ in range(q.shape[0])]
+        top = min(k, live_count)
+        block = max(top, SEARCH_BLOCK_ELEMENTS // q.shape[0])
+
+        def scored() -> Iterator[_Matrix]:
+            for start in range(0, n, block):
+                scores = q @ np.asarray(self._vectors[start : start + block], dtype=np.float32).T
+                if self._live is not None:
+                    scores[:, ~self._live[start : start + block]] = -np.inf
+                yield scores
+
+        best_rows, best_scores = top_k_blocks(scored(), q.shape[0], top)
+        return [
+            [(int(i), float(score)) for i, score in zip(rows_, scores_, strict=True) if score != -np.inf]
+            for rows_, scores_ in zip(best_rows.tolist(), best_scores.tolist(), strict=True)
+        ]
+
+    def similarity_search_with_score_by_vector(
+        self, embedding: List[float], k: int = 4, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        return [(self._chunks[i], score) for i, score in self.search_matrix([embedding], k)[0]]
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k)]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.similarity_search_with_score_by_vector(self._embedding.embed_query(query), k)
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return self.similarity_search_by_vector(self._embedding.embed_query(query), k)
+
+    def _select_relevance_score_fn(self) -> Any:
+        return lambda score: (score + 1.0) / 2.0
+
+    def save(
+        self,
+        directory: Union[str, Path],
+        *,
+        model_id: str,
+        corpus_hash: str,
+        dtype: str = "float32",
+    ) -> Path:
+        """Write the index to ``directory`` atomically.
+
+        An index already there for the same ``model_id`` and ``corpus_hash`` is kept; any other
+        content (a stale or partial index) is replaced.
+        """
+        target = Path(directory)
+        if dtype not in {"float32", "float16"}:
+            raise ValueError(f"Unsupported index dtype {dtype!r}. Expected float32 or float16.")
+        tmp = target.with_name(f"{target.name}.tmp-{os.getpid()}")
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+        dim = int(self._vectors.shape[1]) if self._vectors.ndim == 2 else 0
+        np.save(tmp / VECTORS_FILE, np.asarray(self._vectors, dtype=dtype).reshape(len(self._chunks), dim))
+        offsets = [0]
+        with open(tmp / CHUNKS_FILE, "wb") as fh:
+            for doc in self._chunks:
+                line = json.dumps({"text": doc.page_content, "metadata": doc.metadata}, default=str).encode() + b"\n"
+                fh.write(line)
+                offsets.append(offsets[-1] + len(line))
+        np.save(tmp / OFFSETS_FILE, np.asarray(offsets, dtype=np.int64))
+        manifest = {
+            "format": FORMAT_VERSION,
+            "model": model_id,
+            "corpus": corpus_hash,
+            "dtype": dtype,
+            "dim": dim,
+            "count": len(self._chunks),
+        }
+        # Written last so a reader never sees a manifest without its data files.
+        (tmp / MANIFEST_FILE).write_text(json.dumps(manifest, indent=2), "utf-8")
+        try:
+            os.replace(tmp, target)
+        except OSError:
+            if _same_index(read_manifest(target), model_id, corpus_hash):
+                # Another process published the same index first.
+                shutil.rmtree(tmp, ignore_errors=True)
+                return target
+            # A stale or partially written index is in the way: move it aside, then publish.
+            stale = target.with_name(f"{target.name}.old-{os.getpid()}")
+            shutil.rmtree(stale, ignore_errors=True)
+            try:
+                os.replace(target, stale)
+                os.replace(tmp, target)
+            except OSError:
+                shutil.rmtree(tmp, ignore_errors=True)
+                if not _same_index(read_manifest(target), model_id, corpus_hash):
+                    raise
+            finally:
+                shutil.rmtree(stale, ignore_errors=True)
+        return target
+
+    @classmethod
+    def load(cls, directory: Union[str, Path], embedding: Embeddings) -> "NumpyVectorStore":
+        """Memory-map an index written by :meth:`save`."""
+        path = Path(directory)
+        manifest = read_manifest(path)
+        if manifest is None:
+            raise FileNotFoundError(f"No vector index at {path}")
+        vectors = np.load(path / VECTORS_FILE, mmap_mode="r")
+        return cls(embedding, vectors, ChunkFile(path / CHUNKS_FILE, path / OFFSETS_FILE))
+
+
+def read_manifest(directory: Union[str, Path]) -> Optional[Dict[str, Any]]:
+    """Return the manifest of the index in ``directory``, or ``None`` if absent, unreadable or of another format."""
+    try:
+        manifest = json.loads((Path(directory) / MANIFEST_FILE).read_text("utf-8"))
+    except (OSError, ValueError):
+        return None
+    if not isinstance(manifest, dict) or manifest.get("format") != FORMAT_VERSION:
+        return None
+    return manifest
+
+
+def _same_index(manifest: Optional[Dict[str, Any]], model_id: str, corpus_hash: str) -> bool:
+    return manifest is not None and manifest.get("model") == model_id and manifest.get("corpus") == corpus_hash
@@ -49,7 +49,7 @@ def test_bench_cli_writes_report(
     monkeypatch.chdir(tmp_path)
     monkeypatch.setenv("RAG_BENCH_DEVICE", "cuda")
     monkeypatch.setattr(bench_cli, "load_config", lambda _path: cfg)
-    monkeypatch.setattr(bench_cli, "load_texts_as_documents", lambda _paths: [])
+    monkeypatch.setattr(bench_cli, "open_file_corpus", lambda _paths: [])
     monkeypatch.setattr(bench_cli, "select_pipeline", lambda *_args, **_kwargs: selection)
     monkeypatch.setattr(
         sys,
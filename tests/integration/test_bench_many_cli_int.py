@@ -52,7 +52,7 @@ def test_bench_many_cli_writes_summary(
     monkeypatch.chdir(tmp_path)
     monkeypatch.setenv("RAG_BENCH_DEVICE", "cuda")
     monkeypatch.setattr(bench_many_cli, "load_config", lambda _path: cfg)
-    monkeypatch.setattr(bench_many_cli, "load_texts_as_documents", lambda _paths: [])
+    monkeypatch.setattr(bench_many_cli, "open_file_corpus", lambda _paths: [])
     monkeypatch.setattr(bench_many_cli, "select_pipeline", _select)
     monkeypatch.setattr(
         sys,
@@ -33,7 +33,7 @@ def test_cli_entrypoint_emits_answer(
 
     monkeypatch.setenv("RAG_BENCH_DEVICE", "cuda")
     monkeypatch.setattr(cli, "load_config", lambda _path: cfg)
-    monkeypatch.setattr(cli, "load_texts_as_documents", lambda _paths: [])
+    monkeypatch.setattr(cli, "open_file_corpus", lambda _paths: [])
     monkeypatch.setattr(cli, "_pick_llm", lambda _cfg: None)
     monkeypatch.setattr(
         cast(Any, cli).naive_rag,
@@ -4,23 +4,33 @@ import json
 import sys
 from pathlib import Path
 from types import SimpleNamespace
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterable, List
 
 import pytest
+from langchain_core.outputs import Generation, LLMResult
 
 from rag_bencher import bench_cli
+from rag_bencher.utils.tracing import StageTrace
 
 pytestmark = [pytest.mark.unit, pytest.mark.offline]
 
 
+def _no_prefetch(questions: Iterable[str]) -> int:
+    return 0
+
+
 class DummyChain:
     def __init__(self) -> None:
         self.calls: List[str] = []
         self.last_question: str = ""
 
-    def invoke(self, question: str) -> str:
+    def invoke(self, question: str, config: Any = None) -> str:
         self.last_question = question
         self.calls.append(question)
+        # Report one model call with provider token counts to any attached usage tracker.
+        usage = {"token_usage": {"prompt_tokens": 10, "completion_tokens": 2}, "model_name": "demo-model"}
+        for callback in (config or {}).get("callbacks") or []:
+            callback.on_llm_end(LLMResult(generations=[[Generation(text="x")]], llm_output=usage))
         return f"answer:{question}"
 
 
@@ -37,6 +47,7 @@ def _dummy_config() -> Any:
 
 
 def test_bench_cli_main_produces_report(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    monkeypatch.chdir(tmp_path)
     qa_path = tmp_path / "qa.jsonl"
     qa_entries = [
         {"question": "Q1", "reference_answer": "Ref1"},
@@ -53,7 +64,7 @@ def test_bench_cli_main_produces_report(monkeypatch: pytest.MonkeyPatch, tmp_pat
         docs_called.append(paths)
         return docs
 
-    monkeypatch.setattr(bench_cli, "load_texts_as_documents", fake_load_texts)
+    monkeypatch.setattr(bench_cli, "open_file_corpus", fake_load_texts)
 
     chain = DummyChain()
 
@@ -73,6 +84,8 @@ def test_bench_cli_main_produces_report(monkeypatch: pytest.MonkeyPatch, tmp_pat
         chain=chain,
         debug=debug,
         config=cfg,
+        prefetch_queries=_no_prefetch,
+        fingerprint=None,
     )
     monkeypatch.setattr(bench_cli, "select_pipeline", lambda *_args, **_kwargs: selection)
 
@@ -90,10 +103,12 @@ def test_bench_cli_main_produces_report(monkeypatch: pytest.MonkeyPatch, tmp_pat
     assert chain.calls == ["Q1", "Q2"]
     assert docs_called == [cfg.data.paths]
     assert reports, "report should be recorded"
-    assert reports[0]["extras"] == {"pipeline": "naive"}
+    assert reports[0]["extras"]["pipeline"] == "naive"
+    assert reports[0]["extras"]["usage"]["calls"] == 2
 
 
 def test_bench_cli_uses_candidates_when_no_retrieved(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    monkeypatch.chdir(tmp_path)
     qa_path = tmp_path / "qa.jsonl"
     qa_path.write_text('{"question":"Q1","reference_answer":"Ref"}\n', encoding="utf-8")
     cfg = _dummy_config()
@@ -103,9 +118,11 @@ def test_bench_cli_uses_candidates_when_no_retrieved(monkeypatch: pytest.MonkeyP
         chain=chain,
         debug=lambda: {"pipeline": "naive", "candidates": [{"preview": "cand:Q1", "source": "doc"}]},
         config=cfg,
+        prefetch_queries=_no_prefetch,
+        fingerprint=None,
     )
     monkeypatch.setattr(bench_cli, "load_config", lambda path: cfg)
-    monkeypatch.setattr(bench_cli, "load_texts_as_documents", lambda _: ["doc"])
+    monkeypatch.setattr(bench_cli, "open_file_corpus", lambda _: ["doc"])
     monkeypatch.setattr(bench_cli, "select_pipeline", lambda *_args, **_kwargs: selection)
     monkeypatch.setattr(bench_cli, "write_simple_report", lambda **_: "reports/report.html")
     monkeypatch.setattr(sys, "argv", ["bench_cli", "--config", "cfg.yaml", "--qa", str(qa_path)])
@@ -116,6 +133,7 @@ def test_bench_cli_uses_candidates_when_no_retrieved(monkeypatch: pytest.MonkeyP
 
 
 def test_bench_cli_no_debug_context(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    monkeypatch.chdir(tmp_path)
     qa_path = tmp_path / "qa.jsonl"
     qa_path.write_text('{"question":"Q1","reference_answer":"Ref"}\n', encoding="utf-8")
     cfg = _dummy_config()
@@ -125,10 +143,12 @@ def test_bench_cli_no_debug_context(monkeypatch: pytest.MonkeyPatch, tmp_path: P
         chain=chain,
         debug=lambda: {"pipeline": "naive"},
         config=cfg,
+        prefetch_queries=_no_prefetch,
+        fingerprint=None,
     )
     reports: list[Any] = []
     monkeypatch.setattr(bench_cli, "load_config", lambda path: cfg)
-    monkeypatch.setattr(bench_cli, "load_texts_as_documents", lambda _: ["doc"])
+    monkeypatch.setattr(bench_cli, "open_file_corpus", lambda _: ["doc"])
     monkeypatch.setattr(bench_cli, "select_pipeline", lambda *_args, **_kwargs: selection)
 
     def capture_report(**kwargs: Any) -> str:
@@ -142,3 +162,178 @@ def test_bench_cli_no_debug_context(monkeypatch: pytest.MonkeyPatch, tmp_path: P
 
     assert chain.calls == ["Q1"]
     assert reports, "report should be generated even without context"
+
+
+def test_bench_cli_rejects_invalid_concurrency(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    monkeypatch.setattr(
+        sys, "argv", ["bench_cli", "--config", "cfg.yaml", "--qa", str(tmp_path / "qa.jsonl"), "--concurrency", "0"]
+    )
+    with pytest.raises(SystemExit):
+        bench_cli.main()
+
+
+def test_bench_cli_concurrent_run_keeps_input_order(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    monkeypatch.chdir(tmp_path)
+    qa_path = tmp_path / "qa.jsonl"
+    qa_path.write_text(
+        "\n".join(json.dumps({"question": f"Q{i}", "reference_answer": f"answer:Q{i}"}) for i in range(6)),
+        encoding="utf-8",
+    )
+    cfg = _dummy_config()
+    chain = DummyChain()
+    selection = SimpleNamespace(
+        pipeline_id="naive",
+        chain=chain,
+        debug=lambda: {"pipeline": "naive"},
+        config=cfg,
+        prefetch_queries=_no_prefetch,
+        fingerprint=None,
+    )
+    printed: List[str] = []
+    monkeypatch.setattr(bench_cli, "load_config", lambda path: cfg)
+    monkeypatch.setattr(bench_cli, "open_file_corpus", lambda _: ["doc"])
+    monkeypatch.setattr(bench_cli, "select_pipeline", lambda *_args, **_kwargs: selection)
+    monkeypatch.setattr(bench_cli, "write_simple_report", lambda **_: "reports/report.html")
+    monkeypatch.setattr(bench_cli.console, "print", lambda msg, *a, **k: printed.append(str(msg)))
+    monkeypatch.setattr(sys, "argv", ["bench_cli", "--config", "cfg.yaml", "--qa", str(qa_path), "--concurrency", "3"])
+
+    bench_cli.main()
+
+    assert sorted(chain.calls) == [f"Q{i}" for i in range(6)]
+    question_lines = [line for line in printed if line.startswith("[bold cyan]")]
+    assert [line.split("[/bold cyan]")[0].removeprefix("[bold cyan]") for line in question_lines] == [
+        f"Q{i}" for i in range(6)
+    ]
+
+
+def test_bench_cli_resume_skips_recorded_questions(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    monkeypatch.chdir(tmp_path)
+    qa_path = tmp_path / "qa.jsonl"
+    qa_path.write_text(
+        "\n".join(
+            json.dumps({"id": f"q{i}", "question": f"Q{i}", "reference_answer": f"answer:Q{i}"}) for i in range(3)
+        ),
+        encoding="utf-8",
+    )
+    results_path = tmp_path / "results.jsonl"
+    previous = {"id": "q0", "metrics": {"lexical_f1": 0.0, "bow_cosine": 0.0, "context_recall": 0.0}}
+    # A crash can leave a half-written row behind; it must be ignored and overwritten.
+    results_path.write_text(json.dumps(previous) + '\n{"id": "q1", "ans', encoding="utf-8")
+    cfg = _dummy_config()
+    chain = DummyChain()
+    prefetched: List[str] = []
+
+    def prefetch(questions: Iterable[str]) -> int:
+        prefetched.extend(questions)
+        return len(prefetched)
+
+    selection = SimpleNamespace(
+        pipeline_id="naive",
+        chain=chain,
+        debug=lambda: {"pipeline": "naive"},
+        config=cfg,
+        prefetch_queries=prefetch,
+        fingerprint=None,
+    )
+    reports: List[Any] = []
+
+    def capture_report(**kwargs: Any) -> str:
+        reports.append(kwargs)
+        return "reports/report.html"
+
+    monkeypatch.setattr(bench_cli, "load_config", lambda path: cfg)
+    monkeypatch.setattr(bench_cli, "open_file_corpus", lambda _: ["doc"])
+    monkeypatch.setattr(bench_cli, "select_pipeline", lambda *_args, **_kwargs: selection)
+    monkeypatch.setattr(bench_cli, "write_simple_report", capture_report)
+    monkeypatch.setattr(
+        sys,
+        "argv",
+        ["bench_cli", "--config", "cfg.yaml", "--qa", str(qa_path), "--results", str(results_path), "--resume"],
+    )
+
+    bench_cli.main()
+
+    assert chain.calls == ["Q1", "Q2"]
+    assert prefetched == ["Q1", "Q2"]
+    rows = [json.loads(line) for line in results_path.read_text(encoding="utf-8").splitlines()]
+    assert [r["id"] for r in rows] == ["q0", "q1", "q2"]
+    assert rows[1]["answer"] == "answer:Q1" and rows[1]["config"] == "cfg.yaml"
+    assert rows[1]["timings"]["total_s"] >= 0.0
+    summary = json.loads(reports[0]["answer"])
+    assert summary["num_examples"] == 3
+    assert summary["avg_metrics"]["lexical_f1"] == pytest.approx(2 / 3)
+    # Only the two questions run now are billed; the resumed one was answered earlier.
+    assert summary["usage"]["calls"] == 2
+    assert (summary["usage"]["input_tokens"], summary["usage"]["output_tokens"]) == (20, 4)
+    assert summary["questions_per_s"] > 0
+
+
+def test_bench_cli_resume_requires_results(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    monkeypatch.setattr(
+        sys, "argv", ["bench_cli", "--config", "cfg.yaml", "--qa", str(tmp_path / "qa.jsonl"), "--resume"]
+    )
+    with pytest.raises(SystemExit):
+        bench_cli.main()
+
+
+def test_bench_cli_retrieval_only_skips_generation(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    monkeypatch.chdir(tmp_path)
+    qa_path = tmp_path / "qa.jsonl"
+    qa_entries = [
+        {"id": "a", "question": "Q1", "reference_answer": "alpha", "gold_chunk_ids": ["c2"]},
+        {"id": "b", "question": "Q2", "reference_answer": "beta"},
+    ]
+    qa_path.write_text("\n".join(json.dumps(e) for e in qa_entries), encoding="utf-8")
+    cfg = _dummy_config()
+    chain = DummyChain()
+    batches: List[List[str]] = []
+
+    def retrieve(questions: List[str], traces: List[StageTrace], *, concurrency: int = 1) -> List[Dict[str, Any]]:
+        batches.append(list(questions))
+        for trace in traces:
+            trace.add("vector_search", 0.002)
+        ranked = [{"chunk_id": f"c{i}", "source": "doc", "preview": "alpha beta", "score": 1 / i} for i in (1, 2, 3)]
+        return [{"pipeline": "naive", "retrieved": ranked} for _ in questions]
+
+    selection = SimpleNamespace(
+        pipeline_id="naive",
+        chain=chain,
+        debug=lambda: {},
+        config=cfg,
+        prefetch_queries=_no_prefetch,
+        retrieve=retrieve,
+        fingerprint=None,
+    )
+    reports: List[Any] = []
+    monkeypatch.setattr(bench_cli, "load_config", lambda path: cfg)
+    monkeypatch.setattr(bench_cli, "open_file_corpus", lambda _: ["doc"])
+    monkeypatch.setattr(bench_cli, "select_pipeline", lambda *_args, **_kwargs: selection)
+
+    def fake_write_simple_report(**kwargs: Any) -> str:
+        reports.append(kwargs)
+        return "reports/report.html"
+
+    monkeypatch.setattr(bench_cli, "write_simple_report", fake_write_simple_report)
+    results_path = tmp_path / "results.jsonl"
+    monkeypatch.setattr(
+        sys,
+        "argv",
+        ["bench_cli", "--config", "cfg.yaml", "--qa", str(qa_path), "--results", str(results_path), "--retrieval-only"],
+    )
+
+    bench_cli.main()
+
+    assert chain.calls == []
+    assert batches == [["Q1", "Q2"]]
+    rows = [json.loads(line) for line in results_path.read_text(encoding="utf-8").splitlines()]
+    assert [r["id"] for r in rows] == ["a", "b"]
+    assert "answer" not in rows[0]
+    assert [r["chunk_id"] for r in rows[0]["retrieved"]] == ["c1", "c2", "c3"]
+    assert rows[0]["metrics"]["mrr"] == pytest.approx(0.5)
+    assert set(rows[1]["metrics"]) == {"context_recall"}
+    summary = json.loads(reports[0]["answer"])
+    assert summary["retrieval_only"] is True
+    assert summary["avg_metrics"]["mrr"] == pytest.approx(0.5)
+    assert "lexical_f1" not in summary["avg_metrics"]
+    assert rows[0]["timings"]["vector_search_s"] == pytest.approx(0.002)
+    assert summary["latency"]["vector_search"] == {"p50": 0.002, "p95": 0.002, "p99": 0.002}
@@ -4,26 +4,32 @@ import json
 import sys
 from pathlib import Path
 from types import SimpleNamespace
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterable, List
 
 import pytest
 
 from rag_bencher import bench_many_cli
+from rag_bencher.utils.ingest import IngestStats, StageStats
+from rag_bencher.vector.faiss_ann import AnnSpec
 
 pytestmark = [pytest.mark.unit, pytest.mark.offline]
 
 
+def _no_prefetch(questions: Iterable[str]) -> int:
+    return 0
+
+
 class DummyChain:
     def __init__(self, tag: str) -> None:
         self.tag = tag
         self.calls: List[str] = []
 
-    def invoke(self, question: str) -> str:
+    def invoke(self, question: str, config: Any = None) -> str:
         self.calls.append(question)
         return f"{self.tag}:{question}"
 
 
-def _selection(tag: str, cfg: Any, *, retrieved: bool) -> Any:
+def _selection(tag: str, cfg: Any, *, retrieved: bool, fingerprint: str | None = None) -> Any:
     chain = DummyChain(tag)
 
     def debug() -> Dict[str, Any]:
@@ -34,7 +40,19 @@ def _selection(tag: str, cfg: Any, *, retrieved: bool) -> Any:
             payload["candidates"] = [{"source": "doc", "preview": f"{tag}-cand", "score": 0.5}]
         return payload
 
-    return SimpleNamespace(pipeline_id=f"pipe-{tag}", chain=chain, debug=debug, config=cfg)
+    def retrieve(questions: List[str], traces: Any, *, concurrency: int = 1) -> List[Dict[str, Any]]:
+        return [{"pipeline": tag, "retrieved": [{"chunk_id": f"{tag}-{q}", "preview": q}]} for q in questions]
+
+    return SimpleNamespace(
+        pipeline_id=f"pipe-{tag}",
+        chain=chain,
+        debug=debug,
+        config=cfg,
+        prefetch_queries=_no_prefetch,
+        retrieve=retrieve,
+        fingerprint=fingerprint,
+        indexes=(),
+    )
 
 
 def test_bench_many_cli_builds_summary(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
@@ -57,7 +75,7 @@ def test_bench_many_cli_builds_summary(monkeypatch: pytest.MonkeyPatch, tmp_path
         path.write_text("{}", encoding="utf-8")
 
     monkeypatch.setattr(bench_many_cli, "load_config", lambda path: cfg)
-    monkeypatch.setattr(bench_many_cli, "load_texts_as_documents", lambda paths: ["doc"])
+    monkeypatch.setattr(bench_many_cli, "open_file_corpus", lambda paths: ["doc"])
 
     selections = {
         str(configs[0]): _selection("first", cfg, retrieved=True),
@@ -79,6 +97,78 @@ def test_bench_many_cli_builds_summary(monkeypatch: pytest.MonkeyPatch, tmp_path
     html = outputs[0].read_text(encoding="utf-8")
     assert "cfg-a.yaml" in html and "cfg-b.yaml" in html
     assert "pipe-first" in html and "pipe-second" in html
+    # Every config gets a p50 / p95 / p99 latency row.
+    assert "<h2>Latency (ms, p50 / p95 / p99)</h2>" in html and "<th>total</th>" in html
+    assert "<h2>Usage</h2>" in html and "<th>Est. cost (USD)</th>" in html
+
+
+def test_bench_many_cli_reports_ann_recall_per_config(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    monkeypatch.chdir(tmp_path)
+    qa_path = tmp_path / "qa.jsonl"
+    qa_path.write_text(
+        "".join(json.dumps({"question": q, "reference_answer": "R"}) + "\n" for q in ("Q1", "Q2")), encoding="utf-8"
+    )
+    cfg = SimpleNamespace(data=SimpleNamespace(paths=["doc.txt"]), retriever=SimpleNamespace(k=3))
+    configs = [tmp_path / "cfg-a.yaml", tmp_path / "cfg-b.yaml"]
+    for path in configs:
+        path.write_text("{}", encoding="utf-8")
+    recalls: List[Any] = []
+
+    def recall(questions: List[str], k: int) -> float:
+        recalls.append((questions, k))
+        return 0.75
+
+    ann = SimpleNamespace(ann_spec=AnnSpec(kind="hnsw", ef_search=32), recall=recall, ingest_stats=None)
+    exact = SimpleNamespace(ann_spec=None, ingest_stats=None)
+    selections = {
+        str(configs[0]): _selection("a", cfg, retrieved=True),
+        str(configs[1]): _selection("b", cfg, retrieved=True),
+    }
+    selections[str(configs[0])].indexes = (exact,)
+    selections[str(configs[1])].indexes = (ann, ann)
+    monkeypatch.setattr(bench_many_cli, "load_config", lambda path: cfg)
+    monkeypatch.setattr(bench_many_cli, "open_file_corpus", lambda paths: ["doc"])
+    monkeypatch.setattr(bench_many_cli, "select_pipeline", lambda path, docs: selections[path])
+    monkeypatch.setattr(
+        sys, "argv", ["bench_many_cli", "--configs", str(tmp_path / "cfg-*.yaml"), "--qa", str(qa_path)]
+    )
+
+    bench_many_cli.main()
+
+    assert recalls == [(["Q1", "Q2"], 3)]
+    html = next(Path("reports").glob("summary-*.html")).read_text(encoding="utf-8")
+    assert "<h2>ANN recall</h2>" in html
+    assert "<tr><td>cfg-b.yaml</td><td>hnsw</td><td>hnsw_m=32, ef_search=32</td><td>3</td><td>0.750</td></tr>" in html
+    assert "<td>cfg-a.yaml</td><td>ivf" not in html
+
+
+def test_bench_many_cli_reports_each_index_ingest_once(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    monkeypatch.chdir(tmp_path)
+    qa_path = tmp_path / "qa.jsonl"
+    qa_path.write_text('{"question":"Q","reference_answer":"R"}\n', encoding="utf-8")
+    cfg = SimpleNamespace(data=SimpleNamespace(paths=["doc.txt"]))
+    configs = [tmp_path / "cfg-a.yaml", tmp_path / "cfg-b.yaml"]
+    for path in configs:
+        path.write_text("{}", encoding="utf-8")
+    stats = IngestStats(stages=[StageStats("chunk", items=4, seconds=0.5), StageStats("embed", items=8, seconds=2.0)])
+    shared = SimpleNamespace(key=SimpleNamespace(embedding_model="mini"), ingest_stats=stats, ann_spec=None)
+    loaded = SimpleNamespace(key=None, ingest_stats=None, ann_spec=None)
+    selections = {str(p): _selection(p.stem, cfg, retrieved=True) for p in configs}
+    selections[str(configs[0])].indexes = (shared, loaded)
+    selections[str(configs[1])].indexes = (shared,)
+    monkeypatch.setattr(bench_many_cli, "load_config", lambda path: cfg)
+    monkeypatch.setattr(bench_many_cli, "open_file_corpus", lambda paths: ["doc"])
+    monkeypatch.setattr(bench_many_cli, "select_pipeline", lambda path, docs: selections[path])
+    monkeypatch.setattr(
+        sys, "argv", ["bench_many_cli", "--configs", str(tmp_path / "cfg-*.yaml"), "--qa", str(qa_path)]
+    )
+
+    bench_many_cli.main()
+
+    html = next(Path("reports").glob("summary-*.html")).read_text(encoding="utf-8")
+    assert "<h2>Ingest</h2>" in html and "<th>chunk</th><th>embed</th>" in html
+    assert "<tr><td>cfg-a.yaml</td><td>mini</td><td>0.00</td><td>4 in 0.50s (8.0/s)</td>" in html
+    assert "<tr><td>cfg-b.yaml</td><td>mini</td>" not in html
 
 
 def test_bench_many_cli_handles_candidate_debug(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
@@ -100,10 +190,18 @@ def test_bench_many_cli_handles_candidate_debug(monkeypatch: pytest.MonkeyPatch,
     def debug() -> Dict[str, Any]:
         return {"pipeline": "cand", "candidates": [{"preview": "cand-preview", "source": "doc"}]}
 
-    selection = SimpleNamespace(pipeline_id="pipe-cand", chain=chain, debug=debug, config=cfg)
+    selection = SimpleNamespace(
+        pipeline_id="pipe-cand",
+        chain=chain,
+        debug=debug,
+        config=cfg,
+        prefetch_queries=_no_prefetch,
+        fingerprint=None,
+        indexes=(),
+    )
 
     monkeypatch.setattr(bench_many_cli, "load_config", lambda path: cfg)
-    monkeypatch.setattr(bench_many_cli, "load_texts_as_documents", lambda _: ["doc"])
+    monkeypatch.setattr(bench_many_cli, "open_file_corpus", lambda _: ["doc"])
     monkeypatch.setattr(bench_many_cli, "select_pipeline", lambda *_args, **_kwargs: selection)
     monkeypatch.setattr(
         sys,
@@ -129,12 +227,130 @@ def test_bench_many_cli_handles_empty_debug(monkeypatch: pytest.MonkeyPatch, tmp
     config_path = tmp_path / "cfg.yaml"
     config_path.write_text("{}", encoding="utf-8")
     chain = DummyChain("none")
-    selection = SimpleNamespace(pipeline_id="pipe-none", chain=chain, debug=lambda: {"pipeline": "none"}, config=cfg)
+    selection = SimpleNamespace(
+        pipeline_id="pipe-none",
+        chain=chain,
+        debug=lambda: {"pipeline": "none"},
+        config=cfg,
+        prefetch_queries=_no_prefetch,
+        fingerprint=None,
+        indexes=(),
+    )
     monkeypatch.setattr(bench_many_cli, "load_config", lambda path: cfg)
-    monkeypatch.setattr(bench_many_cli, "load_texts_as_documents", lambda _: ["doc"])
+    monkeypatch.setattr(bench_many_cli, "open_file_corpus", lambda _: ["doc"])
     monkeypatch.setattr(bench_many_cli, "select_pipeline", lambda *_args, **_kwargs: selection)
     monkeypatch.setattr(sys, "argv", ["bench_many_cli", "--configs", str(config_path), "--qa", str(qa_path)])
 
     bench_many_cli.main()
 
     assert chain.calls == ["Q"]
+
+
+def test_bench_many_cli_resume_is_per_config(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    monkeypatch.chdir(tmp_path)
+    qa_path = tmp_path / "qa.jsonl"
+    qa_path.write_text(
+        "\n".join(json.dumps({"question": f"Q{i}", "reference_answer": f"R{i}"}) for i in range(2)),
+        encoding="utf-8",
+    )
+    cfg = SimpleNamespace(
+        model=SimpleNamespace(name="demo-model"),
+        data=SimpleNamespace(paths=["doc.txt"]),
+        model_dump=lambda: {"model": {"name": "demo-model"}},
+    )
+    configs = [tmp_path / "cfg-a.yaml", tmp_path / "cfg-b.yaml"]
+    for path in configs:
+        path.write_text("{}", encoding="utf-8")
+    results_path = tmp_path / "results.jsonl"
+    # cfg-a finished both questions and cfg-b only the first (ids default to line numbers).
+    done = [("cfg-a.yaml", "0"), ("cfg-a.yaml", "1"), ("cfg-b.yaml", "0")]
+    results_path.write_text(
+        "".join(json.dumps({"config": c, "id": i, "metrics": {}}) + "\n" for c, i in done), encoding="utf-8"
+    )
+    selections = {str(configs[0]): _selection("first", cfg, retrieved=True)}
+    selections[str(configs[1])] = _selection("second", cfg, retrieved=True)
+    monkeypatch.setattr(bench_many_cli, "load_config", lambda path: cfg)
+    monkeypatch.setattr(bench_many_cli, "open_file_corpus", lambda paths: ["doc"])
+    monkeypatch.setattr(bench_many_cli, "select_pipeline", lambda path, docs: selections[path])
+    monkeypatch.setattr(
+        sys,
+        "argv",
+        [
+            "bench_many_cli",
+            "--configs",
+            str(tmp_path / "cfg-*.yaml"),
+            "--qa",
+            str(qa_path),
+            "--results",
+            str(results_path),
+            "--resume",
+        ],
+    )
+
+    bench_many_cli.main()
+
+    assert selections[str(configs[0])].chain.calls == []
+    assert selections[str(configs[1])].chain.calls == ["Q1"]
+    rows = [json.loads(line) for line in results_path.read_text(encoding="utf-8").splitlines()]
+    assert (rows[-1]["config"], rows[-1]["id"], rows[-1]["pipeline"]) == ("cfg-b.yaml", "1", "pipe-second")
+    assert rows[-1]["retrieved"] == [{"source": "doc", "preview": "second-ctx"}]
+
+
+def test_bench_many_cli_recomputes_only_changed_fingerprints(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    monkeypatch.chdir(tmp_path)
+    qa_path = tmp_path / "qa.jsonl"
+    qa_path.write_text('{"question":"Q","reference_answer":"R"}\n', encoding="utf-8")
+    cfg = SimpleNamespace(model=SimpleNamespace(name="demo-model"), data=SimpleNamespace(paths=["doc.txt"]))
+    configs = [tmp_path / "cfg-a.yaml", tmp_path / "cfg-b.yaml"]
+    for path in configs:
+        path.write_text("{}", encoding="utf-8")
+    monkeypatch.setattr(bench_many_cli, "load_config", lambda path: cfg)
+    monkeypatch.setattr(bench_many_cli, "open_file_corpus", lambda paths: ["doc"])
+    monkeypatch.setattr(
+        sys, "argv", ["bench_many_cli", "--configs", str(tmp_path / "cfg-*.yaml"), "--qa", str(qa_path)]
+    )
+
+    def sweep(fingerprints: List[str]) -> List[Any]:
+        selections = [
+            _selection(tag, cfg, retrieved=True, fingerprint=fp)
+            for tag, fp in zip(["a", "b"], fingerprints, strict=True)
+        ]
+        by_path = dict(zip([str(p) for p in configs], selections, strict=True))
+        monkeypatch.setattr(bench_many_cli, "select_pipeline", lambda path, docs: by_path[path])
+        bench_many_cli.main()
+        return [s.chain for s in selections]
+
+    first = sweep(["fp-a", "fp-b"])
+    assert [c.calls for c in first] == [["Q"], ["Q"]]
+
+    second = sweep(["fp-a", "fp-b2"])
+    assert [c.calls for c in second] == [[], ["Q"]]
+
+
+def test_bench_many_cli_retrieval_only(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    monkeypatch.chdir(tmp_path)
+    qa_path = tmp_path / "qa.jsonl"
+    qa_path.write_text('{"question":"Q","reference_answer":"R","gold_chunk_ids":["first-Q"]}\n', encoding="utf-8")
+    cfg = SimpleNamespace(data=SimpleNamespace(paths=["doc.txt"]))
+    configs = [tmp_path / "cfg-a.yaml", tmp_path / "cfg-b.yaml"]
+    for path in configs:
+        path.write_text("{}", encoding="utf-8")
+    selections = {
+        str(configs[0]): _selection("first", cfg, retrieved=True),
+        str(configs[1]): _selection("second", cfg, retrieved=True),
+    }
+    monkeypatch.setattr(bench_many_cli, "load_config", lambda path: cfg)
+    monkeypatch.setattr(bench_many_cli, "open_file_corpus", lambda paths: ["doc"])
+    monkeypatch.setattr(bench_many_cli, "select_pipeline", lambda path, docs: selections[path])
+    monkeypatch.setattr(
+        sys,
+        "argv",
+        ["bench_many_cli", "--configs", str(tmp_path / "cfg-*.yaml"), "--qa", str(qa_path), "--retrieval-only"],
+    )
+
+    bench_many_cli.main()
+
+    assert [sel.chain.calls for sel in selections.values()] == [[], []]
+    html = next(Path("reports").glob("summary-*.html")).read_text(encoding="utf-8")
+    assert "<th>MRR</th>" in html and "Lexical F1" not in html
+    assert "<td>1.000</td>" in html and "<td>0.000</td>" in html
@@ -1,7 +1,9 @@
 from __future__ import annotations
 
 import json
+import sqlite3
 from pathlib import Path
+from types import SimpleNamespace
 
 import pytest
 
@@ -20,9 +22,9 @@ def test_cache_roundtrip(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Non
     cache.cache_set("model-x", "params-y", payload)
     loaded = cache.cache_get("model-x", "params-y")
     assert loaded == payload
-    files = list(cache_dir.glob("*.json"))
-    assert len(files) == 1
-    assert json.loads(files[0].read_text(encoding="utf-8")) == payload
+    assert cache.cache_get("model-x", "other") is None
+    assert sorted(p.name for p in cache_dir.glob("*.json")) == []
+    assert (cache_dir / cache.DB_FILE).exists()
 
 
 @pytest.mark.offline
@@ -34,3 +36,91 @@ def test_cache_get_handles_corrupt_json(tmp_path: Path, monkeypatch: pytest.Monk
     f = cache_dir / f"{key}.json"
     f.write_text("{not json", encoding="utf-8")
     assert cache.cache_get("model-y", "bad-params") is None
+
+
+@pytest.mark.offline
+def test_legacy_json_entries_are_imported(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    cache_dir = tmp_path / "cache"
+    cache_dir.mkdir()
+    monkeypatch.setattr(cache, "D", cache_dir, raising=False)
+    legacy = cache_dir / f"{cache.K('model-old', 'q')}.json"
+    legacy.write_text(json.dumps("old answer"), encoding="utf-8")
+
+    assert cache.cache_get("model-old", "q") == "old answer"
+    assert not legacy.exists()
+
+
+@pytest.mark.offline
+def test_batched_get_and_set(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(cache, "D", tmp_path, raising=False)
+    monkeypatch.setattr(cache, "_MAX_VARS", 3)
+    prompts = [f"q{i}" for i in range(8)]
+
+    cache.cache_set_many("m", [(p, {"a": p}) for p in prompts[:6]])
+
+    assert cache.cache_get_many("m", prompts) == [{"a": p} for p in prompts[:6]] + [None, None]
+    assert cache.cache_get_many("other-model", prompts[:1]) == [None]
+
+
+@pytest.mark.offline
+def test_store_is_shared_between_connections(tmp_path: Path) -> None:
+    writer = cache.AnswerStore(tmp_path)
+    reader = cache.AnswerStore(tmp_path)
+    writer.put_many([("k1", [1, 2])])
+    assert reader.get_many(["k1", "k2"]) == [[1, 2], None]
+    writer.close()
+    reader.close()
+
+
+@pytest.mark.offline
+def test_expired_entries_miss_and_evict(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    store = cache.AnswerStore(tmp_path, ttl=10)
+    clock = iter([1000.0, 1005.0, 1020.0, 1020.0])
+    monkeypatch.setattr(cache, "time", SimpleNamespace(time=lambda: next(clock)))
+
+    store.put_many([("k", "v")])
+    assert store.get_many(["k"]) == ["v"]
+    assert store.get_many(["k"]) == [None]
+    store.evict()
+    assert len(store) == 0
+    store.close()
+
+
+@pytest.mark.offline
+def test_least_recently_read_entries_are_evicted_over_budget(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    ticks = iter(float(t) for t in range(1, 100))
+    monkeypatch.setattr(cache, "time", SimpleNamespace(time=lambda: next(ticks)))
+    store = cache.AnswerStore(tmp_path, max_bytes=40)
+    store.put_many([(f"k{i}", "x" * 8) for i in range(4)])  # 10 bytes of JSON each
+    assert store.get_many(["k0"]) == ["x" * 8]
+
+    store.put_many([("k4", "x" * 8)])
+    store.evict()
+
+    assert [v is not None for v in store.get_many([f"k{i}" for i in range(5)])] == [True, False, False, True, True]
+    store.close()
+
+
+@pytest.mark.offline
+def test_reads_defer_access_times_to_the_next_write(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    ticks = iter(float(t) for t in range(1, 100))
+    monkeypatch.setattr(cache, "time", SimpleNamespace(time=lambda: next(ticks)))
+    store = cache.AnswerStore(tmp_path)
+    other = sqlite3.connect(tmp_path / cache.DB_FILE)
+
+    def accessed() -> float:
+        return float(other.execute("SELECT accessed FROM answers WHERE key = 'k0'").fetchone()[0])
+
+    store.put_many([("k0", 0)])
+    # Another writer holds the write lock; reads neither wait for it nor take it.
+    other.execute("BEGIN IMMEDIATE")
+    assert store.get_many(["k0"]) == [0]
+    other.execute("COMMIT")
+    assert accessed() == 1.0
+
+    store.flush()
+    assert accessed() == 2.0
+    store.get_many(["k0"])
+    store.close()
+    assert accessed() == 3.0
+    other.close()
@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import os
+import pickle
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from langchain_core.documents import Document
+
+from rag_bencher.utils import chunking
+from rag_bencher.utils.chunking import Chunker, ChunkParams, chunk_documents, chunk_key
+
+pytestmark = [pytest.mark.unit, pytest.mark.offline]
+
+TEXT = " ".join(f"word{i}" for i in range(60))
+
+
+def test_chunks_carry_offsets_and_stable_ids() -> None:
+    params = ChunkParams(chunk_size=50, chunk_overlap=10)
+    doc = Document(page_content=TEXT, metadata={"source": "a.txt"})
+
+    chunks = Chunker(params)([doc])
+
+    assert len(chunks) > 3
+    for chunk in chunks:
+        assert TEXT[chunk.metadata["start_index"] : chunk.metadata["end_index"]] == chunk.page_content
+        assert chunk.metadata["source"] == "a.txt"
+    ids = [c.metadata["chunk_id"] for c in chunks]
+    assert ids == [f"{chunk_key(doc, params)[:16]}-{n}" for n in range(len(chunks))]
+    assert [c.metadata["chunk_id"] for c in pickle.loads(pickle.dumps(Chunker(params)))([doc])] == ids
+    other = Chunker(ChunkParams(chunk_size=50, chunk_overlap=0))([doc])
+    assert other[0].metadata["chunk_id"] != ids[0]
+
+
+def test_chunk_documents_in_a_process_pool_matches_inline(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(chunking, "CHUNK_BATCH_SIZE", 2)
+    docs = [Document(page_content=f"{TEXT} doc{i}", metadata={"n": i}) for i in range(5)]
+    params = ChunkParams(chunk_size=80, chunk_overlap=20)
+
+    inline = chunk_documents(docs, params, workers=0)
+    pooled = chunk_documents(iter(docs), params, workers=2)
+
+    assert pooled == inline
+    assert [c.metadata["n"] for c in inline] == sorted(c.metadata["n"] for c in inline)
+
+
+def test_params_validation_and_worker_setting(monkeypatch: pytest.MonkeyPatch) -> None:
+    with pytest.raises(ValueError):
+        ChunkParams(chunk_size=10, chunk_overlap=10)
+    assert ChunkParams().tag() == "chars:800/120"
+    monkeypatch.delenv(chunking.CHUNK_WORKERS_ENV, raising=False)
+    assert chunking.chunk_workers() == 0
+    monkeypatch.setenv(chunking.CHUNK_WORKERS_ENV, "3")
+    assert chunking.chunk_workers() == 3
+
+
+# A library caller without an ``if __name__ == "__main__":`` guard; pool workers re-import it.
+_UNGUARDED = """
+from langchain_core.documents import Document
+from rag_bencher.utils import chunking
+
+docs = [Document(page_content=f"word{i} " * 50) for i in range(150)]
+chunks = chunking.chunk_documents(docs, chunking.ChunkParams(chunk_size=80, chunk_overlap=10))
+print("chunks", len(chunks))
+"""
+
+
+@pytest.mark.parametrize("workers", [None, "2"])
+def test_unguarded_script_can_chunk(workers: str | None, tmp_path: Path) -> None:
+    script = tmp_path / "unguarded.py"
+    script.write_text(_UNGUARDED, encoding="utf-8")
+    env = {k: v for k, v in os.environ.items() if k != chunking.CHUNK_WORKERS_ENV}
+    if workers is not None:
+        env[chunking.CHUNK_WORKERS_ENV] = workers
+    out = subprocess.run(
+        [sys.executable, str(script)], capture_output=True, cwd=tmp_path, env=env, text=True, timeout=120
+    )
+    assert out.returncode == 0, out.stderr
+    assert out.stdout.strip().splitlines()[-1] == "chunks 800"
+
+
+def _word_tokenizer(directory: Path) -> str:
+    from tokenizers import Tokenizer, models, pre_tokenizers
+    from transformers import PreTrainedTokenizerFast
+
+    vocab = {"[UNK]": 0, **{w: i + 1 for i, w in enumerate(sorted(set(TEXT.split())))}}
+    backend = Tokenizer(models.WordLevel(vocab=vocab, unk_token="[UNK]"))
+    backend.pre_tokenizer = pre_tokenizers.Whitespace()
+    PreTrainedTokenizerFast(tokenizer_object=backend, unk_token="[UNK]").save_pretrained(str(directory))
+    return str(directory)
+
+
+def test_token_chunks_are_sliced_at_tokenizer_offsets(tmp_path: Path) -> None:
+    params = ChunkParams(chunk_size=8, chunk_overlap=2, tokenizer=_word_tokenizer(tmp_path))
+    docs = [Document(page_content=TEXT, metadata={"n": 0}), Document(page_content="word1  word2", metadata={"n": 1})]
+
+    chunks = Chunker(params)(docs)
+
+    first = [c for c in chunks if c.metadata["n"] == 0]
+    assert [len(c.page_content.split()) for c in first] == [8] * 9 + [6]
+    for chunk in first:
+        assert TEXT[chunk.metadata["start_index"] : chunk.metadata["end_index"]] == chunk.page_content
+    assert first[0].page_content.split()[-2:] == first[1].page_content.split()[:2]
+    assert [c.page_content for c in chunks if c.metadata["n"] == 1] == ["word1  word2"]
+    assert params.tag() == f"tokens:{params.tokenizer}:8/2"
+    assert len({c.metadata["chunk_id"] for c in chunks}) == len(chunks)
+
+
+def test_token_windows_cover_every_token_once_plus_overlap() -> None:
+    offsets = [(i * 2, i * 2 + 1) for i in range(7)]
+    assert list(chunking.token_windows(offsets, 3, 1)) == [(0, 5), (4, 9), (8, 13)]
+    assert list(chunking.token_windows(offsets[:2], 3, 1)) == [(0, 3)]
+    assert list(chunking.token_windows([], 3, 1)) == []
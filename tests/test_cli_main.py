@@ -30,6 +30,7 @@ def _make_cfg() -> Any:
     retriever = SimpleNamespace(k=2)
     runtime = SimpleNamespace(offline=True, device="cpu")
     data = SimpleNamespace(paths=["doc.txt"])
+    chunking = SimpleNamespace(chunk_size=800, chunk_overlap=120, chunk_tokenizer=lambda: None)
 
     class DummyCfg:
         def __init__(self) -> None:
@@ -37,10 +38,11 @@ def _make_cfg() -> Any:
             self.retriever = retriever
             self.runtime = runtime
             self.data = data
+            self.chunking = chunking
             self.provider = None
 
         def model_dump(self) -> Dict[str, Any]:
-            return {"model": {"name": self.model.name}}
+            return {"model": {"name": self.model.name}, "retriever": {"k": self.retriever.k}}
 
     return DummyCfg()
 
@@ -53,7 +55,7 @@ class CacheLog:
 
 def _patch_common(monkeypatch: pytest.MonkeyPatch, cfg: Any, docs: List[Document], chain: DummyChain) -> CacheLog:
     monkeypatch.setattr(cli, "load_config", lambda _: cfg)
-    monkeypatch.setattr(cli, "load_texts_as_documents", lambda _: docs)
+    monkeypatch.setattr(cli, "open_file_corpus", lambda _: docs)
     monkeypatch.setattr(cli, "_pick_llm", lambda _cfg: "llm-object")
     monkeypatch.setattr(cli, "build_embeddings_adapter", lambda _cfg: None)
     monkeypatch.setattr(cli, "build_vector_backend", lambda _cfg: None)
@@ -85,11 +87,30 @@ def test_cli_main_runs_chain_on_cache_miss(monkeypatch: pytest.MonkeyPatch) -> N
 
     cli.main()
 
-    assert cache_log.gets == [("demo-model", "What is RAG?")]
-    assert len(cache_log.sets) == 1
+    [(key, question)] = cache_log.gets
+    assert key.startswith("pipeline:") and question == "What is RAG?"
+    assert cache_log.sets == [(key, "What is RAG?", "ans:What is RAG?")]
     assert chain.calls and chain.calls[0]["question"] == "What is RAG?"
 
 
+def test_cli_main_cache_key_tracks_pipeline_settings(monkeypatch: pytest.MonkeyPatch) -> None:
+    cfg = _make_cfg()
+    docs = [Document(page_content="doc", metadata={"source": "doc.txt"})]
+    cache_log = _patch_common(monkeypatch, cfg, docs, DummyChain())
+    monkeypatch.setattr(sys, "argv", ["rag-bencher", "--config", "cfg.yaml", "--question", "Q?"])
+
+    cli.main()
+    cli.main()
+    cfg.retriever.k = 5
+    cli.main()
+    docs[0] = Document(page_content="edited doc", metadata={"source": "doc.txt"})
+    cli.main()
+
+    keys = [key for key, _ in cache_log.gets]
+    assert keys[0] == keys[1]
+    assert len(set(keys)) == 3
+
+
 def test_cli_main_leaves_device_env_when_auto(monkeypatch: pytest.MonkeyPatch) -> None:
     cfg = _make_cfg()
     cfg.runtime.device = "auto"
@@ -111,7 +132,7 @@ def test_cli_main_returns_cached_answer(monkeypatch: pytest.MonkeyPatch) -> None
     docs = [Document(page_content="doc", metadata={"source": "doc.txt"})]
     chain = DummyChain()
     monkeypatch.setattr(cli, "load_config", lambda _: cfg)
-    monkeypatch.setattr(cli, "load_texts_as_documents", lambda _: docs)
+    monkeypatch.setattr(cli, "open_file_corpus", lambda _: docs)
     monkeypatch.setattr(cli, "_pick_llm", lambda _cfg: "llm-object")
     monkeypatch.setattr(cli, "build_embeddings_adapter", lambda _cfg: None)
     monkeypatch.setattr(cli, "build_vector_backend", lambda _cfg: None)
@@ -160,7 +181,7 @@ def test_cli_main_skips_embeddings_when_adapter_missing(monkeypatch: pytest.Monk
     cli.main()
 
     assert calls and calls[0]["name"] == "aws"
-    assert cache_log.gets == [("demo-model", "No embeddings?")]
+    assert [q for _, q in cache_log.gets] == ["No embeddings?"]
 
 
 def test_pick_llm_offline_builds_hf_pipeline(monkeypatch: pytest.MonkeyPatch) -> None:
@@ -409,8 +430,10 @@ def test_cli_main_sets_cuda_device_and_handles_vector_failure(monkeypatch: pytes
     docs = [Document(page_content="doc", metadata={"source": "doc.txt"})]
     chain = DummyChain()
     monkeypatch.setattr(cli, "load_config", lambda _: cfg)
-    monkeypatch.setattr(cli, "load_texts_as_documents", lambda _: docs)
-    monkeypatch.setattr(cli, "naive_rag", SimpleNamespace(build_chain=lambda *args, **kwargs: (chain, lambda: {})))
+    monkeypatch.setattr(cli, "open_file_corpus", lambda _: docs)
+    monkeypatch.setattr(
+        cli, "naive_rag", SimpleNamespace(PROMPTS=(), build_chain=lambda *args, **kwargs: (chain, lambda: {}))
+    )
     monkeypatch.setattr(cli, "_pick_llm", lambda _cfg: "llm-object")
 
     class DummyAdapter:
@@ -51,3 +51,23 @@ def test_strict_validation_rejects_unknown_keys() -> None:
     )
     with pytest.raises(SystemExit):
         load_config(bad)
+
+
+def test_chunking_block_defaults_and_validation() -> None:
+    base = """
+        model:
+          name: foo
+        retriever:
+          k: 3
+        data:
+          paths: ["examples/data/sample.txt"]
+    """
+    cfg = load_config(write_tmp(textwrap.dedent(base)))
+    assert (cfg.chunking.chunk_size, cfg.chunking.chunk_overlap) == (800, 120)
+    tuned = load_config(write_tmp(textwrap.dedent(base) + "chunking:\n  chunk_size: 300\n  chunk_overlap: 30\n"))
+    assert (tuned.chunking.chunk_size, tuned.chunking.chunk_overlap) == (300, 30)
+    assert tuned.chunking.chunk_tokenizer() is None
+    tokens = load_config(write_tmp(textwrap.dedent(base) + "chunking:\n  unit: tokens\n  chunk_size: 256\n"))
+    assert tokens.chunking.chunk_tokenizer() == "sentence-transformers/all-MiniLM-L6-v2"
+    with pytest.raises(SystemExit):
+        load_config(write_tmp(textwrap.dedent(base) + "chunking:\n  chunk_size: 100\n  chunk_overlap: 100\n"))
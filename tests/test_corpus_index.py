@@ -0,0 +1,259 @@
+from __future__ import annotations
+
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Iterator
+
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from rag_bencher.eval.dataset_loader import FileCorpus
+from rag_bencher.pipelines import corpus
+from rag_bencher.utils import embedding_cache
+from rag_bencher.utils.chunking import Chunker, ChunkParams
+from rag_bencher.utils.factories import embedding_model_id
+from rag_bencher.vector import local
+from rag_bencher.vector.faiss_ann import AnnSpec, describe, effective_spec
+from rag_bencher.vector.numpy_store import ChunkFile, NumpyVectorStore
+
+pytestmark = [pytest.mark.unit, pytest.mark.offline]
+
+
+class NamedEmbeddings(Embeddings):
+    def __init__(self, model_name: str, encode_kwargs: dict[str, Any] | None = None) -> None:
+        self.model_name = model_name
+        self.encode_kwargs = encode_kwargs or {}
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [[float(len(t)), 1.0] for t in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return [float(len(text)), 1.0]
+
+
+class AnonymousEmbeddings(Embeddings):
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [[1.0] for _ in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return [1.0]
+
+
+@pytest.fixture(autouse=True)
+def _count_builds(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> Iterator[list[Any]]:
+    corpus.clear_corpus_indexes()
+    monkeypatch.setattr(embedding_cache, "ROOT", tmp_path)
+    monkeypatch.setattr(corpus, "INDEX_ROOT", tmp_path / "indexes")
+    builds: list[Any] = []
+
+    def fake_build(splits: list[Document], embed: Any, vectors: Any = None) -> Any:
+        builds.append((splits, embed))
+        return object()
+
+    monkeypatch.setattr(corpus, "build_local_vectorstore", fake_build)
+    yield builds
+    corpus.clear_corpus_indexes()
+
+
+@pytest.fixture
+def docs() -> list[Document]:
+    return [
+        Document(page_content="alpha " * 50, metadata={"source": "a"}),
+        Document(page_content="beta " * 50, metadata={"source": "b"}),
+    ]
+
+
+def test_matching_key_reuses_index(docs: list[Document], _count_builds: list[Any]) -> None:
+    first = corpus.get_corpus_index(docs, NamedEmbeddings("mini"))
+    second = corpus.get_corpus_index(list(docs), NamedEmbeddings("mini"))
+    assert first is second
+    assert len(_count_builds) == 1
+    assert first.splits and first.key is not None
+    ids = [s.metadata["chunk_id"] for s in first.splits]
+    assert len(set(ids)) == len(ids)
+    assert ids == [c.metadata["chunk_id"] for c in Chunker(ChunkParams())(docs)]  # stable across builds
+    assert first.key.embedding_model.endswith(":mini")
+    assert isinstance(first.embeddings, embedding_cache.CachedEmbeddings)
+
+
+def test_different_params_build_new_index(docs: list[Document], _count_builds: list[Any]) -> None:
+    base = corpus.get_corpus_index(docs, NamedEmbeddings("mini"))
+    other_model = corpus.get_corpus_index(docs, NamedEmbeddings("large"))
+    other_chunks = corpus.get_corpus_index(docs, NamedEmbeddings("mini"), chunk_size=100, chunk_overlap=10)
+    changed_docs = corpus.get_corpus_index(docs[:1], NamedEmbeddings("mini"))
+    assert len({id(x) for x in (base, other_model, other_chunks, changed_docs)}) == 4
+    assert len(_count_builds) == 4
+    assert len(other_chunks.splits) > len(base.splits)
+
+
+def test_unidentified_embeddings_are_never_shared(docs: list[Document], _count_builds: list[Any]) -> None:
+    emb = AnonymousEmbeddings()
+    assert embedding_model_id(emb) is None
+    first = corpus.get_corpus_index(docs, emb)
+    second = corpus.get_corpus_index(docs, emb)
+    assert first is not second
+    assert first.key is None
+    assert len(_count_builds) == 2
+
+
+def test_embedding_model_id_includes_encode_kwargs() -> None:
+    plain = NamedEmbeddings("mini")
+    normalized = NamedEmbeddings("mini", encode_kwargs={"normalize_embeddings": True})
+    assert embedding_model_id(plain) != embedding_model_id(normalized)
+
+
+def test_numpy_index_is_persisted_and_mapped_by_later_processes(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path, docs: list[Document]
+) -> None:
+    class CountingEmbeddings(NamedEmbeddings):
+        calls = 0
+
+        def embed_documents(self, texts: list[str]) -> list[list[float]]:
+            CountingEmbeddings.calls += len(texts)
+            return super().embed_documents(texts)
+
+    local._resolve_factory.cache_clear()
+    monkeypatch.setenv("RAG_BENCH_VECTORSTORE", "numpy")
+    monkeypatch.setenv(embedding_cache.DISABLE_ENV, "1")
+    monkeypatch.setattr(corpus, "build_local_vectorstore", local.build_local_vectorstore)
+    try:
+        built = corpus.get_corpus_index(docs, CountingEmbeddings("mini"), chunk_size=100, chunk_overlap=10)
+        embedded = CountingEmbeddings.calls
+        assert embedded == len(built.splits) > 0
+        assert built.key is not None
+        assert (tmp_path / "indexes" / built.key.digest()[:24] / "manifest.json").exists()
+
+        corpus.clear_corpus_indexes()  # as if a new process started
+        loaded = corpus.get_corpus_index(docs, CountingEmbeddings("mini"), chunk_size=100, chunk_overlap=10)
+        assert CountingEmbeddings.calls == embedded
+        assert isinstance(loaded.vectorstore, NumpyVectorStore) and isinstance(loaded.splits, ChunkFile)
+        assert [d.page_content for d in loaded.splits] == [d.page_content for d in built.splits]
+        hits = loaded.vectorstore.similarity_search("beta " * 5, k=2)
+        assert hits == built.vectorstore.similarity_search("beta " * 5, k=2)
+
+        monkeypatch.setenv(corpus.DISABLE_INDEX_CACHE_ENV, "1")
+        corpus.clear_corpus_indexes()
+        corpus.get_corpus_index(docs, CountingEmbeddings("mini"), chunk_size=100, chunk_overlap=10)
+        assert CountingEmbeddings.calls == 2 * embedded
+    finally:
+        local._resolve_factory.cache_clear()
+
+
+def test_ann_spec_builds_separate_faiss_index_and_reports_recall(
+    monkeypatch: pytest.MonkeyPatch, docs: list[Document], _count_builds: list[Any]
+) -> None:
+    ann_builds: list[Any] = []
+
+    def fake_ann(splits: list[Document], embed: Any, spec: AnnSpec, vectors: Any = None) -> Any:
+        ann_builds.append(spec)
+        return SimpleNamespace(index=StoredIndex(len(splits)))
+
+    class StoredIndex:
+        def __init__(self, ntotal: int) -> None:
+            self.ntotal = ntotal
+
+        def reconstruct_n(self, start: int, count: int) -> list[list[float]]:
+            return [[1.0, 0.0]] * count
+
+    recall_calls: list[Any] = []
+
+    def fake_recall(index: Any, exact: Any, queries: Any, k: int) -> float:
+        recall_calls.append((index.ntotal, sum(len(block) for block in exact), len(queries), k))
+        return 0.5
+
+    monkeypatch.setattr(corpus, "build_faiss_ann", fake_ann)
+    monkeypatch.setattr(corpus, "ann_recall", fake_recall)
+    monkeypatch.delenv("RAG_BENCH_VECTORSTORE", raising=False)
+    exact = corpus.get_corpus_index(docs, NamedEmbeddings("mini"))
+    spec = AnnSpec(kind="ivf_flat", nlist=8)
+    approx = corpus.get_corpus_index(docs, NamedEmbeddings("mini"), index_spec=spec)
+
+    assert approx is not exact and approx.key is not None and approx.key.index_spec == spec
+    # Fewer chunks than lists: the index is built, and reported, with one list per chunk.
+    built = effective_spec(spec, len(approx.splits))
+    assert built.nlist == len(approx.splits) < spec.nlist
+    assert ann_builds == [built] and approx.ann_spec == built and len(_count_builds) == 1
+    assert exact.recall(["q"], k=2) is None
+    assert corpus.ann_indexes() == [approx]
+    report = corpus.ann_report(["q1", "q2"], k=2)
+    assert report == [{**describe(built), "k": 2, "recall": 0.5}]
+    assert recall_calls == [(len(approx.splits), len(approx.splits), 2, 2)]
+
+    monkeypatch.setenv("RAG_BENCH_VECTORSTORE", "faiss-hnsw")
+    from_env = corpus.get_corpus_index(docs, NamedEmbeddings("mini"))
+    assert from_env.key is not None and from_env.key.index_spec == AnnSpec(kind="hnsw")
+
+
+def test_small_ivf_pq_corpus_reports_and_recalls_the_flat_index_built(
+    monkeypatch: pytest.MonkeyPatch, docs: list[Document]
+) -> None:
+    class StoredIndex:
+        def __init__(self, ntotal: int) -> None:
+            self.ntotal = ntotal
+
+        def reconstruct_n(self, start: int, count: int) -> list[list[float]]:
+            return [[1.0, 0.0]] * count
+
+    class CountingEmbeddings(NamedEmbeddings):
+        batches = 0
+
+        def embed_documents(self, texts: list[str]) -> list[list[float]]:
+            CountingEmbeddings.batches += 1
+            return super().embed_documents(texts)
+
+    monkeypatch.setattr(
+        corpus,
+        "build_faiss_ann",
+        lambda splits, embed, spec, vectors=None: SimpleNamespace(index=StoredIndex(len(splits))),
+    )
+    monkeypatch.setattr(corpus, "ann_recall", lambda index, exact, queries, k: float(len(list(exact))))
+    index = corpus.get_corpus_index(docs, CountingEmbeddings("mini"), index_spec=AnnSpec(kind="ivf_pq", pq_m=1))
+    embedded = CountingEmbeddings.batches
+
+    assert index.ann_spec is not None and index.ann_spec.kind == "ivf_flat"
+    [row] = corpus.ann_report(["q"], k=1)
+    assert row["kind"] == "ivf_flat" and "pq_m" not in row
+    assert CountingEmbeddings.batches == embedded  # exact vectors read back from the index, not re-embedded
+
+
+def test_recording_indexes_collects_indexes_handed_out(docs: list[Document]) -> None:
+    with corpus.recording_indexes() as used:
+        first = corpus.get_corpus_index(docs, NamedEmbeddings("mini"))
+        again = corpus.get_corpus_index(docs, NamedEmbeddings("mini"))
+    after = corpus.get_corpus_index(docs, NamedEmbeddings("large"))
+    assert used == [first, again] and after not in used
+
+
+def test_file_corpus_is_synced_incrementally(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    class CountingEmbeddings(NamedEmbeddings):
+        texts: list[str] = []
+
+        def embed_documents(self, texts: list[str]) -> list[list[float]]:
+            CountingEmbeddings.texts.extend(texts)
+            return super().embed_documents(texts)
+
+    (tmp_path / "a.txt").write_text("alpha " * 30, encoding="utf-8")
+    (tmp_path / "b.txt").write_text("beta " * 30, encoding="utf-8")
+    files = FileCorpus([str(tmp_path / "a.txt"), str(tmp_path / "b.txt")])
+    local._resolve_factory.cache_clear()
+    monkeypatch.setenv("RAG_BENCH_VECTORSTORE", "numpy")
+    monkeypatch.setenv(embedding_cache.DISABLE_ENV, "1")
+    try:
+        first = corpus.get_corpus_index(files, CountingEmbeddings("mini"), chunk_size=100, chunk_overlap=10)
+        assert first.sync_stats is not None and first.sync_stats.added == 2
+        assert len(CountingEmbeddings.texts) == len(first.splits) > 2
+        assert corpus.get_corpus_index(files, CountingEmbeddings("mini"), chunk_size=100, chunk_overlap=10) is first
+
+        (tmp_path / "b.txt").write_text("gamma", encoding="utf-8")
+        CountingEmbeddings.texts.clear()
+        corpus.clear_corpus_indexes()  # as if a new process started
+        second = corpus.get_corpus_index(files, CountingEmbeddings("mini"), chunk_size=100, chunk_overlap=10)
+        assert second.sync_stats is not None and (second.sync_stats.changed, second.sync_stats.unchanged) == (1, 1)
+        assert CountingEmbeddings.texts == ["gamma"]
+        assert "gamma" in [d.page_content for d in second.splits]
+        assert all("beta" not in d.page_content for d in second.splits)
+        assert isinstance(second.vectorstore, NumpyVectorStore)
+        assert second.vectorstore.similarity_search("gamma", k=1)[0].metadata["source"] == str(tmp_path / "b.txt")
+    finally:
+        local._resolve_factory.cache_clear()
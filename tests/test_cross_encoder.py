@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+from types import SimpleNamespace
+from typing import Any, Dict, List, cast
+
+import pytest
+import torch
+from langchain_core.documents import Document
+
+from rag_bencher.pipelines import cross_encoder, rerank
+
+pytestmark = [pytest.mark.unit, pytest.mark.offline]
+
+
+class FakeTokenizer:
+    """One token per word; pads with zeros and records every padded batch shape."""
+
+    def __init__(self) -> None:
+        self.padded: List[tuple[int, int]] = []
+
+    def __call__(self, questions: List[str], passages: List[str], **_: Any) -> Dict[str, List[List[int]]]:
+        ids = [[1] * len(f"{q} {p}".split()) for q, p in zip(questions, passages, strict=True)]
+        return {"input_ids": ids, "attention_mask": [[1] * len(x) for x in ids]}
+
+    def pad(self, features: Dict[str, List[List[int]]], **_: Any) -> Dict[str, torch.Tensor]:
+        width = max(len(x) for x in features["input_ids"])
+        out = {k: torch.tensor([x + [0] * (width - len(x)) for x in v]) for k, v in features.items()}
+        self.padded.append(tuple(out["input_ids"].shape))  # type: ignore[arg-type]
+        return out
+
+
+class FakeModel:
+    """Scores a pair by its token count, with ``labels`` output columns."""
+
+    def __init__(self, labels: int = 1) -> None:
+        self.labels = labels
+
+    def __call__(self, input_ids: torch.Tensor, attention_mask: torch.Tensor) -> Any:
+        lengths = attention_mask.sum(dim=1, keepdim=True).float()
+        return SimpleNamespace(logits=torch.cat([-lengths] * (self.labels - 1) + [lengths], dim=1))
+
+
+def test_scores_follow_input_order_with_length_bucketed_batches() -> None:
+    tok = FakeTokenizer()
+    scorer = cross_encoder.CrossEncoderScorer(tok, FakeModel())
+    passages = ["a b c d e f", "a", "a b c", "a b", "a b c d"]
+
+    scores = scorer.score("q", passages, max_batch_size=2)
+
+    assert scores == [7.0, 2.0, 4.0, 3.0, 5.0]
+    # Sorted by length, so each batch is padded only to its own longest pair.
+    assert tok.padded == [(2, 3), (2, 5), (1, 7)]
+
+
+def test_multi_label_models_use_the_last_class() -> None:
+    scorer = cross_encoder.CrossEncoderScorer(FakeTokenizer(), FakeModel(labels=2))
+    assert scorer.score("q", ["a b", "a"]) == [3.0, 2.0]
+    assert scorer.score("q", []) == []
+
+
+def test_rerank_cross_encoder_method_orders_by_scorer(monkeypatch: pytest.MonkeyPatch) -> None:
+    loaded: List[str] = []
+    scorer = cross_encoder.CrossEncoderScorer(FakeTokenizer(), FakeModel())
+
+    def fake_load(name: str) -> cross_encoder.CrossEncoderScorer:
+        loaded.append(name)
+        return scorer
+
+    class Store:
+        def similarity_search_by_vector(self, embedding: List[float], k: int = 4) -> List[Document]:
+            return [Document(page_content=t) for t in ["short", "a much longer passage", "mid size"]][:k]
+
+    class Embed:
+        def embed_query(self, text: str) -> List[float]:
+            return [1.0]
+
+    index = SimpleNamespace(vectorstore=Store(), embeddings=Embed())
+    monkeypatch.setattr(rerank, "load_cross_encoder", fake_load)
+    monkeypatch.setattr(rerank, "get_corpus_index", lambda *a, **k: index)
+    chain, debug = rerank.build_chain(
+        [], model="dummy", k=3, rerank_top_k=2, method="cross_encoder", embeddings=cast(Any, Embed()), max_batch_size=2
+    )
+    chain.invoke("question?")
+
+    assert loaded == ["BAAI/bge-reranker-base"]
+    info = debug()
+    assert info["method"] == "cross_encoder"
+    assert [c["preview"] for c in info["candidates"]] == ["a much longer passage", "mid size", "short"]
+
+
+def test_rerank_rejects_unknown_method() -> None:
+    with pytest.raises(ValueError, match="Unknown rerank method"):
+        rerank.build_chain([], method="bm25")
@@ -14,7 +14,7 @@ def test_load_texts_as_documents(tmp_path: Path) -> None:
     file_a = tmp_path / "a.txt"
     file_a.write_text("alpha", encoding="utf-8")
     docs = dataset_loader.load_texts_as_documents([str(file_a)])
-    assert len(docs) == 1
+    assert isinstance(docs, list) and len(docs) == 1
     assert docs[0].page_content == "alpha"
     assert docs[0].metadata == {"source": str(file_a)}
 
@@ -50,3 +50,48 @@ def test_load_dataset_without_text_files(tmp_path: Path, monkeypatch: pytest.Mon
     monkeypatch.setattr(dataset_mod, "DATASETS_ROOT", root, raising=False)
     with pytest.raises(FileNotFoundError):
         dataset_mod.load_dataset("empty")
+
+
+def test_file_corpus_reads_on_access(tmp_path: Path) -> None:
+    file_a = tmp_path / "a.txt"
+    file_a.write_text("alpha", encoding="utf-8")
+    docs = dataset_loader.open_file_corpus([str(file_a)])
+    file_a.write_text("beta", encoding="utf-8")
+    assert docs.paths == [str(file_a)]
+    assert [d.page_content for d in docs[:]] == ["beta"]
+    for load in (dataset_loader.open_file_corpus, dataset_loader.load_texts_as_documents):
+        with pytest.raises(FileNotFoundError):
+            load([str(tmp_path / "missing.txt")])
+
+
+def test_expand_paths_handles_globs_and_directories(tmp_path: Path) -> None:
+    (tmp_path / "sub" / "deep").mkdir(parents=True)
+    for rel in ("a.txt", "b.md", "skip.json", "sub/c.txt", "sub/deep/d.md"):
+        (tmp_path / rel).write_text(rel, encoding="utf-8")
+
+    assert dataset_loader.expand_paths([str(tmp_path)]) == [
+        str(tmp_path / rel) for rel in ("a.txt", "b.md", "sub/c.txt", "sub/deep/d.md")
+    ]
+    assert dataset_loader.expand_paths([str(tmp_path / "**" / "*.txt"), str(tmp_path / "a.txt")]) == [
+        str(tmp_path / "a.txt"),
+        str(tmp_path / "sub" / "c.txt"),
+    ]
+    with pytest.raises(FileNotFoundError, match="No files match"):
+        dataset_loader.expand_paths([str(tmp_path / "*.rst")])
+    docs = dataset_loader.load_texts_as_documents([str(tmp_path / "sub")])
+    assert [d.page_content for d in docs] == ["sub/c.txt", "sub/deep/d.md"]
+
+
+def test_iter_document_batches_preserves_order(tmp_path: Path) -> None:
+    paths = [str(tmp_path / f"{i}.txt") for i in range(7)]
+    for i, p in enumerate(paths):
+        Path(p).write_text(f"doc {i}", encoding="utf-8")
+
+    batches = list(dataset_loader.iter_document_batches(paths, batch_size=3, workers=2))
+
+    assert [len(b) for b in batches] == [3, 3, 1]
+    assert [d.page_content for b in batches for d in b] == [f"doc {i}" for i in range(7)]
+    assert list(dataset_loader.FileCorpus(paths[:2]).iter_batches(batch_size=2))[0][1].metadata == {"source": paths[1]}
+    assert list(dataset_loader.iter_document_batches([])) == []
+    with pytest.raises(ValueError):
+        next(dataset_loader.iter_document_batches(paths, batch_size=0))
@@ -0,0 +1,201 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import Iterator
+
+import numpy as np
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from rag_bencher.utils import embedding_cache
+from rag_bencher.utils.embedding_cache import CachedEmbeddings, EmbeddingStore, with_embedding_cache
+
+pytestmark = [pytest.mark.unit, pytest.mark.offline]
+
+
+class CountingEmbeddings(Embeddings):
+    def __init__(self, model_name: str = "counting") -> None:
+        self.model_name = model_name
+        self.doc_calls: list[list[str]] = []
+        self.query_calls: list[str] = []
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        self.doc_calls.append(list(texts))
+        return [[float(len(t)), 1.0, 0.5] for t in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        self.query_calls.append(text)
+        return [float(len(text)), 0.0, 1.0]
+
+
+_OPENED: list[EmbeddingStore] = []
+
+
+@pytest.fixture(autouse=True)
+def _close_stores() -> Iterator[None]:
+    yield
+    while _OPENED:
+        _OPENED.pop().close()
+
+
+def _store(tmp_path: Path, max_bytes: int = 1 << 20) -> EmbeddingStore:
+    _OPENED.append(EmbeddingStore(tmp_path / "store", "counting", max_bytes))
+    return _OPENED[-1]
+
+
+def _cached(tmp_path: Path, inner: Embeddings, max_bytes: int = 1 << 20) -> CachedEmbeddings:
+    return CachedEmbeddings(inner, _store(tmp_path, max_bytes))
+
+
+def test_repeated_documents_are_served_from_cache(tmp_path: Path) -> None:
+    inner = CountingEmbeddings()
+    emb = _cached(tmp_path, inner)
+    first = emb.embed_documents(["alpha", "beta", "alpha"])
+    second = emb.embed_documents(["beta", "alpha"])
+    assert inner.doc_calls == [["alpha", "beta"]]
+    assert first == [[5.0, 1.0, 0.5], [4.0, 1.0, 0.5], [5.0, 1.0, 0.5]]
+    assert second == [first[1], first[0]]
+
+
+def test_cache_persists_across_processes(tmp_path: Path) -> None:
+    _cached(tmp_path, CountingEmbeddings()).embed_documents(["alpha", "beta"])
+    inner = CountingEmbeddings()
+    reopened = _cached(tmp_path, inner)
+    assert reopened.embed_documents(["beta"]) == [[4.0, 1.0, 0.5]]
+    assert inner.doc_calls == []
+    assert len(reopened.store) == 2
+    assert list((tmp_path / "store").glob("vectors-*.f32"))
+
+
+def test_queries_and_documents_use_separate_keys(tmp_path: Path) -> None:
+    inner = CountingEmbeddings()
+    emb = _cached(tmp_path, inner)
+    emb.embed_documents(["alpha"])
+    assert emb.embed_query("alpha") == [5.0, 0.0, 1.0]
+    assert emb.embed_query("alpha") == [5.0, 0.0, 1.0]
+    assert inner.query_calls == ["alpha"]
+
+
+def test_store_evicts_least_recently_used_rows(tmp_path: Path) -> None:
+    row_bytes = 3 * 4
+    store = _store(tmp_path, max_bytes=4 * row_bytes)
+    store.put_many(["a", "b", "c"], [[1.0, 0.0, 0.0], [2.0, 0.0, 0.0], [3.0, 0.0, 0.0]])
+    store.get_many(["a"])
+    store.put_many(["d", "e"], [[4.0, 0.0, 0.0], [5.0, 0.0, 0.0]])
+    hits = store.get_many(["a", "b", "c", "d", "e"])
+    assert hits[1] is None and hits[2] is None
+    assert [float(v[0]) for v in hits if v is not None] == [1.0, 4.0, 5.0]
+    files = list((tmp_path / "store").glob("vectors-*.f32"))
+    assert len(files) == 1 and files[0].stat().st_size == 3 * row_bytes
+
+
+def test_store_rejects_dimension_change(tmp_path: Path) -> None:
+    store = _store(tmp_path)
+    store.put_many(["a"], np.ones((1, 3), dtype=np.float32).tolist())
+    with pytest.raises(ValueError, match="dimension"):
+        store.put_many(["b"], [[1.0, 2.0]])
+
+
+def test_with_embedding_cache_respects_env_and_model_id(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(embedding_cache, "ROOT", tmp_path)
+    inner = CountingEmbeddings()
+    wrapped = with_embedding_cache(inner)
+    assert isinstance(wrapped, CachedEmbeddings)
+    assert with_embedding_cache(wrapped) is wrapped
+
+    class Anonymous(Embeddings):
+        def embed_documents(self, texts: list[str]) -> list[list[float]]:
+            return [[0.0] for _ in texts]
+
+        def embed_query(self, text: str) -> list[float]:
+            return [0.0]
+
+    anonymous = Anonymous()
+    assert with_embedding_cache(anonymous) is anonymous
+    monkeypatch.setenv(embedding_cache.DISABLE_ENV, "1")
+    assert with_embedding_cache(inner) is inner
+
+
+def test_embed_queries_batches_symmetric_models_only(tmp_path: Path) -> None:
+    class OpenAIEmbeddings(CountingEmbeddings):
+        pass
+
+    symmetric = OpenAIEmbeddings()
+    assert embedding_cache.embed_queries(symmetric, ["a", "bb"]) == [[1.0, 1.0, 0.5], [2.0, 1.0, 0.5]]
+    assert symmetric.doc_calls == [["a", "bb"]] and symmetric.query_calls == []
+
+    asymmetric = CountingEmbeddings()
+    assert embedding_cache.embed_queries(asymmetric, ["a", "bb"]) == [[1.0, 0.0, 1.0], [2.0, 0.0, 1.0]]
+    assert asymmetric.query_calls == ["a", "bb"] and asymmetric.doc_calls == []
+
+    inner = OpenAIEmbeddings()
+    cached = _cached(tmp_path, inner)
+    cached.embed_query("a")
+    assert embedding_cache.embed_queries(cached, ["a", "bb", "ccc"])[0] == cached.embed_query("a")
+    # Only the misses reach the model, in one batch; the hit stays keyed as a query.
+    assert inner.doc_calls == [["bb", "ccc"]] and inner.query_calls == ["a"]
+    assert embedding_cache.embed_queries(cached, []) == []
+
+
+def test_prefetch_queries_batches_distinct_texts_into_the_cache(tmp_path: Path) -> None:
+    class OpenAIEmbeddings(CountingEmbeddings):
+        pass
+
+    inner = OpenAIEmbeddings()
+    cached = _cached(tmp_path, inner)
+
+    sent = embedding_cache.prefetch_queries(cached, iter(["a", "bb", "a", "ccc", "dddd"]), batch_size=2)
+
+    assert sent == 4
+    assert inner.doc_calls == [["a", "bb"], ["ccc", "dddd"]]
+    assert cached.embed_query("ccc") == [3.0, 1.0, 0.5]
+    assert inner.query_calls == []  # served from the prefetched vectors
+    assert embedding_cache.prefetch_queries(inner, ["a"]) == 0
+
+
+def test_stores_sharing_a_directory_interleave_appends(tmp_path: Path) -> None:
+    first, second = _store(tmp_path), _store(tmp_path)
+    first.put_many(["a"], [[1.0, 0.0, 0.0]])
+    second.put_many(["b"], [[2.0, 0.0, 0.0]])
+    first.put_many(["c"], [[3.0, 0.0, 0.0]])
+
+    for store in (first, second, _store(tmp_path)):
+        hits = store.get_many(["a", "b", "c"])
+        assert [float(v[0]) for v in hits if v is not None] == [1.0, 2.0, 3.0]
+    assert len(second) == 3
+
+
+def test_eviction_by_one_store_leaves_others_consistent(tmp_path: Path) -> None:
+    row_bytes = 3 * 4
+    evicting, reader = _store(tmp_path, max_bytes=4 * row_bytes), _store(tmp_path, max_bytes=4 * row_bytes)
+    evicting.put_many(["a", "b", "c"], [[1.0, 0.0, 0.0], [2.0, 0.0, 0.0], [3.0, 0.0, 0.0]])
+    assert reader.get_many(["a"])[0] is not None
+    reader.flush()
+
+    evicting.put_many(["d", "e"], [[4.0, 0.0, 0.0], [5.0, 0.0, 0.0]])
+    reader.put_many(["f"], [[6.0, 0.0, 0.0]])
+
+    hits = reader.get_many(["a", "b", "c", "d", "e", "f"])
+    assert [None if v is None else float(v[0]) for v in hits] == [1.0, None, None, 4.0, 5.0, 6.0]
+    assert [p.name for p in (tmp_path / "store").glob("vectors-*.f32")] == ["vectors-1.f32"]
+
+
+def test_legacy_json_index_is_imported(tmp_path: Path) -> None:
+    directory = tmp_path / "store"
+    directory.mkdir()
+    np.asarray([[1.0, 0.0, 0.0], [2.0, 0.0, 0.0]], dtype=np.float32).tofile(directory / "vectors-0.f32")
+    legacy = {
+        "model": "counting",
+        "dim": 3,
+        "generation": 0,
+        "count": 2,
+        "clock": 2,
+        "rows": {"a": [0, 1], "b": [1, 2]},
+    }
+    (directory / "index.json").write_text(json.dumps(legacy), "utf-8")
+
+    store = _store(tmp_path)
+
+    assert [float(v[0]) for v in store.get_many(["b", "a"]) if v is not None] == [2.0, 1.0]
+    assert not (directory / "index.json").exists()
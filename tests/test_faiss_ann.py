@@ -0,0 +1,222 @@
+from __future__ import annotations
+
+import sys
+from types import SimpleNamespace
+from typing import Any
+
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from rag_bencher.vector import faiss_ann, numpy_store
+from rag_bencher.vector.base import build_vector_backend
+from rag_bencher.vector.faiss_ann import (
+    AnnSpec,
+    ann_recall,
+    ann_spec_from_config,
+    ann_spec_from_env,
+    describe,
+    effective_spec,
+)
+
+pytestmark = [pytest.mark.unit, pytest.mark.offline]
+
+
+class AxisEmbeddings(Embeddings):
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [self.embed_query(t) for t in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return [float(len(text)), 1.0, float(text.count("a"))]
+
+
+class ExactIndex:
+    """Brute-force stand-in for a trained FAISS index."""
+
+    def __init__(self, dim: int, description: str, metric: int) -> None:
+        self.dim = dim
+        self.description = description
+        self.metric = metric
+        self.is_trained = description.startswith("HNSW")
+        self.trained_on = 0
+        self.params: dict[str, int] = {}
+        self.vectors = np.zeros((0, dim), dtype=np.float32)
+
+    def train(self, x: Any) -> None:
+        self.trained_on = len(x)
+        self.is_trained = True
+
+    def add(self, x: Any) -> None:
+        assert self.is_trained
+        self.vectors = np.vstack([self.vectors, np.asarray(x, dtype=np.float32)])
+
+    def search(self, x: Any, k: int) -> tuple[Any, Any]:
+        scores = np.asarray(x, dtype=np.float32) @ self.vectors.T
+        order = np.argsort(-scores, axis=1)[:, :k]
+        return np.take_along_axis(scores, order, axis=1), order
+
+
+@pytest.fixture
+def fake_faiss(monkeypatch: pytest.MonkeyPatch) -> SimpleNamespace:
+    built: list[ExactIndex] = []
+
+    def index_factory(dim: int, description: str, metric: int) -> ExactIndex:
+        built.append(ExactIndex(dim, description, metric))
+        return built[-1]
+
+    class ParameterSpace:
+        def set_index_parameter(self, index: ExactIndex, name: str, value: int) -> None:
+            index.params[name] = value
+
+    module = SimpleNamespace(
+        METRIC_INNER_PRODUCT=0, index_factory=index_factory, ParameterSpace=ParameterSpace, built=built
+    )
+    monkeypatch.setitem(sys.modules, "faiss", module)
+    return module
+
+
+def test_spec_from_config_and_factory_strings() -> None:
+    assert ann_spec_from_config(None) is None
+    assert ann_spec_from_config({"name": "opensearch"}) is None
+    hnsw = ann_spec_from_config({"name": "faiss"})
+    assert hnsw == AnnSpec(kind="hnsw")
+    assert hnsw.factory_string() == "HNSW32,Flat"
+    ivf = ann_spec_from_config({"name": "FAISS", "index": "ivf_pq", "nlist": 256, "pq_m": 8, "nprobe": 4})
+    assert ivf is not None and ivf.nprobe == 4
+    assert ivf.factory_string() == "IVF256,PQ8x8"
+    assert ivf.factory_string(nlist=10) == "IVF10,PQ8x8"
+    assert AnnSpec(kind="ivf_flat", nlist=64).factory_string() == "IVF64,Flat"
+
+
+def test_spec_validation() -> None:
+    with pytest.raises(ValueError, match="kind"):
+        ann_spec_from_config({"name": "faiss", "index": "lsh"})
+    with pytest.raises(ValueError, match="nprob"):
+        ann_spec_from_config({"name": "faiss", "nprob": 4})
+    with pytest.raises(ValueError, match="nprobe"):
+        AnnSpec(kind="ivf_flat", nprobe=0)
+
+
+def test_spec_from_env(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.delenv("RAG_BENCH_VECTORSTORE", raising=False)
+    assert ann_spec_from_env() is None
+    monkeypatch.setenv("RAG_BENCH_VECTORSTORE", "faiss-ivf-flat")
+    monkeypatch.setenv("RAG_BENCH_FAISS_NPROBE", "32")
+    monkeypatch.setenv("RAG_BENCH_FAISS_TRAIN_SIZE", "500")
+    spec = ann_spec_from_env()
+    assert spec == AnnSpec(kind="ivf_flat", nprobe=32, train_size=500)
+
+
+def test_faiss_backend_name_uses_local_index() -> None:
+    assert build_vector_backend({"name": "faiss", "index": "hnsw"}) is None
+
+
+@pytest.mark.filterwarnings("ignore::DeprecationWarning")
+def test_build_ivf_trains_on_sample_and_sets_nprobe(fake_faiss: SimpleNamespace) -> None:
+    docs = [Document(page_content="a" * i + "b", metadata={"n": i}) for i in range(1, 9)]
+    spec = AnnSpec(kind="ivf_flat", nlist=100, nprobe=3, train_size=5)
+
+    store = faiss_ann.build_faiss_ann(docs, AxisEmbeddings(), spec)
+
+    index = fake_faiss.built[0]
+    assert index.description == "IVF5,Flat"
+    assert index.trained_on == 5
+    assert index.params == {"nprobe": 3}
+    assert np.allclose(np.linalg.norm(index.vectors, axis=1), 1.0)
+    hits = store.similarity_search("aaab", k=2)
+    assert hits[0].metadata == {"n": 3}
+
+
+@pytest.mark.filterwarnings("ignore::DeprecationWarning")
+def test_build_hnsw_skips_training(fake_faiss: SimpleNamespace) -> None:
+    docs = [Document(page_content=t) for t in ("x", "yy", "zzz")]
+
+    faiss_ann.build_faiss_ann(docs, AxisEmbeddings(), AnnSpec(kind="hnsw", hnsw_m=16, ef_search=40))
+
+    index = fake_faiss.built[0]
+    assert index.description == "HNSW16,Flat"
+    assert index.trained_on == 0
+    assert index.params == {"efSearch": 40}
+
+
+def test_ann_recall_against_exact_search() -> None:
+    vectors = np.eye(4, dtype=np.float32)
+    queries = np.array([[1.0, 0.1, 0.0, 0.0], [0.0, 0.0, 1.0, 0.2]], dtype=np.float32)
+
+    class HalfWrong:
+        def search(self, x: Any, k: int) -> tuple[Any, Any]:
+            return np.zeros((len(x), k)), np.array([[0, 1], [3, 0]])
+
+    assert ann_recall(HalfWrong(), vectors, queries, k=2) == pytest.approx(0.75)
+    assert ann_recall(HalfWrong(), vectors, np.zeros((0, 4)), k=2) == 1.0
+    blocks = [vectors[:1].tolist(), vectors[1:3], vectors[3:]]
+    assert ann_recall(HalfWrong(), iter(blocks), queries, k=2) == pytest.approx(0.75)
+    assert ann_recall(HalfWrong(), iter([]), queries, k=2) == 1.0
+
+
+def test_ann_recall_scores_exact_search_in_bounded_blocks(monkeypatch: pytest.MonkeyPatch) -> None:
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(50, 8)).astype(np.float32)
+    queries = rng.normal(size=(4, 8)).astype(np.float32)
+    widths: list[int] = []
+    top_k_blocks = numpy_store.top_k_blocks
+
+    def recording(blocks: Any, n_queries: int, top: int) -> Any:
+        def watched() -> Any:
+            for scores in blocks:
+                widths.append(scores.shape[1])
+                yield scores
+
+        return top_k_blocks(watched(), n_queries, top)
+
+    monkeypatch.setattr(faiss_ann, "SEARCH_BLOCK_ELEMENTS", 4 * 16)
+    monkeypatch.setattr(faiss_ann, "top_k_blocks", recording)
+    index = ExactIndex(8, "HNSW8,Flat", 0)
+    index.add(numpy_store.normalize_rows(vectors))
+
+    assert ann_recall(index, vectors, queries, k=5) == 1.0
+    assert widths == [16, 16, 16, 2]
+
+
+def test_index_vector_blocks_reconstructs_stored_rows() -> None:
+    class IvfIndex:
+        ntotal = 5
+        mapped = False
+
+        def make_direct_map(self) -> None:
+            self.mapped = True
+
+        def reconstruct_n(self, start: int, count: int) -> Any:
+            assert self.mapped
+            return np.arange(start, start + count, dtype=np.float32).reshape(-1, 1)
+
+    blocks = list(faiss_ann.index_vector_blocks(IvfIndex(), rows=2))
+    assert [b.ravel().tolist() for b in blocks] == [[0.0, 1.0], [2.0, 3.0], [4.0]]
+
+
+@pytest.mark.filterwarnings("ignore::DeprecationWarning")
+def test_build_ivf_pq_on_small_corpus_falls_back_to_flat_lists(fake_faiss: SimpleNamespace) -> None:
+    docs = [Document(page_content="a" * i + "b") for i in range(1, 9)]
+
+    faiss_ann.build_faiss_ann(docs, AxisEmbeddings(), AnnSpec(kind="ivf_pq", nlist=4, pq_m=1))
+    faiss_ann.build_faiss_ann(docs, AxisEmbeddings(), AnnSpec(kind="ivf_pq", nlist=4, pq_m=1, pq_bits=3))
+
+    assert [index.description for index in fake_faiss.built] == ["IVF4,Flat", "IVF4,PQ1x3"]
+
+
+def test_effective_spec_clamps_lists_and_drops_pq_for_small_samples() -> None:
+    spec = AnnSpec(kind="ivf_pq", nlist=64, pq_m=4, pq_bits=4, train_size=20)
+
+    assert effective_spec(spec, 1000) == AnnSpec(kind="ivf_pq", nlist=20, pq_m=4, pq_bits=4, train_size=20)
+    assert effective_spec(spec, 10) == AnnSpec(kind="ivf_flat", nlist=10, pq_m=4, pq_bits=4, train_size=20)
+    assert describe(effective_spec(spec, 10))["nlist"] == 10
+    assert effective_spec(AnnSpec(kind="hnsw"), 3) == AnnSpec(kind="hnsw")
+
+
+def test_build_ivf_pq_rejects_pq_m_not_dividing_the_dimension(fake_faiss: SimpleNamespace) -> None:
+    docs = [Document(page_content="a" * i + "b") for i in range(1, 9)]
+
+    with pytest.raises(ValueError, match="pq_m=2 must divide the embedding dimension 3"):
+        faiss_ann.build_faiss_ann(docs, AxisEmbeddings(), AnnSpec(kind="ivf_pq", pq_m=2))
+    assert fake_faiss.built == []
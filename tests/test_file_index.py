@@ -0,0 +1,207 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+from pathlib import Path
+
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from rag_bencher.utils.locking import exclusive_lock
+from rag_bencher.vector.file_index import LOCK_FILE, MANIFEST_FILE, FileIndex, SyncStats
+from rag_bencher.vector.numpy_store import NumpyVectorStore
+
+pytestmark = [pytest.mark.unit, pytest.mark.offline]
+
+
+class CountingEmbeddings(Embeddings):
+    """Counts of a, b and c; records every text it embeds."""
+
+    def __init__(self) -> None:
+        self.embedded: list[str] = []
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        self.embedded.extend(texts)
+        return [self.embed_query(t) for t in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return [float(text.count("a")), float(text.count("b")), float(text.count("c")) + 0.1]
+
+
+def by_line(docs: list[Document]) -> list[Document]:
+    return [
+        Document(page_content=line, metadata=dict(d.metadata)) for d in docs for line in d.page_content.splitlines()
+    ]
+
+
+def _write(path: Path, text: str) -> str:
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+def _sync(directory: Path, embed: CountingEmbeddings, paths: list[str]) -> SyncStats:
+    return FileIndex(directory, embed, model_id="letters", params="line").sync(paths, by_line)
+
+
+def _texts(directory: Path, embed: Embeddings, paths: list[str] | None = None) -> list[str]:
+    store = FileIndex(directory, embed, model_id="letters", params="line").store(paths)
+    return sorted(d.page_content for d in store.similarity_search("abc", k=100))
+
+
+def test_sync_embeds_only_added_and_changed_files(tmp_path: Path) -> None:
+    index_dir = tmp_path / "index"
+    a = _write(tmp_path / "a.txt", "aa\nab")
+    b = _write(tmp_path / "b.txt", "bb\nbc")
+    embed = CountingEmbeddings()
+
+    assert _sync(index_dir, embed, [a, b]) == SyncStats(added=2, chunks_embedded=4)
+    assert _texts(index_dir, embed) == ["aa", "ab", "bb", "bc"]
+
+    embed.embedded.clear()
+    assert _sync(index_dir, embed, [a, b]) == SyncStats(unchanged=2)
+    os.utime(a, ns=(1, 1))  # touched, not edited
+    assert _sync(index_dir, embed, [a, b]) == SyncStats(unchanged=2)
+    assert embed.embedded == []
+
+    _write(tmp_path / "b.txt", "cc\nbc\nbbb")
+    c = _write(tmp_path / "c.txt", "ccc")
+    assert _sync(index_dir, embed, [a, b, c]) == SyncStats(added=1, changed=1, unchanged=1, chunks_embedded=4)
+    assert embed.embedded == ["cc", "bc", "bbb", "ccc"]
+    assert _texts(index_dir, embed) == ["aa", "ab", "bbb", "bc", "cc", "ccc"]
+    hit = FileIndex(index_dir, embed, model_id="letters", params="line").store().similarity_search("c", k=1)[0]
+    assert hit.metadata["source"] == c
+
+    os.remove(c)
+    assert _sync(index_dir, embed, [a, b]) == SyncStats(deleted=1, unchanged=2)
+    assert _texts(index_dir, embed) == ["aa", "ab", "bbb", "bc", "cc"]
+
+
+def test_files_outside_the_sync_stay_indexed_but_hidden(tmp_path: Path) -> None:
+    index_dir = tmp_path / "index"
+    a = _write(tmp_path / "a.txt", "aa")
+    b = _write(tmp_path / "b.txt", "bb")
+    embed = CountingEmbeddings()
+    _sync(index_dir, embed, [a, b])
+
+    assert _sync(index_dir, embed, [a]) == SyncStats(unchanged=1)
+    assert _texts(index_dir, embed, [a]) == ["aa"]
+    assert _texts(index_dir, embed) == ["aa", "bb"]
+
+
+def test_compaction_rewrites_live_rows(tmp_path: Path) -> None:
+    index_dir = tmp_path / "index"
+    a = _write(tmp_path / "a.txt", "a\naa\naaa")
+    b = _write(tmp_path / "b.txt", "b")
+    embed = CountingEmbeddings()
+    _sync(index_dir, embed, [a, b])
+
+    _write(tmp_path / "a.txt", "c")
+    stats = _sync(index_dir, embed, [a, b])
+
+    assert stats.compacted and stats.changed == 1
+    manifest = json.loads((index_dir / MANIFEST_FILE).read_text("utf-8"))
+    assert manifest["generation"] == 1 and manifest["rows"] == 2
+    assert sorted(p.name for p in index_dir.iterdir()) == [
+        LOCK_FILE,
+        "chunks-1.jsonl",
+        "files.json",
+        "offsets-1.i64",
+        "vectors-1.f32",
+    ]
+    store = FileIndex(index_dir, embed, model_id="letters", params="line").store()
+    hits = store.similarity_search("abc", k=5)
+    assert sorted(d.page_content for d in hits) == ["b", "c"]
+    assert sorted(d.id or "" for d in hits) == ["0", "1"]
+
+
+def test_indexes_opened_before_another_sync_extend_its_rows(tmp_path: Path) -> None:
+    index_dir = tmp_path / "index"
+    a = _write(tmp_path / "a.txt", "aa\nab")
+    b = _write(tmp_path / "b.txt", "bb")
+    embed = CountingEmbeddings()
+    first = FileIndex(index_dir, embed, model_id="letters", params="line")
+    second = FileIndex(index_dir, embed, model_id="letters", params="line")
+
+    first.sync([a], by_line)
+    assert second.sync([b], by_line) == SyncStats(added=1, chunks_embedded=1)
+
+    assert _texts(index_dir, embed) == ["aa", "ab", "bb"]
+
+
+def test_sync_waits_for_the_directory_lock(tmp_path: Path) -> None:
+    index_dir = tmp_path / "index"
+    a = _write(tmp_path / "a.txt", "aa")
+    results: list[SyncStats] = []
+    index = FileIndex(index_dir, CountingEmbeddings(), model_id="letters", params="line")
+    worker = threading.Thread(target=lambda: results.append(index.sync([a], by_line)))
+
+    with exclusive_lock(index_dir / LOCK_FILE):
+        worker.start()
+        worker.join(0.2)
+        assert worker.is_alive() and results == []
+    worker.join(5)
+
+    assert results == [SyncStats(added=1, chunks_embedded=1)]
+
+
+def test_sync_store_maps_the_index_before_releasing_the_lock(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    index_dir = tmp_path / "index"
+    a = _write(tmp_path / "a.txt", "aa\nab")
+    b = _write(tmp_path / "b.txt", "bb")
+    index = FileIndex(index_dir, CountingEmbeddings(), model_id="letters", params="line")
+    store_fn = index.store
+    blocked: list[bool] = []
+
+    def take_lock() -> None:
+        with exclusive_lock(index_dir / LOCK_FILE):
+            pass
+
+    waiter = threading.Thread(target=take_lock)
+
+    def store(paths: list[str] | None = None) -> NumpyVectorStore:
+        waiter.start()
+        waiter.join(0.2)
+        blocked.append(waiter.is_alive())
+        return store_fn(paths)
+
+    monkeypatch.setattr(index, "store", store)
+    mapped, stats = index.sync_store([a, b, a], by_line)
+
+    waiter.join(5)
+    assert blocked == [True]
+    assert stats == SyncStats(added=2, chunks_embedded=3)
+    assert sorted(d.page_content for d in mapped.similarity_search("abc", k=10)) == ["aa", "ab", "bb"]
+
+
+def test_interrupted_sync_is_rolled_back(tmp_path: Path) -> None:
+    index_dir = tmp_path / "index"
+    a = _write(tmp_path / "a.txt", "aa\nab")
+    embed = CountingEmbeddings()
+    _sync(index_dir, embed, [a])
+    # Rows appended by a sync that died before replacing the manifest.
+    for name in ("vectors-0.f32", "chunks-0.jsonl", "offsets-0.i64"):
+        with open(index_dir / name, "ab") as fh:
+            fh.write(b"\0" * 24)
+
+    b = _write(tmp_path / "b.txt", "bb")
+    assert _sync(index_dir, embed, [a, b]) == SyncStats(added=1, unchanged=1, chunks_embedded=1)
+    assert _texts(index_dir, embed) == ["aa", "ab", "bb"]
+
+    (index_dir / "vectors-0.f32").write_bytes(b"")  # data lost: rebuild from scratch
+    embed.embedded.clear()
+    assert _sync(index_dir, embed, [a, b]) == SyncStats(added=2, chunks_embedded=3)
+    assert _texts(index_dir, embed) == ["aa", "ab", "bb"]
+    assert not (index_dir / "chunks-0.jsonl").exists()
+
+
+def test_model_or_params_change_starts_a_new_index(tmp_path: Path) -> None:
+    index_dir = tmp_path / "index"
+    a = _write(tmp_path / "a.txt", "aa")
+    embed = CountingEmbeddings()
+    _sync(index_dir, embed, [a])
+
+    other = FileIndex(index_dir, embed, model_id="letters-v2", params="line")
+    assert other.sync([a], by_line) == SyncStats(added=1, chunks_embedded=1)
+    assert FileIndex(index_dir, embed, model_id="letters", params="line").store().similarity_search("a", k=5) == []
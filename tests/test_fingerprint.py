@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+import pytest
+from langchain_core.documents import Document
+
+from rag_bencher.config import BenchConfig
+from rag_bencher.eval.dataset_loader import FileCorpus
+from rag_bencher.pipelines.fingerprint import corpus_fingerprint, pipeline_fingerprint
+
+pytestmark = [pytest.mark.unit, pytest.mark.offline]
+
+
+def _cfg(**overrides: object) -> BenchConfig:
+    data = {
+        "model": {"name": "m"},
+        "retriever": {"k": 4},
+        "data": {"paths": ["a.txt"]},
+        **overrides,
+    }
+    return BenchConfig.model_validate(data)
+
+
+def _fp(cfg: BenchConfig, docs: list[Document], **overrides: object) -> str:
+    kwargs: dict[str, object] = {
+        "pipeline_id": "naive",
+        "prompts": ("Q: {question}",),
+        "llm": {"backend": "offline", "model": "m"},
+        "embedding_model": "emb",
+        **overrides,
+    }
+    return pipeline_fingerprint(cfg, docs, **kwargs)  # type: ignore[arg-type]
+
+
+def test_fingerprint_changes_with_everything_that_shapes_answers() -> None:
+    docs = [Document(page_content="alpha")]
+    base = _fp(_cfg(), docs)
+
+    assert _fp(_cfg(), [Document(page_content="alpha")]) == base
+    assert _fp(_cfg(runtime={"device": "cpu"}), docs) == base
+    assert _fp(_cfg(data={"paths": ["b.txt"]}), docs) == base
+    variants = {
+        _fp(_cfg(retriever={"k": 5}), docs),
+        _fp(_cfg(), [Document(page_content="beta")]),
+        _fp(_cfg(), docs, pipeline_id="hyde"),
+        _fp(_cfg(), docs, prompts=("Question: {question}",)),
+        _fp(_cfg(), docs, llm={"backend": "openai", "model": "m"}),
+        _fp(_cfg(), docs, embedding_model="other"),
+        _fp(_cfg(chunking={"chunk_size": 400, "chunk_overlap": 40}), docs),
+    }
+    assert base not in variants and len(variants) == 7
+
+
+def test_file_corpus_is_fingerprinted_without_reading(tmp_path: Path) -> None:
+    path = tmp_path / "a.txt"
+    path.write_text("alpha", encoding="utf-8")
+    corpus = FileCorpus([str(path)])
+    first = corpus_fingerprint(corpus)
+
+    assert corpus_fingerprint(FileCorpus([str(path)])) == first
+    os.utime(path, ns=(1, 1))
+    assert corpus_fingerprint(corpus) != first
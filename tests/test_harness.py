@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import pytest
+from langchain_core.runnables import RunnableConfig, RunnableLambda
+
+from rag_bencher.eval import harness
+from rag_bencher.pipelines.utils import publish_debug, traced
+
+pytestmark = [pytest.mark.unit, pytest.mark.offline]
+
+
+class SlowPublishingChain:
+    """Finishes later questions first and publishes per-call debug data."""
+
+    def __init__(self) -> None:
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+        self.last_debug: Dict[str, Any] = {}
+
+    def invoke(self, question: str, config: Optional[RunnableConfig] = None) -> str:
+        with self._lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(0.02 * (5 - int(question[1:])) / 5)
+        self.last_debug = {"retrieved": [{"preview": f"ctx-{question}"}]}
+        publish_debug(config, self.last_debug)
+        with self._lock:
+            self.active -= 1
+        return f"answer-{question}"
+
+
+def _examples(n: int) -> list[Dict[str, str]]:
+    return [{"question": f"q{i}", "reference_answer": f"answer q{i}"} for i in range(n)]
+
+
+def test_run_examples_preserves_order_and_debug_under_concurrency() -> None:
+    chain = SlowPublishingChain()
+    results = list(harness.run_examples(chain, lambda: chain.last_debug, _examples(5), concurrency=3))
+    assert [r.example["question"] for r in results] == ["q0", "q1", "q2", "q3", "q4"]
+    for r in results:
+        assert r.answer == f"answer-{r.example['question']}"
+        assert r.debug["retrieved"][0]["preview"] == f"ctx-{r.example['question']}"
+        assert r.seconds >= 0.0
+    assert 1 < chain.peak <= 3
+
+
+def test_run_examples_sequential_falls_back_to_debug_hook() -> None:
+    chain: RunnableLambda[str, str] = RunnableLambda(lambda q: f"echo:{q}")
+    results = list(harness.run_examples(chain, lambda: {"pipeline": "naive"}, _examples(2)))
+    assert [(r.answer, r.debug) for r in results] == [
+        ("echo:q0", {"pipeline": "naive"}),
+        ("echo:q1", {"pipeline": "naive"}),
+    ]
+
+
+def test_run_examples_attach_each_invocations_stage_timings() -> None:
+    chain = RunnableLambda(lambda q: q) | traced(RunnableLambda(lambda q: f"echo:{q}"), "llm")
+    results = list(harness.run_examples(chain, dict, _examples(3), concurrency=2))
+    assert all(set(r.stages) == {"llm"} for r in results)
+    assert all(0.0 <= r.stages["llm"] <= r.seconds for r in results)
+
+
+def test_publish_debug_reaches_context_builder_through_runnable_lambda() -> None:
+    def builder(question: str, config: Optional[RunnableConfig] = None) -> str:
+        publish_debug(config, {"question": question})
+        return question
+
+    chain = {"context": RunnableLambda(builder)} | RunnableLambda(lambda x: x["context"])
+    answer, dbg = harness.invoke_with_debug(chain, lambda: {}, "hello")
+    assert answer == "hello"
+    assert dbg == {"question": "hello"}
+
+
+def test_score_answer_uses_candidates_when_no_retrieved() -> None:
+    dbg = {"candidates": [{"preview": "alpha beta"}]}
+    metrics = harness.score_answer("alpha", "alpha beta", dbg)
+    assert set(metrics) == set(harness.METRIC_KEYS)
+    assert metrics["context_recall"] == pytest.approx(1.0)
+    assert harness.score_answer("alpha", "alpha", {})["context_recall"] == 0.0
+
+
+def test_iter_jsonl_skips_blank_lines(tmp_path: Any) -> None:
+    path = tmp_path / "qa.jsonl"
+    path.write_text('{"question": "a"}\n\n{"question": "b"}\n', encoding="utf-8")
+    assert [ex["question"] for ex in harness.iter_jsonl(str(path))] == ["a", "b"]
+
+
+def test_score_answers_matches_score_answer() -> None:
+    rows = [
+        ("alpha", "alpha beta", {"candidates": [{"preview": "alpha beta"}]}),
+        ("gamma delta", "delta", {"retrieved": [{"preview": "delta"}, {"preview": "epsilon"}]}),
+        ("alpha", "alpha", {}),
+    ]
+    batch = harness.score_answers([a for a, _, _ in rows], [r for _, r, _ in rows], [d for _, _, d in rows])
+    assert set(batch) == set(harness.METRIC_KEYS)
+    for i, (answer, reference, dbg) in enumerate(rows):
+        single = harness.score_answer(answer, reference, dbg)
+        assert {k: float(v[i]) for k, v in batch.items()} == pytest.approx(single)
+
+
+def test_score_results_scores_in_batches_and_keeps_order() -> None:
+    rows = [
+        ("alpha", "alpha beta", {"candidates": [{"preview": "alpha beta", "chunk_id": "c1"}]}, ["c1"]),
+        ("gamma delta", "delta", {"retrieved": [{"preview": "delta"}]}, None),
+        ("alpha", "alpha", {}, None),
+    ]
+    results = [
+        harness.ExampleResult(
+            example={"id": str(i), "reference_answer": ref, **({"gold_chunk_ids": gold} if gold else {})},
+            answer=answer,
+            debug=dbg,
+            seconds=0.0,
+        )
+        for i, (answer, ref, dbg, gold) in enumerate(rows)
+    ]
+
+    scored = list(harness.score_results(iter(results), batch_size=2))
+
+    assert [res for res, _ in scored] == results
+    for res, metrics in scored:
+        expected = harness.score_answer(res.answer, res.example["reference_answer"], res.debug)
+        expected.update(harness.score_retrieval(res.example, res.debug))
+        assert metrics == pytest.approx(expected)
+    assert scored[0][1]["mrr"] == 1.0 and "mrr" not in scored[1][1]
+
+
+def test_score_retrieval_matches_gold_chunk_ids_or_sources() -> None:
+    dbg = {
+        "candidates": [
+            {"chunk_id": "c1", "source": "a.txt"},
+            {"chunk_id": "c2", "source": "b.txt"},
+            {"chunk_id": "c3", "source": "b.txt"},
+        ]
+    }
+    by_chunk = harness.score_retrieval({"gold_chunk_ids": ["c3"]}, dbg)
+    assert set(by_chunk) == set(harness.RETRIEVAL_KEYS)
+    assert by_chunk["mrr"] == pytest.approx(1 / 3)
+    by_source = harness.score_retrieval({"gold_sources": ["b.txt"]}, dbg)
+    assert by_source["mrr"] == pytest.approx(0.5)
+    assert by_source["recall@1"] == 0.0 and by_source["recall@5"] == 1.0
+    assert harness.score_retrieval({"question": "q"}, dbg) == {}
@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import Any, Dict
+
+import pytest
+
+from rag_bencher.utils.lazy import LazyCallable, lazy_import
+
+pytestmark = [pytest.mark.unit, pytest.mark.offline]
+
+# Modules that only the code path choosing them may import.
+HEAVY = (
+    "torch",
+    "transformers",
+    "sentence_transformers",
+    "faiss",
+    "openai",
+    "langchain_openai",
+    "langchain_huggingface",
+    "langchain_text_splitters",
+    "rag_bencher.pipelines.hyde",
+    "rag_bencher.pipelines.multi_query",
+    "rag_bencher.pipelines.naive_rag",
+    "rag_bencher.pipelines.rerank",
+)
+# Generous wall-clock ceiling for importing an entry point; importing every pipeline and SDK took ~1.5s.
+BUDGET_S = 5.0
+
+_PROBE = """
+import json, sys, time
+t = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - t
+# Modules registered by lazy_import stay unexecuted until first use.
+loaded = [m for m in {heavy!r} if m in sys.modules and type(sys.modules[m]).__name__ != "_LazyModule"]
+print(json.dumps({{"elapsed": elapsed, "loaded": loaded}}))
+"""
+
+
+def _probe(module: str) -> Dict[str, Any]:
+    env = dict(os.environ, HF_HUB_OFFLINE="1")
+    out = subprocess.run(
+        [sys.executable, "-c", _PROBE.format(module=module, heavy=HEAVY)],
+        capture_output=True,
+        check=True,
+        env=env,
+        text=True,
+        timeout=120,
+    )
+    return dict(json.loads(out.stdout.strip().splitlines()[-1]))
+
+
+@pytest.mark.parametrize(
+    "module", ["rag_bencher", "rag_bencher.cli", "rag_bencher.bench_cli", "rag_bencher.bench_many_cli"]
+)
+def test_entry_points_import_no_heavy_dependencies(module: str) -> None:
+    result = _probe(module)
+    assert result["loaded"] == []
+    assert result["elapsed"] < BUDGET_S
+
+
+def test_lazy_import_defers_execution_until_first_use() -> None:
+    name = "rag_bencher.pipelines.naive_rag"
+    already_loaded = name in sys.modules
+    module = lazy_import(name)
+    assert sys.modules[name] is module
+    assert callable(module.build_chain)
+    if not already_loaded:
+        assert type(module).__name__ != "_LazyModule"
+
+
+def test_lazy_import_rejects_unknown_module() -> None:
+    with pytest.raises(ModuleNotFoundError):
+        lazy_import("rag_bencher.no_such_module")
+
+
+def test_lazy_callable_resolves_on_call() -> None:
+    now = LazyCallable("time", "monotonic")
+    assert now.resolve() is time.monotonic
+    assert isinstance(now(), float)
+    assert repr(now) == "<lazy time.monotonic>"
@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+from typing import Any
+
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from rag_bencher.utils import chunking
+from rag_bencher.utils.ingest import IngestStats, StageStats, ingest
+
+pytestmark = [pytest.mark.unit, pytest.mark.offline]
+
+
+class LengthEmbeddings(Embeddings):
+    def __init__(self) -> None:
+        self.batches: list[list[str]] = []
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        self.batches.append(list(texts))
+        return [[float(len(t)), 1.0] for t in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return [float(len(text)), 1.0]
+
+
+def by_word(docs: list[Document]) -> list[Document]:
+    return [Document(page_content=w, metadata=d.metadata) for d in docs for w in d.page_content.split()]
+
+
+def _batches(n: int, size: int) -> list[list[Document]]:
+    docs = [Document(page_content=f"w{i} x{i}", metadata={"n": i}) for i in range(n)]
+    return [docs[i : i + size] for i in range(0, n, size)]
+
+
+def _run(batches: Any, split: Any, **kwargs: Any) -> tuple[list[Document], list[Any], IngestStats]:
+    chunks: list[Document] = []
+    blocks: list[Any] = []
+
+    def sink(got: list[Document], vectors: Any) -> None:
+        chunks.extend(got)
+        blocks.append(vectors)
+
+    stats = ingest(batches, split, kwargs.pop("embeddings", LengthEmbeddings()), sink, **kwargs)
+    return chunks, blocks, stats
+
+
+def test_stages_keep_order_and_embed_in_fixed_batches() -> None:
+    embed = LengthEmbeddings()
+    chunks, blocks, stats = _run(_batches(7, 2), by_word, embeddings=embed, embed_batch_size=3, chunk_workers=0)
+
+    assert [c.page_content for c in chunks] == [w for i in range(7) for w in (f"w{i}", f"x{i}")]
+    assert [len(b) for b in embed.batches] == [3, 3, 3, 3, 2]
+    assert np.concatenate(blocks).shape == (14, 2) and blocks[0].dtype == np.float32
+    assert [(s.name, s.items) for s in stats.stages] == [("load", 7), ("chunk", 14), ("embed", 14), ("store", 14)]
+    report = stats.as_dict()
+    assert set(report["stages"]) == {"load", "chunk", "embed", "store"} and report["wall_seconds"] >= 0
+
+
+def test_process_pool_chunking_matches_inline() -> None:
+    splitter = RecursiveCharacterTextSplitter(chunk_size=4, chunk_overlap=0)
+    inline, _, _ = _run(_batches(6, 2), splitter.split_documents, chunk_workers=0)
+    pooled, _, stats = _run(_batches(6, 2), splitter.split_documents, chunk_workers=2)
+
+    assert [c.page_content for c in pooled] == [c.page_content for c in inline]
+    assert stats.stage("chunk").workers == 2 and stats.stage("chunk").items == len(inline)
+
+
+def test_single_batch_is_chunked_without_worker_processes(monkeypatch: pytest.MonkeyPatch) -> None:
+    def no_pool(*args: Any, **kwargs: Any) -> Any:
+        raise AssertionError("process pool started for a single batch")
+
+    monkeypatch.setattr(chunking, "ProcessPoolExecutor", no_pool)
+    chunks, _, _ = _run(_batches(3, 5), by_word, chunk_workers=4)
+    assert len(chunks) == 6
+    assert _run([], by_word, chunk_workers=4)[0] == []
+
+
+def test_stage_errors_reach_the_caller() -> None:
+    def failing_batches() -> Any:
+        yield _batches(1, 1)[0]
+        raise OSError("disk gone")
+
+    with pytest.raises(OSError, match="disk gone"):
+        _run(failing_batches(), by_word, chunk_workers=0)
+
+    def bad_split(docs: list[Document]) -> list[Document]:
+        raise ValueError("cannot split")
+
+    with pytest.raises(ValueError, match="cannot split"):
+        _run(_batches(4, 1), bad_split, chunk_workers=0)
+
+    def bad_sink(chunks: list[Document], vectors: Any) -> None:
+        raise RuntimeError("full")
+
+    # The producers are still feeding bounded queues when the consumer fails; they must stop.
+    with pytest.raises(RuntimeError, match="full"):
+        ingest(
+            _batches(50, 1), by_word, LengthEmbeddings(), bad_sink, embed_batch_size=1, queue_size=1, chunk_workers=0
+        )
+
+
+def test_stage_throughput() -> None:
+    assert StageStats("chunk", workers=2, items=10, seconds=4.0).per_second == 5.0
+    assert StageStats("load").per_second == 0.0
+    with pytest.raises(ValueError):
+        ingest([], by_word, LengthEmbeddings(), lambda c, v: None, embed_batch_size=0)
@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, List, Optional
+
+import pytest
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.globals import get_llm_cache
+from langchain_core.language_models.fake import FakeListLLM
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.messages import BaseMessage
+
+from rag_bencher.utils import cache
+from rag_bencher.utils.callbacks.usage import UsageTracker
+from rag_bencher.utils.llm_cache import DISABLE_ENV, PersistentLLMCache, llm_cache
+
+pytestmark = [pytest.mark.unit, pytest.mark.offline]
+
+
+@pytest.fixture(autouse=True)
+def _cache_dir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(cache, "D", tmp_path, raising=False)
+    monkeypatch.delenv(DISABLE_ENV, raising=False)
+
+
+CALLS: List[str] = []
+
+
+class CountingChat(FakeListChatModel):
+    def _call(self, *args: Any, **kwargs: Any) -> str:
+        messages: List[BaseMessage] = args[0]
+        CALLS.append(str(messages[-1].content))
+        return super()._call(*args, **kwargs)
+
+
+class CountingLLM(FakeListLLM):
+    def _call(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> str:
+        CALLS.append(prompt)
+        return super()._call(prompt, stop, run_manager, **kwargs)
+
+
+def test_chat_calls_are_served_from_the_persistent_cache() -> None:
+    CALLS.clear()
+    with llm_cache() as active:
+        assert isinstance(active, PersistentLLMCache)
+        chat = CountingChat(responses=["first", "second"])
+        assert chat.invoke("expand: what is rag?").content == "first"
+        assert chat.invoke("expand: what is rag?").content == "first"
+        assert chat.invoke("expand: other").content == "second"
+        # A second config with the same model settings reuses the call.
+        assert CountingChat(responses=["first", "second"]).invoke("expand: what is rag?").content == "first"
+        CountingChat(responses=["first", "second"]).invoke("expand: what is rag?", stop=["###"])
+    assert get_llm_cache() is None
+    assert CALLS == ["expand: what is rag?", "expand: other", "expand: what is rag?"]
+
+
+def test_text_llm_generations_round_trip() -> None:
+    CALLS.clear()
+    with llm_cache():
+        assert CountingLLM(responses=["draft"]).invoke("hyde: q") == "draft"
+        assert CountingLLM(responses=["draft"]).invoke("hyde: q") == "draft"
+    assert CALLS == ["hyde: q"]
+
+    PersistentLLMCache().clear()
+    with llm_cache():
+        CountingLLM(responses=["draft"]).invoke("hyde: q")
+    assert CALLS == ["hyde: q", "hyde: q"]
+
+
+def test_cache_can_be_disabled(monkeypatch: pytest.MonkeyPatch) -> None:
+    with llm_cache(enabled=False) as active:
+        assert active is None and get_llm_cache() is None
+    monkeypatch.setenv(DISABLE_ENV, "1")
+    with llm_cache() as active:
+        assert active is None and get_llm_cache() is None
+
+
+def test_usage_tracker_does_not_bill_cache_hits() -> None:
+    tracker = UsageTracker(cost_per_1k_input=1.0, cost_per_1k_output=1.0, pricing={})
+    chat = CountingChat(responses=["four five"])
+    with llm_cache():
+        chat.invoke("one two three", config={"callbacks": [tracker]})
+        first = tracker.summary()
+        chat.invoke("one two three", config={"callbacks": [tracker]})
+    second = tracker.summary()
+    assert first["calls"] == 1 and first["cached_calls"] == 0 and first["input_tokens"] > 0
+    assert second["calls"] == 2 and second["cached_calls"] == 1
+    assert second["input_tokens"] == first["input_tokens"]
+    assert second["cost_usd"] == first["cost_usd"]
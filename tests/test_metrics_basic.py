@@ -1,6 +1,18 @@
+import math
+
 import pytest
 
-from rag_bencher.eval.metrics import bow_cosine, context_recall, lexical_f1
+from rag_bencher.eval.metrics import (
+    Vocabulary,
+    _tok,
+    bow_cosine,
+    bow_cosine_batch,
+    context_recall,
+    context_recall_batch,
+    lexical_f1,
+    lexical_f1_batch,
+    retrieval_scores,
+)
 
 pytestmark = pytest.mark.unit
 
@@ -24,3 +36,55 @@ def test_metrics_handle_empty_inputs() -> None:
     assert bow_cosine("", "reference answer") == 0.0
     assert bow_cosine("prediction", "") == 0.0
     assert context_recall("", "") == 0.0
+
+
+def test_tokenizer_matches_per_character_normalization() -> None:
+    def reference(s: str) -> list[str]:
+        return "".join(ch.lower() if ch.isalnum() else " " for ch in s).split()
+
+    for text in ["Hello, World_x! 42", "ΟΔΟΣ İstanbul straße", "a\x00b\tc", "", "..."]:
+        assert list(_tok(text)) == reference(text)
+
+
+def test_batch_metrics_match_pairwise_functions() -> None:
+    preds = ["LangChain is a framework for LLM apps", "", "alpha alpha beta", "ΟΔΟΣ one", "x\x00y"]
+    refs = ["LangChain framework for language model applications", "ref", "alpha beta beta", "οδοσ two", "x y"]
+    vocab = Vocabulary()
+    p, r = vocab.bags(preds), vocab.bags(refs)
+
+    assert lexical_f1_batch(p, r) == pytest.approx([lexical_f1(a, b) for a, b in zip(preds, refs, strict=True)])
+    assert bow_cosine_batch(p, r) == pytest.approx([bow_cosine(a, b) for a, b in zip(preds, refs, strict=True)])
+    assert context_recall_batch(p, r) == pytest.approx([context_recall(a, b) for a, b in zip(preds, refs, strict=True)])
+
+
+def test_batch_metrics_without_shared_tokens_are_zero() -> None:
+    vocab = Vocabulary()
+    p, r = vocab.bags(["alpha", ""]), vocab.bags(["beta", "gamma"])
+
+    assert lexical_f1_batch(p, r).tolist() == [0.0, 0.0]
+    assert bow_cosine_batch(p, r).tolist() == [0.0, 0.0]
+    assert context_recall_batch(p, r).tolist() == [0.0, 0.0]
+
+
+def test_bags_from_separate_batches_share_ids() -> None:
+    vocab = Vocabulary()
+    first = vocab.bags(["alpha beta"])
+    second = vocab.bags(["beta gamma"])
+    assert context_recall_batch(first, second).tolist() == [0.5]
+    with pytest.raises(ValueError):
+        lexical_f1_batch(first, vocab.bags(["a", "b"]))
+
+
+def test_retrieval_scores_rank_gold_ids() -> None:
+    scores = retrieval_scores(
+        [["a", "b", "c"], ["x", "a", "a", "b"], [], ["q"]],
+        [{"b"}, {"a", "b", "z"}, {"a"}, set()],
+    )
+    assert scores["recall@1"].tolist() == [0.0, 0.0, 0.0, 0.0]
+    assert scores["recall@5"] == pytest.approx([1.0, 2 / 3, 0.0, 0.0])
+    assert scores["mrr"] == pytest.approx([0.5, 0.5, 0.0, 0.0])
+    # The repeated "a" is credited once; three gold ids make the ideal ranking three hits deep.
+    ideal = 1 + 1 / math.log2(3) + 1 / math.log2(4)
+    assert scores["ndcg@10"] == pytest.approx([1 / math.log2(3), (1 / math.log2(3) + 1 / math.log2(5)) / ideal, 0, 0])
+    with pytest.raises(ValueError):
+        retrieval_scores([["a"]], [])
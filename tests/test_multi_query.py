@@ -1,4 +1,9 @@
+from types import SimpleNamespace
+from typing import Any, List, cast
+
 import pytest
+from langchain_core.documents import Document
+from langchain_core.runnables import RunnableLambda, RunnableSerializable
 
 from rag_bencher.eval.dataset_loader import load_texts_as_documents
 from rag_bencher.pipelines import multi_query
@@ -39,3 +44,43 @@ def test_dedupe_queries_preserves_order() -> None:
     generated = ["gamma", "alpha", "gamma", "beta"]
     result = multi_query._dedupe_queries("alpha", generated, 4)
     assert result == ["alpha", "gamma", "beta"]
+
+
+def test_fuse_ranks_chunks_hit_by_several_queries_first() -> None:
+    a, b, c = (Document(page_content=t, metadata={"chunk_id": t}) for t in "abc")
+    fused = multi_query._fuse([[a, b], [c, b], [b]])
+    assert [d.page_content for d, _ in fused] == ["b", "a", "c"]
+    assert fused[0][1] == pytest.approx(1 / 62 + 1 / 62 + 1 / 61)
+    # Identical text in different chunks is kept apart.
+    twin = Document(page_content="a", metadata={"chunk_id": "a2"})
+    assert len(multi_query._fuse([[a], [twin]])) == 2
+
+
+def test_multi_query_batches_search_and_caps_context(monkeypatch: pytest.MonkeyPatch) -> None:
+    chunks = [Document(page_content=f"chunk-{i}", metadata={"chunk_id": str(i)}) for i in range(6)]
+    searches: List[List[List[float]]] = []
+    embedded: List[List[str]] = []
+
+    def fake_search(store: Any, vectors: List[List[float]], k: int) -> List[List[Document]]:
+        searches.append(vectors)
+        return [chunks[int(v[0]) : int(v[0]) + k] for v in vectors]
+
+    def fake_embed(embeddings: Any, texts: List[str]) -> List[List[float]]:
+        embedded.append(texts)
+        return [[float(i)] for i in range(len(texts))]
+
+    monkeypatch.setattr(
+        multi_query, "get_corpus_index", lambda *a, **k: SimpleNamespace(vectorstore=None, embeddings=None)
+    )
+    monkeypatch.setattr(multi_query, "batch_similarity_search", fake_search)
+    monkeypatch.setattr(multi_query, "embed_queries", fake_embed)
+    monkeypatch.setattr(multi_query, "has_openai_key", lambda: False)
+    llm = cast(RunnableSerializable[Any, Any], RunnableLambda(lambda prompt: "ok"))
+    chain, debug = multi_query.build_chain([], k=3, n_queries=3, llm=llm, embeddings=cast(Any, object()), context_k=2)
+
+    chain.invoke("question")
+
+    assert len(embedded) == 1 and len(embedded[0]) == 3
+    assert searches == [[[0.0], [1.0], [2.0]]]
+    # chunk-1 and chunk-2 are hit by three and two queries respectively.
+    assert [r["preview"] for r in debug()["retrieved"]] == ["chunk-2", "chunk-1"]
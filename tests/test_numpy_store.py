@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from rag_bencher.vector import numpy_store
+from rag_bencher.vector.numpy_store import ChunkFile, NumpyVectorStore, normalize_rows, read_manifest
+
+pytestmark = [pytest.mark.unit, pytest.mark.offline]
+
+
+class LetterEmbeddings(Embeddings):
+    """Counts of a, b and c; deterministic and easy to reason about."""
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [[float(t.count("a")), float(t.count("b")), float(t.count("c"))] for t in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_documents([text])[0]
+
+
+TEXTS = ["aaa", "bbb", "ab", "abc", "cc", "a"]
+
+
+def _store() -> NumpyVectorStore:
+    metas = [{"source": f"s{i}"} for i in range(len(TEXTS))]
+    return NumpyVectorStore.from_texts(TEXTS, LetterEmbeddings(), metadatas=metas)
+
+
+def test_search_returns_exact_cosine_ranking() -> None:
+    store = _store()
+    hits = store.similarity_search_with_score("aab", k=3)
+    q = normalize_rows([2.0, 1.0, 0.0])[0]
+    expected = sorted(range(len(TEXTS)), key=lambda i: -float(normalize_rows(store.vectors[i])[0] @ q))[:3]
+    assert [d.page_content for d, _ in hits] == [TEXTS[i] for i in expected]
+    assert hits[0][0].id == str(expected[0]) and hits[0][0].metadata == {"source": f"s{expected[0]}"}
+    assert hits[0][1] == pytest.approx(float(store.vectors[expected[0]] @ q))
+    assert len(store.similarity_search("zzz", k=10)) == len(TEXTS)
+
+
+def test_blocked_batch_search_matches_full_matmul(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    rng = np.random.default_rng(0)
+    vectors = normalize_rows(rng.normal(size=(50, 8)))
+    chunks = [Document(id=str(i), page_content=f"c{i}") for i in range(50)]
+    store = NumpyVectorStore(LetterEmbeddings(), vectors, chunks)
+    queries = rng.normal(size=(4, 8))
+    scores = normalize_rows(queries) @ vectors.T
+    expected = [np.argsort(-row, kind="stable")[:5].tolist() for row in scores]
+
+    monkeypatch.setattr(numpy_store, "SEARCH_BLOCK_ELEMENTS", 4 * 7)  # 7 rows per block
+    hits = store.search_matrix(queries, 5)
+    assert [[i for i, _ in row] for row in hits] == expected
+    assert hits[0][0][1] == pytest.approx(float(scores[0, expected[0][0]]), rel=1e-5)
+    assert [len(row) for row in store.search_matrix(queries[:1], 80)] == [50]
+
+    store.save(tmp_path / "f16", model_id="m", corpus_hash="h", dtype="float16")
+    mapped = NumpyVectorStore.load(tmp_path / "f16", LetterEmbeddings())
+    assert [[i for i, _ in row] for row in mapped.search_matrix(queries, 3)] == [row[:3] for row in expected]
+
+
+def test_save_and_load_round_trip_is_memory_mapped(tmp_path: Path) -> None:
+    store = _store()
+    target = store.save(tmp_path / "idx", model_id="letters", corpus_hash="abc123")
+
+    manifest = read_manifest(target)
+    assert manifest is not None
+    assert (manifest["model"], manifest["corpus"], manifest["count"], manifest["dim"]) == ("letters", "abc123", 6, 3)
+
+    loaded = NumpyVectorStore.load(target, LetterEmbeddings())
+    assert isinstance(loaded.vectors, np.memmap)
+    assert isinstance(loaded.chunks, ChunkFile) and len(loaded.chunks) == len(TEXTS)
+    assert [d.page_content for d in loaded.chunks[::2]] == TEXTS[::2]
+    assert loaded.chunks[-1].metadata == {"source": "s5"}
+    assert loaded.similarity_search("abc", k=4) == store.similarity_search("abc", k=4)
+    assert loaded.vectors_for(loaded.similarity_search("c", k=1)) == [[0.0, 0.0, 1.0]]
+    with pytest.raises(IndexError):
+        loaded.chunks[len(TEXTS)]
+
+
+def test_float16_index_and_existing_target(tmp_path: Path) -> None:
+    target = tmp_path / "idx"
+    _store().save(target, model_id="letters", corpus_hash="one", dtype="float16")
+    NumpyVectorStore.from_texts(["b"], LetterEmbeddings()).save(target, model_id="letters", corpus_hash="one")
+
+    manifest = json.loads((target / "manifest.json").read_text("utf-8"))
+    assert (manifest["dtype"], manifest["corpus"]) == ("float16", "one")
+    assert not list(tmp_path.glob("idx.tmp-*"))
+    loaded = NumpyVectorStore.load(target, LetterEmbeddings())
+    assert loaded.vectors.dtype == np.float16
+    assert loaded.similarity_search("bb", k=1)[0].page_content == "bbb"
+    with pytest.raises(ValueError, match="Unsupported index dtype"):
+        _store().save(tmp_path / "other", model_id="m", corpus_hash="c", dtype="int8")
+
+
+def test_save_replaces_stale_or_partial_target(tmp_path: Path) -> None:
+    target = tmp_path / "idx"
+    target.mkdir()
+    (target / "vectors.npy").write_bytes(b"partial")  # no manifest: an interrupted write
+    _store().save(target, model_id="letters", corpus_hash="one")
+    assert (read_manifest(target) or {}).get("corpus") == "one"
+
+    NumpyVectorStore.from_texts(["b"], LetterEmbeddings()).save(target, model_id="letters", corpus_hash="two")
+
+    manifest = read_manifest(target)
+    assert manifest is not None and (manifest["corpus"], manifest["count"]) == ("two", 1)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["idx"]
+    assert NumpyVectorStore.load(target, LetterEmbeddings()).similarity_search("b", k=1)[0].page_content == "b"
+
+
+def test_empty_and_missing_indexes(tmp_path: Path) -> None:
+    empty = NumpyVectorStore.from_texts([], LetterEmbeddings())
+    assert empty.similarity_search("a") == []
+    loaded = NumpyVectorStore.load(empty.save(tmp_path / "empty", model_id="m", corpus_hash="c"), LetterEmbeddings())
+    assert len(loaded) == 0 and loaded.similarity_search("a") == []
+    assert read_manifest(tmp_path / "missing") is None
+    with pytest.raises(FileNotFoundError):
+        NumpyVectorStore.load(tmp_path / "missing", LetterEmbeddings())
+
+
+def test_add_texts_appends_rows() -> None:
+    store = _store()
+    ids = store.add_texts(["cccc"], [{"source": "new"}])
+    assert ids == [str(len(TEXTS))]
+    assert store.similarity_search("c", k=1)[0] == Document(id=ids[0], page_content="cccc", metadata={"source": "new"})
+    assert store.vectors_for([Document(page_content="x")]) is None
+
+
+def test_live_mask_hides_retired_rows() -> None:
+    vectors = normalize_rows(LetterEmbeddings().embed_documents(TEXTS))
+    chunks = [Document(page_content=t) for t in TEXTS]
+    live = np.array([t != "aaa" for t in TEXTS])
+    store = NumpyVectorStore(LetterEmbeddings(), vectors, chunks, live=live)
+
+    hits = store.similarity_search("a", k=len(TEXTS))
+    assert "aaa" not in [d.page_content for d in hits]
+    assert len(hits) == len(TEXTS) - 1
+    assert [d.page_content for d in store.live_chunks] == [t for t in TEXTS if t != "aaa"]
+    store.add_texts(["aaaa"])
+    assert store.similarity_search("a", k=1)[0].page_content == "aaaa"
+    with pytest.raises(ValueError):
+        NumpyVectorStore(LetterEmbeddings(), vectors, chunks, live=live[:2])
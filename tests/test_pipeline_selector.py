@@ -1,13 +1,15 @@
 from __future__ import annotations
 
+from types import SimpleNamespace
 from typing import Any, Dict, List, cast
 
 import pytest
 from langchain_core.documents import Document
 
 from rag_bencher.config import load_config
-from rag_bencher.pipelines import hyde, multi_query, naive_rag, rerank
+from rag_bencher.pipelines import corpus, hyde, multi_query, naive_rag, rerank, selector
 from rag_bencher.pipelines.selector import PipelineSelection, select_pipeline
+from rag_bencher.vector.faiss_ann import AnnSpec
 
 
 class DummyChain:
@@ -49,6 +51,8 @@ def test_select_pipeline_defaults_to_naive(monkeypatch: pytest.MonkeyPatch) -> N
     assert selected_chain is chain
     assert selection.debug() == {"pipeline": "naive"}
     assert store["kwargs"]["model"] == bench_cfg.model.name
+    assert (store["kwargs"]["chunk_size"], store["kwargs"]["chunk_overlap"]) == (800, 120)
+    assert store["kwargs"]["chunk_tokenizer"] is None
 
 
 @pytest.mark.unit
@@ -154,3 +158,43 @@ def test_select_pipeline_builds_provider_adapters(monkeypatch: pytest.MonkeyPatc
     selected_chain = cast(DummyChain, selection.chain)
     assert selected_chain is chain
     assert selection.debug() == {"pipeline": "naive"}
+
+
+@pytest.mark.unit
+def test_select_pipeline_passes_faiss_index_spec(monkeypatch: pytest.MonkeyPatch) -> None:
+    bench_cfg = load_config("configs/wiki.yaml").model_copy(update={"vector": {"name": "faiss", "index": "ivf_flat"}})
+    store: Dict[str, Any] = {}
+    make_stub_builder("naive", store)
+    monkeypatch.setattr(naive_rag, "build_chain", store["builder"])
+
+    select_pipeline("configs/wiki.yaml", docs=[Document(page_content="a")], cfg=bench_cfg)
+
+    assert store["kwargs"]["index_spec"] == AnnSpec(kind="ivf_flat")
+    assert store["kwargs"]["index_spec"].nprobe == 16
+
+
+@pytest.mark.unit
+def test_multi_query_selection_prefetches_planned_queries(monkeypatch: pytest.MonkeyPatch) -> None:
+    prefetched: List[Any] = []
+    index = SimpleNamespace(key=SimpleNamespace(embedding_model="m"), embeddings="cached-embeddings")
+
+    def builder(docs: List[Document], **kwargs: Any) -> tuple[DummyChain, Any]:
+        with corpus.recording_indexes() as inner:  # nesting must not leak into the selector's recording
+            pass
+        assert inner == []
+        corpus._RECORDING.indexes.extend([index, index])
+        return DummyChain("mq"), (lambda: {})
+
+    def fake_prefetch(embeddings: Any, texts: List[str], batch_size: int) -> int:
+        prefetched.append((embeddings, texts))
+        return len(texts)
+
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    monkeypatch.setattr(multi_query, "build_chain", builder)
+    monkeypatch.setattr(selector, "prefetch_queries", fake_prefetch)
+
+    selection = select_pipeline("configs/multi_query.yaml", docs=[])
+
+    assert selection.query_texts("Q?") == multi_query._fallback_queries("Q?", 3)
+    assert selection.prefetch_queries(["Q?", "Q?"]) == 3
+    assert prefetched == [("cached-embeddings", multi_query._fallback_queries("Q?", 3))]
@@ -9,7 +9,11 @@ from langchain_core.retrievers import BaseRetriever
 from langchain_core.runnables import RunnableLambda, RunnableSerializable
 
 from rag_bencher.pipelines import base as pipelines_base
-from rag_bencher.pipelines import hyde, multi_query, naive_rag, rerank
+from rag_bencher.pipelines import corpus, hyde, multi_query, naive_rag, rerank
+from rag_bencher.pipelines.selector import PipelineSelection
+from rag_bencher.pipelines.utils import debug_config
+from rag_bencher.utils import chunking
+from rag_bencher.utils.tracing import StageTrace
 
 pytestmark = [pytest.mark.unit, pytest.mark.offline]
 
@@ -17,11 +21,16 @@ pytestmark = [pytest.mark.unit, pytest.mark.offline]
 class FakeEmbeddings:
     def __init__(self) -> None:
         self.seen: list[str] = []
+        self.batches: list[list[str]] = []
 
     def embed_query(self, text: str) -> List[float]:
         self.seen.append(text)
         return [float(len(text) or 1.0), 1.0]
 
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.batches.append(list(texts))
+        return [[float(len(t) or 1.0), 1.0] for t in texts]
+
 
 class FakeVectorStore:
     def __init__(self, docs: list[Document]) -> None:
@@ -32,6 +41,15 @@ class FakeVectorStore:
         self.queries.append((query, k))
         return self.docs[:k]
 
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4) -> list[Document]:
+        self.queries.append((f"vector:{embedding}", k))
+        return self.docs[:k]
+
+    def similarity_search_with_score_by_vector(
+        self, embedding: List[float], k: int = 4
+    ) -> list[tuple[Document, float]]:
+        return [(d, 1.0 / (i + 1)) for i, d in enumerate(self.similarity_search_by_vector(embedding, k))]
+
     def as_retriever(self, search_kwargs: dict[str, Any] | None = None) -> RunnableLambda[Any, list[Document]]:
         limit = (search_kwargs or {}).get("k", len(self.docs))
         return RunnableLambda(lambda _: self.docs[:limit])
@@ -69,9 +87,11 @@ def _patch_common_builders(module: Any, monkeypatch: pytest.MonkeyPatch) -> None
         def split_documents(self, docs: list[Document]) -> list[Document]:
             return docs
 
-    monkeypatch.setattr(module, "RecursiveCharacterTextSplitter", lambda *args, **kwargs: DummySplitter())
+    monkeypatch.setattr(chunking, "RecursiveCharacterTextSplitter", lambda *args, **kwargs: DummySplitter())
     monkeypatch.setattr(module, "make_hf_embeddings", lambda **kwargs: FakeEmbeddings())
-    monkeypatch.setattr(module, "build_local_vectorstore", lambda docs, embed: FakeVectorStore(list(docs)))
+    monkeypatch.setattr(
+        corpus, "build_local_vectorstore", lambda docs, embed, vectors=None: FakeVectorStore(list(docs))
+    )
     monkeypatch.setattr(
         module,
         "resolve_chat_llm",
@@ -152,9 +172,12 @@ def test_naive_rag_chain_accepts_custom_retriever(monkeypatch: pytest.MonkeyPatc
         retriever=retriever,
         llm=override_llm,
     )
-    out = chain.invoke("Alpha?")
+    sink: dict[str, Any] = {}
+    out = chain.invoke("Alpha?", config=debug_config(sink))
     assert "Question" in out
     assert meta() == {"pipeline": "naive_rag"}
+    assert [r["preview"] for r in sink["retrieved"]] == [d.page_content for d in docs]
+    assert all("chunk_id" in r and "score" not in r for r in sink["retrieved"])
 
 
 def test_naive_rag_chain_builds_vector_store(monkeypatch: pytest.MonkeyPatch, docs: list[Document]) -> None:
@@ -164,6 +187,30 @@ def test_naive_rag_chain_builds_vector_store(monkeypatch: pytest.MonkeyPatch, do
     assert result.startswith("LLM:")
 
 
+@pytest.mark.parametrize("module", [naive_rag, hyde])
+def test_query_is_embedded_once_then_searched_by_vector(
+    module: Any, monkeypatch: pytest.MonkeyPatch, docs: list[Document]
+) -> None:
+    _patch_common_builders(module, monkeypatch)
+    if hasattr(module, "has_openai_key"):
+        monkeypatch.setattr(module, "has_openai_key", lambda: False)
+    stores: list[FakeVectorStore] = []
+
+    def build_store(splits: list[Document], embed: Any, vectors: Any = None) -> FakeVectorStore:
+        stores.append(FakeVectorStore(list(splits)))
+        return stores[-1]
+
+    monkeypatch.setattr(corpus, "build_local_vectorstore", build_store)
+    embed = FakeEmbeddings()
+    chain, _ = module.build_chain(docs, k=1, embeddings=cast(Any, embed))
+
+    chain.invoke("alpha?")
+
+    query = "alpha?" if module is naive_rag else hyde._fallback_hypothesis("alpha?")
+    assert embed.seen == [query]
+    assert [s.queries for s in stores] == [[(f"vector:{embed.embed_query(query)}", 1)]]
+
+
 def test_rerank_chain_produces_debug(monkeypatch: pytest.MonkeyPatch, docs: list[Document]) -> None:
     _patch_common_builders(rerank, monkeypatch)
     chain, debug = rerank.build_chain(docs, k=2, rerank_top_k=1)
@@ -173,11 +220,101 @@ def test_rerank_chain_produces_debug(monkeypatch: pytest.MonkeyPatch, docs: list
     assert info["candidates"]
 
 
-def test_cosine_handles_zero_vectors() -> None:
-    assert rerank._cosine([0.0, 0.0], [1.0, 2.0]) == 0.0
-    assert rerank._cosine([1.0, 0.0], [1.0, 0.0]) == pytest.approx(1.0)
+def test_rerank_embeds_query_once_and_candidates_in_one_batch(
+    monkeypatch: pytest.MonkeyPatch, docs: list[Document]
+) -> None:
+    _patch_common_builders(rerank, monkeypatch)
+    embed = FakeEmbeddings()
+    chain, debug = rerank.build_chain(docs, k=2, rerank_top_k=1, embeddings=cast(Any, embed))
+    assert embed.batches == [[d.page_content for d in docs]]  # the corpus, embedded while indexing
+    embed.batches.clear()
+    chain.invoke("alpha")
+    assert embed.seen == ["alpha"]
+    assert embed.batches == [[d.page_content for d in docs[:2]]]
+    scores = [c["score"] for c in debug()["candidates"]]
+    assert scores == sorted(scores, reverse=True)
+
+
+def test_cosine_scores_match_pairwise_cosine() -> None:
+    matrix = [[1.0, 0.0], [0.0, 0.0], [1.0, 1.0]]
+    scores = rerank._cosine_scores([2.0, 0.0], matrix)
+    assert scores.tolist() == pytest.approx([1.0, 0.0, 2**-0.5])
+
+
+def test_cosine_scores_handle_zero_vectors() -> None:
+    assert rerank._cosine_scores([0.0, 0.0], [[1.0, 2.0]]).tolist() == [0.0]
+    assert rerank._cosine_scores([1.0, 0.0], [1.0, 0.0]).tolist() == pytest.approx([1.0])
 
 
 def test_rag_pipeline_is_abstract() -> None:
     with pytest.raises(TypeError):
         cast(type[Any], pipelines_base.RagPipeline)()
+
+
+@pytest.mark.parametrize("module", [naive_rag, hyde, multi_query, rerank])
+def test_retrieval_stage_runs_without_generation(
+    module: Any, monkeypatch: pytest.MonkeyPatch, docs: list[Document]
+) -> None:
+    _patch_common_builders(module, monkeypatch)
+    if hasattr(module, "has_openai_key"):
+        monkeypatch.setattr(module, "has_openai_key", lambda: False)
+
+    def no_generation(*args: Any, **kwargs: Any) -> Any:
+        pytest.fail("the answer LLM was called")
+
+    monkeypatch.setattr(module, "resolve_chat_llm", lambda *args, **kwargs: RunnableLambda(no_generation))
+    chain, debug = module.build_chain(docs, k=2)
+    selection = PipelineSelection(pipeline_id="p", config=cast(Any, None), chain=chain, debug=debug)
+
+    payloads = selection.retrieve(["alpha?", "beta?", "gamma?"], concurrency=2)
+
+    assert len(payloads) == 3
+    for payload in payloads:
+        ranked = payload.get("retrieved") or payload["candidates"]
+        assert ranked and all("chunk_id" in r for r in ranked)
+        assert all(isinstance(r["score"], float) for r in ranked)
+
+
+@pytest.mark.parametrize(
+    ("module", "stages"),
+    [
+        (naive_rag, {"embedding", "vector_search", "prompt", "llm"}),
+        (hyde, {"query_generation", "embedding", "vector_search", "prompt", "llm"}),
+        (multi_query, {"query_generation", "embedding", "vector_search", "prompt", "llm"}),
+        (rerank, {"embedding", "vector_search", "rerank", "prompt", "llm"}),
+    ],
+)
+def test_invocation_records_stage_timings(
+    module: Any, stages: set[str], monkeypatch: pytest.MonkeyPatch, docs: list[Document]
+) -> None:
+    _patch_common_builders(module, monkeypatch)
+    if hasattr(module, "has_openai_key"):
+        monkeypatch.setattr(module, "has_openai_key", lambda: False)
+    chain, _ = module.build_chain(docs, k=2)
+    trace = StageTrace()
+
+    chain.invoke("alpha?", config=debug_config({}, trace))
+
+    seconds = trace.seconds()
+    assert set(seconds) == stages
+    assert all(v >= 0.0 for v in seconds.values())
+
+
+def test_retrieve_records_one_trace_per_question(monkeypatch: pytest.MonkeyPatch, docs: list[Document]) -> None:
+    _patch_common_builders(rerank, monkeypatch)
+    chain, debug = rerank.build_chain(docs, k=2)
+    selection = PipelineSelection(pipeline_id="p", config=cast(Any, None), chain=chain, debug=debug)
+    traces = [StageTrace(), StageTrace()]
+
+    selection.retrieve(["alpha?", "beta?"], traces, concurrency=2)
+
+    assert [set(t.seconds()) for t in traces] == [{"embedding", "vector_search", "rerank"}] * 2
+    with pytest.raises(ValueError, match="traces"):
+        selection.retrieve(["alpha?"], traces)
+
+
+def test_retrieve_rejects_chains_without_context_stage() -> None:
+    chain = cast(Any, RunnableLambda(lambda q: q))
+    selection = PipelineSelection(pipeline_id="custom", config=cast(Any, None), chain=chain, debug=dict)
+    with pytest.raises(ValueError, match="custom"):
+        selection.retrieve(["q"])
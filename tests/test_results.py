@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, List
+
+import pytest
+
+from rag_bencher.eval import results
+from rag_bencher.eval.harness import ExampleResult
+
+pytestmark = [pytest.mark.unit, pytest.mark.offline]
+
+
+def test_with_ids_defaults_to_line_index_and_skips_done() -> None:
+    examples: List[Dict[str, Any]] = [{"question": "a"}, {"id": 7, "question": "b"}, {"question": "c"}]
+    out = list(results.with_ids(examples, skip={"2"}))
+    assert out == [{"question": "a", "id": "0"}, {"id": "7", "question": "b"}]
+    assert "id" not in examples[0]
+
+
+def test_result_row_keeps_previews_metrics_and_timing() -> None:
+    res = ExampleResult(
+        example={"id": "q1", "question": "What?"},
+        answer="That.",
+        debug={"candidates": [{"source": "doc", "preview": "p", "score": 0.5, "extra": 1}]},
+        seconds=0.25,
+    )
+    row = results.result_row(res, {"lexical_f1": 1.0}, config="c.yaml")
+    assert row == {
+        "config": "c.yaml",
+        "id": "q1",
+        "question": "What?",
+        "answer": "That.",
+        "retrieved": [{"source": "doc", "preview": "p", "score": 0.5}],
+        "metrics": {"lexical_f1": 1.0},
+        "timings": {"total_s": 0.25},
+        "cached": False,
+    }
+
+
+def test_sink_batches_fsync_and_syncs_on_close(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    synced: list[int] = []
+    monkeypatch.setattr(os, "fsync", lambda fd: synced.append(fd))
+    path = tmp_path / "out" / "results.jsonl"
+    with results.ResultsSink(path, fsync_every=2, fsync_interval=3600) as sink:
+        for i in range(3):
+            sink.write({"id": str(i)})
+            # Every row is visible to readers as soon as it is written.
+            assert len(path.read_text(encoding="utf-8").splitlines()) == i + 1
+        assert len(synced) == 1
+    assert len(synced) == 2
+
+
+def test_sink_drops_truncated_tail_before_appending(tmp_path: Path) -> None:
+    path = tmp_path / "results.jsonl"
+    path.write_text('{"id": "0"}\n{"id": "1", "answ', encoding="utf-8")
+    with results.ResultsSink(path) as sink:
+        sink.write({"id": "1"})
+    assert [json.loads(line)["id"] for line in path.read_text(encoding="utf-8").splitlines()] == ["0", "1"]
+
+    path.write_text('{"id": "no-newline"', encoding="utf-8")
+    results.ResultsSink(path).close()
+    assert path.read_text(encoding="utf-8") == ""
+
+
+def test_load_completed_filters_by_config_and_sums_metrics(tmp_path: Path) -> None:
+    path = tmp_path / "results.jsonl"
+    rows = [
+        {"config": "a", "id": "0", "metrics": {"lexical_f1": 1.0, "bow_cosine": 0.5, "context_recall": 0.0}},
+        {"config": "a", "id": "1", "metrics": {"lexical_f1": 0.0, "bow_cosine": 0.5, "context_recall": 1.0}},
+        {"config": "b", "id": "0", "metrics": {"lexical_f1": 0.2}},
+    ]
+    path.write_text("\n".join(json.dumps(r) for r in rows) + "\n\n{broken", encoding="utf-8")
+
+    done, totals = results.load_completed(path, config="a")
+    assert done == {"0", "1"}
+    assert totals.count == 2
+    assert totals.averages() == {"lexical_f1": 0.5, "bow_cosine": 0.5, "context_recall": 0.5}
+    assert results.load_completed(tmp_path / "missing.jsonl")[0] == set()
+    assert results.MetricTotals().averages() == {"lexical_f1": 0.0, "bow_cosine": 0.0, "context_recall": 0.0}
+
+
+def test_retrieval_metrics_average_over_rows_with_gold_ids() -> None:
+    totals = results.MetricTotals()
+    totals.add({"lexical_f1": 1.0, "mrr": 1.0})
+    totals.add({"lexical_f1": 0.0})
+    totals.add({"lexical_f1": 0.5, "mrr": 0.5})
+    averages = totals.averages()
+    assert averages["lexical_f1"] == pytest.approx(0.5)
+    assert averages["mrr"] == pytest.approx(0.75)
+    assert "recall@5" not in averages
+
+
+def test_rows_record_stage_timings_and_latency_percentiles(tmp_path: Path) -> None:
+    res = ExampleResult(
+        example={"id": "q1", "question": "What?"},
+        answer="",
+        debug={},
+        seconds=0.5,
+        stages={"llm": 0.3, "embedding": 0.1},
+    )
+    row = results.retrieval_row(res, {})
+    assert row["timings"] == {"total_s": 0.5, "llm_s": 0.3, "embedding_s": 0.1}
+
+    latency = results.StageLatencies()
+    for i in range(1, 101):
+        latency.add({"timings": {"total_s": i / 100, "llm_s": i / 1000}})
+    latency.add({"timings": {"total_s": 0.0}, "cached": True})
+    summary = latency.percentiles()
+    assert list(summary) == ["total", "llm"]
+    assert summary["total"] == pytest.approx({"p50": 0.505, "p95": 0.9505, "p99": 0.9901})
+    assert summary["llm"]["p99"] == pytest.approx(0.09901)
+    assert results.StageLatencies().percentiles() == {}
+
+    path = tmp_path / "results.jsonl"
+    path.write_text(json.dumps({"id": "0", "metrics": {}, "timings": {"total_s": 0.2, "llm_s": 0.1}}), encoding="utf-8")
+    resumed = results.StageLatencies()
+    results.load_completed(path, latency=resumed)
+    assert resumed.percentiles()["llm"] == {"p50": 0.1, "p95": 0.1, "p99": 0.1}
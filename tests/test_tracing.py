@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import time
+from typing import Any
+
+import pytest
+from langchain_core.runnables import RunnableLambda
+
+from rag_bencher.pipelines.utils import debug_config, traced
+from rag_bencher.utils.tracing import StageTrace, current_trace, stage
+
+pytestmark = [pytest.mark.unit, pytest.mark.offline]
+
+
+def test_stage_is_a_no_op_outside_a_traced_invocation() -> None:
+    assert current_trace() is None
+    with stage("embedding"):
+        pass
+    assert current_trace() is None
+
+
+def test_nested_stages_record_exclusive_time() -> None:
+    def build_context(question: str) -> str:
+        with stage("vector_search"):
+            with stage("embedding"):
+                time.sleep(0.02)
+        return question
+
+    trace = StageTrace()
+    RunnableLambda(build_context).invoke("q", config=debug_config({}, trace))
+
+    seconds = trace.seconds()
+    assert seconds["embedding"] >= 0.02
+    assert seconds["vector_search"] < seconds["embedding"]
+
+
+def test_traced_times_the_wrapped_runnable_and_keeps_its_output() -> None:
+    def slow(value: Any) -> str:
+        time.sleep(0.01)
+        return f"llm:{value}"
+
+    chain = RunnableLambda(lambda q: q.upper()) | traced(RunnableLambda(slow), "llm")
+    trace = StageTrace()
+
+    assert chain.invoke("q", config=debug_config({}, trace)) == "llm:Q"
+    assert set(trace.seconds()) == {"llm"}
+    assert trace.seconds()["llm"] >= 0.01
+    # Without a trace in the config the wrapper only runs the runnable.
+    assert chain.invoke("q") == "llm:Q"
+
+
+def test_repeated_stages_accumulate() -> None:
+    trace = StageTrace()
+    trace.add("embedding", 0.5)
+    trace.add("embedding", 0.25)
+    assert trace.seconds() == {"embedding": 0.75}
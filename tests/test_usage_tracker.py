@@ -1,12 +1,20 @@
 from __future__ import annotations
 
+import json
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 from types import SimpleNamespace
-from typing import cast
+from typing import Any, List, cast
+from uuid import uuid4
 
 import pytest
-from langchain_core.outputs import Generation, LLMResult
+from langchain_core.messages import AIMessage
+from langchain_core.messages.ai import UsageMetadata
+from langchain_core.outputs import ChatGeneration, Generation, LLMResult
 
-from rag_bencher.utils.callbacks.usage import UsageTracker
+from rag_bencher.utils.callbacks import usage
+from rag_bencher.utils.callbacks.usage import ModelPrice, UsageTracker
+from rag_bencher.utils.llm_cache import CACHED_FLAG
 
 
 @pytest.mark.unit
@@ -28,3 +36,107 @@ def test_usage_tracker_handles_malformed_response() -> None:
     bad_response = cast(LLMResult, SimpleNamespace(generations=None))
     tracker.on_llm_end(bad_response)
     assert tracker.summary()["calls"] == 1
+
+
+def _chat_result(text: str, **message: Any) -> LLMResult:
+    return LLMResult(generations=[[ChatGeneration(message=AIMessage(content=text, **message))]])
+
+
+@pytest.mark.unit
+def test_usage_tracker_prefers_provider_usage_and_prices_by_model() -> None:
+    tracker = UsageTracker(pricing={"gpt-4o-mini": ModelPrice(1.0, 2.0)})
+    run_id = uuid4()
+    tracker.on_llm_start({}, ["ignored prompt"], run_id=run_id, invocation_params={"model_name": "gpt-4o-mini"})
+    usage: UsageMetadata = {"input_tokens": 1000, "output_tokens": 500, "total_tokens": 1500}
+    tracker.on_llm_end(
+        _chat_result("hi", usage_metadata=usage, response_metadata={"model_name": "gpt-4o-mini-2024-07-18"}),
+        run_id=run_id,
+    )
+    summary = tracker.summary()
+    assert summary["input_tokens"] == 1000 and summary["output_tokens"] == 500
+    assert summary["estimated_calls"] == 0
+    assert summary["cost_usd"] == pytest.approx(2.0)
+    assert list(summary["models"]) == ["gpt-4o-mini-2024-07-18"]
+
+
+@pytest.mark.unit
+def test_usage_tracker_reads_legacy_token_usage_and_skips_cached_calls() -> None:
+    tracker = UsageTracker(cost_per_1k_input=1.0, cost_per_1k_output=1.0, pricing={})
+    legacy = LLMResult(
+        generations=[[Generation(text="x")]],
+        llm_output={"token_usage": {"prompt_tokens": 10, "completion_tokens": 5}, "model_name": "local"},
+    )
+    tracker.on_llm_end(legacy)
+    tracker.on_llm_end(LLMResult(generations=[[Generation(text="x y z", generation_info={CACHED_FLAG: True})]]))
+    summary = tracker.summary()
+    assert summary["calls"] == 2 and summary["cached_calls"] == 1
+    assert (summary["input_tokens"], summary["output_tokens"]) == (10, 5)
+    assert summary["cost_usd"] == pytest.approx(0.015)
+
+
+@pytest.mark.unit
+def test_usage_tracker_counts_concurrent_calls() -> None:
+    tracker = UsageTracker(pricing={})
+
+    def call(_: int) -> None:
+        run_id = uuid4()
+        tracker.on_llm_start({}, ["a b c"], run_id=run_id)
+        tracker.on_llm_end(LLMResult(generations=[[Generation(text="d e")]]), run_id=run_id)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        for future in [pool.submit(call, i) for i in range(200)]:
+            future.result()
+    summary = tracker.summary()
+    assert summary["calls"] == 200
+    assert summary["estimated_calls"] == 200
+    assert summary["input_tokens"] == 200 * usage.count_tokens(["a b c"], "unknown")
+
+
+@pytest.mark.unit
+def test_count_tokens_batches_through_the_encoding(monkeypatch: pytest.MonkeyPatch) -> None:
+    batches: List[List[str]] = []
+
+    class FakeEncoding:
+        def encode_ordinary_batch(self, texts: List[str]) -> List[List[int]]:
+            batches.append(texts)
+            return [[ord(c) for c in t] for t in texts]
+
+    for name in usage.OFFLINE_ENVS:
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setattr(usage, "_encoding", lambda model: FakeEncoding())
+    assert usage.count_tokens(["ab", "cde"], "m") == 5
+    assert batches == [["ab", "cde"]]
+    # Offline runs never reach tiktoken, which may need to download its vocabularies.
+    assert usage.count_tokens(["ab", "cde"], "m", offline=True) == 2
+    monkeypatch.setenv("HF_HUB_OFFLINE", "1")
+    assert usage.count_tokens(["ab", "cde"], "m") == 2
+    assert batches == [["ab", "cde"]]
+    monkeypatch.setattr(usage, "_encoding", lambda model: None)
+    assert usage.count_tokens(["two words", "three more words"]) == 5
+    assert usage.count_tokens([]) == 0
+
+
+@pytest.mark.unit
+def test_pricing_matches_longest_prefix_and_loads_overrides(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    assert usage.price_for("gpt-4o-mini-2024-07-18", usage.PRICING) == usage.PRICING["gpt-4o-mini"]
+    assert usage.price_for("gpt-4o-2024-08-06", usage.PRICING) == usage.PRICING["gpt-4o"]
+    assert usage.price_for("llama3", usage.PRICING) is None
+    path = tmp_path / "prices.json"
+    path.write_text(json.dumps({"llama3": {"input_per_1k": 0.1, "output_per_1k": 0.2}}), encoding="utf-8")
+    monkeypatch.setenv(usage.PRICING_ENV, str(path))
+    prices = usage.load_pricing()
+    assert prices["llama3"] == ModelPrice(0.1, 0.2)
+    assert prices["gpt-4o"] == usage.PRICING["gpt-4o"]
+
+
+@pytest.mark.unit
+def test_usage_tracker_keeps_legacy_aggregate_attributes() -> None:
+    tracker = UsageTracker(cost_per_1k_input=0.5, cost_per_1k_output=1.5, pricing={}, offline=True)
+    tracker.on_llm_start({}, ["one two three"])
+    tracker.on_llm_end(LLMResult(generations=[[Generation(text="four five")]]))
+    tracker.on_llm_end(LLMResult(generations=[[Generation(text="six")]], llm_output={"model_name": "other"}))
+
+    assert (tracker.calls, tracker.in_tok, tracker.out_tok) == (2, 3, 3)
+    assert (tracker.cpi, tracker.cpo) == (0.5, 1.5)
+    with pytest.raises(AttributeError):
+        tracker.calls = 0  # type: ignore[misc]
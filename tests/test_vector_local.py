@@ -7,12 +7,14 @@ import types
 from importlib.machinery import ModuleSpec
 from typing import Any, Sequence, cast
 
+import numpy as np
 import pytest
 from langchain_core.documents import Document
 from langchain_core.embeddings import Embeddings
-from langchain_core.vectorstores import VectorStore
+from langchain_core.vectorstores import InMemoryVectorStore, VectorStore
 
 from rag_bencher.vector import local
+from rag_bencher.vector.numpy_store import NumpyVectorStore
 
 pytestmark = [pytest.mark.unit, pytest.mark.offline]
 
@@ -52,6 +54,19 @@ def test_build_local_vectorstore_uses_resolved_factory(monkeypatch: pytest.Monke
     assert call_emb is embeddings
 
 
+def test_build_local_vectorstore_reuses_precomputed_vectors(monkeypatch: pytest.MonkeyPatch) -> None:
+    class RefusingEmbeddings(DummyEmbeddings):
+        def embed_documents(self, texts: list[str]) -> list[list[float]]:
+            raise AssertionError("vectors were already computed")
+
+    monkeypatch.setattr(local, "_resolve_factory", lambda: NumpyVectorStore)
+    docs = [Document(page_content="one", metadata={"n": 1}), Document(page_content="two")]
+    store = local.build_local_vectorstore(docs, RefusingEmbeddings(), vectors=np.array([[3.0, 4.0], [0.0, 2.0]]))
+    assert isinstance(store, NumpyVectorStore)
+    assert np.allclose(store.vectors, [[0.6, 0.8], [0.0, 1.0]])
+    assert store.chunks[0] == Document(id="0", page_content="one", metadata={"n": 1})
+
+
 def test_resolve_factory_prefers_inmemory_mode(monkeypatch: pytest.MonkeyPatch) -> None:
     _clear_caches()
     monkeypatch.setenv("RAG_BENCH_VECTORSTORE", "memory")
@@ -60,13 +75,31 @@ def test_resolve_factory_prefers_inmemory_mode(monkeypatch: pytest.MonkeyPatch)
     assert local._resolve_factory() is sentinel
 
 
-def test_resolve_factory_disables_faiss_when_env_set(monkeypatch: pytest.MonkeyPatch) -> None:
+@pytest.mark.parametrize("mode", [None, "auto", "faiss"])
+def test_resolve_factory_disabling_faiss_keeps_numpy(monkeypatch: pytest.MonkeyPatch, mode: str | None) -> None:
     _clear_caches()
-    monkeypatch.delenv("RAG_BENCH_VECTORSTORE", raising=False)
+    if mode is None:
+        monkeypatch.delenv("RAG_BENCH_VECTORSTORE", raising=False)
+    else:
+        monkeypatch.setenv("RAG_BENCH_VECTORSTORE", mode)
     monkeypatch.setenv("RAG_BENCH_DISABLE_FAISS", "true")
-    sentinel = object()
-    monkeypatch.setattr(local, "_inmemory_factory", lambda: sentinel)
-    assert local._resolve_factory() is sentinel
+    monkeypatch.setattr(local, "_faiss_safe_to_import", lambda: pytest.fail("FAISS probe with FAISS disabled"))
+    monkeypatch.setattr(local, "_inmemory_factory", lambda: pytest.fail("in-memory store without memory mode"))
+    assert local._resolve_factory() is NumpyVectorStore
+
+
+@pytest.mark.parametrize("mode", [None, "auto", "numpy", "faiss-hnsw"])
+def test_resolve_factory_defaults_to_numpy_without_faiss_probe(
+    monkeypatch: pytest.MonkeyPatch, mode: str | None
+) -> None:
+    _clear_caches()
+    if mode is None:
+        monkeypatch.delenv("RAG_BENCH_VECTORSTORE", raising=False)
+    else:
+        monkeypatch.setenv("RAG_BENCH_VECTORSTORE", mode)
+    monkeypatch.delenv("RAG_BENCH_DISABLE_FAISS", raising=False)
+    monkeypatch.setattr(local, "_faiss_safe_to_import", lambda: pytest.fail("FAISS probe on the default path"))
+    assert local._resolve_factory() is NumpyVectorStore
 
 
 def test_resolve_factory_allows_faiss_when_safe(monkeypatch: pytest.MonkeyPatch) -> None:
@@ -139,3 +172,90 @@ def test_is_truthy_falsey_values(value: str | None) -> None:
 @pytest.mark.parametrize("value", ["1", "True", " YES ", "on"])
 def test_is_truthy_true_values(value: str) -> None:
     assert local._is_truthy(value) is True
+
+
+def test_stored_vectors_reads_back_inmemory_vectors() -> None:
+    class IndexEmbeddings(DummyEmbeddings):
+        def embed_documents(self, texts: list[str]) -> list[list[float]]:
+            return [[float(len(t)), 1.0] for t in texts]
+
+        def embed_query(self, text: str) -> list[float]:
+            return [float(len(text)), 1.0]
+
+    store = InMemoryVectorStore.from_documents(
+        [Document(page_content="a"), Document(page_content="bbb")], IndexEmbeddings()
+    )
+    hits = store.similarity_search_by_vector([3.0, 1.0], k=2)
+    assert local.stored_vectors(store, hits) == [[float(len(d.page_content)), 1.0] for d in hits]
+    assert local.stored_vectors(store, [Document(page_content="unknown")]) is None
+    assert local.stored_vectors(cast(VectorStore, types.SimpleNamespace()), hits) is None
+
+
+def test_batch_similarity_search_matches_per_query_inmemory_search() -> None:
+    class AxisEmbeddings(DummyEmbeddings):
+        def embed_documents(self, texts: list[str]) -> list[list[float]]:
+            return [[float(t.count("x")), float(t.count("y")), 1.0] for t in texts]
+
+    store = InMemoryVectorStore.from_documents(
+        [Document(page_content=t) for t in ["xxx", "yyy", "xy", "x", "yy", ""]], AxisEmbeddings()
+    )
+    queries = [[1.0, 0.0, 0.0], [0.0, 1.0, 0.5], [0.0, 0.0, 0.0]]
+    batched = local.batch_similarity_search(store, queries, k=3)
+    for query, hits in zip(queries[:2], batched[:2], strict=True):
+        expected = store.similarity_search_by_vector(query, k=3)
+        assert [d.page_content for d in hits] == [d.page_content for d in expected]
+    assert len(batched[2]) == 3
+    assert local.batch_similarity_search(store, [], k=3) == []
+
+    store.add_documents([Document(page_content="xxxxxxxx")])
+    assert local.batch_similarity_search(store, queries[:1], k=1)[0][0].page_content == "xxxxxxxx"
+
+
+def test_batch_similarity_search_sees_inmemory_changes_that_keep_the_size() -> None:
+    class AxisEmbeddings(DummyEmbeddings):
+        def embed_documents(self, texts: list[str]) -> list[list[float]]:
+            return [[float(t.count("x")), float(t.count("y"))] for t in texts]
+
+    store = InMemoryVectorStore(AxisEmbeddings())
+    store.add_documents([Document(id="a", page_content="x"), Document(id="b", page_content="y")])
+    assert local.batch_similarity_search(store, [[0.0, 1.0]], k=1)[0][0].page_content == "y"
+
+    store.delete(["b"])
+    store.add_documents([Document(id="c", page_content="yy")])
+    assert local.batch_similarity_search(store, [[0.0, 1.0]], k=1)[0][0].page_content == "yy"
+
+    store.add_documents([Document(id="a", page_content="yyy")])  # replaces "x" under the same id
+    assert [d.page_content for d in local.batch_similarity_search(store, [[0.0, 1.0]], k=2)[0]] == ["yyy", "yy"]
+
+
+def test_batch_similarity_search_uses_faiss_index_search() -> None:
+    searched: list[Any] = []
+    docs = {"a": Document(page_content="A"), "b": Document(page_content="B")}
+
+    class Index:
+        def search(self, queries: Any, k: int) -> tuple[Any, Any]:
+            searched.append(queries.tolist())
+            return None, np.array([[1, 0], [0, -1]])
+
+    store = types.SimpleNamespace(
+        index=Index(),
+        index_to_docstore_id={0: "a", 1: "b"},
+        docstore=types.SimpleNamespace(search=docs.get),
+        _normalize_L2=True,
+    )
+    hits = local.batch_similarity_search(cast(VectorStore, store), [[3.0, 4.0], [1.0, 0.0]], k=2)
+    assert [[d.page_content for d in row] for row in hits] == [["B", "A"], ["A"]]
+    assert searched == [[[0.6000000238418579, 0.800000011920929], [1.0, 0.0]]]
+
+
+def test_batch_similarity_search_falls_back_to_per_vector_calls() -> None:
+    calls: list[list[float]] = []
+
+    class Plain:
+        def similarity_search_by_vector(self, embedding: list[float], k: int = 4) -> list[Document]:
+            calls.append(embedding)
+            return [Document(page_content=str(embedding[0]))][:k]
+
+    hits = local.batch_similarity_search(cast(VectorStore, Plain()), [[1.0], [2.0]], k=1)
+    assert [h[0].page_content for h in hits] == ["1.0", "2.0"]
+    assert calls == [[1.0], [2.0]]